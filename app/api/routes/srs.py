@@ -1,19 +1,36 @@
 import os
+import json
 import shutil
 import uuid
+import time
+import asyncio
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import JSONResponse
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from services.database import get_db
+from services.database import get_db, db_session
+from services.job_queue import enqueue_job
+from services.uploads import save_upload, UploadTooLarge, MAX_UPLOAD_BYTES
+from services.archives import stream_project_archive, cached_archive_path
+from services.job_store import (
+    create_job, get_job, list_jobs, update_job, record_progress, add_job_event, list_job_events,
+    find_project_result, save_project_result, list_project_jobs,
+    subscribe_job_events, unsubscribe_job_events
+)
 # Import the process_srs_document function
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 from workflow.workflow import process_srs_document
+from workflow.version import get_pipeline_version
+from workflow.llm_scheduler import current_job_id
+from workflow.profiling import JobProfiler, current_profiler
+from workflow.metrics import UPLOAD_SIZE, PROJECT_CACHE_LOOKUPS, JOB_DURATION
+from workflow.checkpoints import has_checkpoint, delete_checkpoints
 
 
 router = APIRouter()
@@ -25,12 +42,37 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 GENERATED_DIR = Path("generated_projects")
 GENERATED_DIR.mkdir(exist_ok=True)
 
+# Seconds of silence after which a keep-alive comment is sent
+JOB_EVENTS_KEEPALIVE = float(os.getenv("JOB_EVENTS_KEEPALIVE", "15"))
+
 # Response models
 class SRSProcessingResponse(BaseModel):
     """Response model for SRS processing"""
     job_id: str
     message: str
     status: str
+    project_id: Optional[str] = None
+    progress: Optional[Dict[str, Any]] = None
+
+class JobSummary(BaseModel):
+    """Summary of a processing job"""
+    job_id: str
+    filename: str
+    status: str
+    content_sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    project_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobListResponse(BaseModel):
+    """Page of processing jobs"""
+    jobs: List[JobSummary]
+    total: int
+    limit: int
+    offset: int
 
 class ProjectGenerationResponse(BaseModel):
     """Response model for project generation"""
@@ -41,15 +83,22 @@ class ProjectGenerationResponse(BaseModel):
 
 @router.post("/srs/upload", response_model=SRSProcessingResponse)
 async def upload_srs_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: int = 0,
+    force: bool = False,
+    profile: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Upload an SRS document for processing
     
-    - Accepts only .docx files
+    - Accepts only .docx files up to MAX_UPLOAD_BYTES
     - Validates file format and content
+    - Streams the file to disk, computing its SHA-256 on the way
+    - Returns a completed job for the existing project when the same document was
+      already generated by the current pipeline version, unless force is set
+    - Queues the job for the worker pool; higher priority jobs run first
+    - With profile set, the job is run under the sampling profiler
     - Returns a job ID for tracking the processing
     """
     # Validate file format
@@ -67,21 +116,57 @@ async def upload_srs_document(
     job_dir.mkdir(exist_ok=True)
     
     # Save uploaded file
-    file_path = job_dir / file.filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Process the document in the background
-    background_tasks.add_task(
-        process_srs_document_task,
-        file_path=str(file_path),
-        job_id=job_id
+    file_path = job_dir / Path(file.filename).name
+    try:
+        size, content_sha256 = await save_upload(file, file_path)
+    except UploadTooLarge:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_BYTES} bytes"
+        )
+    
+    UPLOAD_SIZE.observe(size)
+    
+    # Record the job before a worker can pick it up
+    job = await create_job(db, job_id, file.filename, content_sha256=content_sha256, size_bytes=size)
+    
+    # Reuse the project generated earlier from an identical document
+    result = None if force else await find_project_result(db, content_sha256, get_pipeline_version())
+    cached = result is not None and (GENERATED_DIR / result.project_id).exists()
+    if not force:
+        PROJECT_CACHE_LOOKUPS.inc(result="hit" if cached else "miss")
+    if cached:
+        now = datetime.utcnow()
+        job.status = "completed"
+        job.project_id = result.project_id
+        job.started_at = now
+        job.finished_at = now
+        await db.commit()
+        await add_job_event(job_id, "job_completed", {
+            "job_id": job_id,
+            "project_id": result.project_id,
+            "cached_from_job_id": result.job_id
+        })
+        return SRSProcessingResponse(
+            job_id=job_id,
+            message=f"SRS document '{file.filename}' was already processed. Project ID: {result.project_id}",
+            status="completed",
+            project_id=result.project_id
+        )
+    await db.commit()
+    
+    # Queue the document for the worker pool
+    enqueue_job(
+        job_id,
+        {"file_path": str(file_path), "job_id": job_id, "profile": profile},
+        priority=priority
     )
     
     return SRSProcessingResponse(
         job_id=job_id,
-        message=f"SRS document '{file.filename}' uploaded successfully. Processing started.",
-        status="processing"
+        message=f"SRS document '{file.filename}' uploaded successfully. Queued for processing.",
+        status="queued"
     )
 
 # Endpoint to get processing status
@@ -96,48 +181,194 @@ async def get_processing_status(
     - Returns the current status of the processing
     - If completed, returns the project generation details
     """
-    # Check if job exists
-    job_dir = UPLOAD_DIR / job_id
-    if not job_dir.exists():
+    job = await get_job(db, job_id)
+    if job is None:
         raise HTTPException(
             status_code=404,
             detail=f"Job with ID {job_id} not found"
         )
     
-    # Check if processing is complete
-    status_file = job_dir / "status.txt"
-    if status_file.exists():
-        status = status_file.read_text().strip()
-        
-        if status == "completed":
-            # Get project details
-            project_id_file = job_dir / "project_id.txt"
-            if project_id_file.exists():
-                project_id = project_id_file.read_text().strip()
-                return SRSProcessingResponse(
-                    job_id=job_id,
-                    message=f"Processing completed. Project ID: {project_id}",
-                    status="completed"
-                )
-        elif status == "failed":
-            error_file = job_dir / "error.txt"
-            error_message = "Processing failed"
-            if error_file.exists():
-                error_message = error_file.read_text().strip()
-            
-            return SRSProcessingResponse(
-                job_id=job_id,
-                message=error_message,
-                status="failed"
+    if job.status == "completed":
+        message = f"Processing completed. Project ID: {job.project_id}"
+    elif job.status == "failed":
+        message = job.error or "Processing failed"
+    elif job.status == "queued":
+        message = "Queued for processing"
+    else:
+        message = "Processing in progress"
+    
+    return SRSProcessingResponse(
+        job_id=job.id,
+        message=message,
+        status=job.status,
+        project_id=job.project_id,
+        progress=job.progress
+    )
+
+# Endpoint to list processing jobs
+@router.get("/srs/jobs", response_model=JobListResponse)
+async def list_processing_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List processing jobs, newest first
+    
+    - Optionally filtered by status
+    - Paginated with limit and offset
+    """
+    jobs, total = await list_jobs(db, status=status, limit=limit, offset=offset)
+    return JobListResponse(
+        jobs=[
+            JobSummary(
+                job_id=job.id,
+                filename=job.filename,
+                status=job.status,
+                content_sha256=job.content_sha256,
+                size_bytes=job.size_bytes,
+                project_id=job.project_id,
+                error=job.error,
+                created_at=job.created_at,
+                started_at=job.started_at,
+                finished_at=job.finished_at
             )
+            for job in jobs
+        ],
+        total=total,
+        limit=limit,
+        offset=offset
+    )
+
+# Endpoint to stream job progress
+@router.get("/srs/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream the progress of a job as server-sent events
+    
+    - Emits node_started / node_finished events with timings and files generated so far
+    - Emits a file_generated event for every file as soon as it is written
+    - Ends with a job_completed or job_failed event, unless the job is resumed
+    - Resumes after the Last-Event-ID header when a client reconnects
+    """
+    if await get_job(db, job_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job with ID {job_id} not found"
+        )
+    last_id = request.headers.get("last-event-id", "0")
+    last_id = int(last_id) if last_id.isdigit() else 0
+
+    async def event_stream():
+        nonlocal last_id
+        # Set when the job may have new events, instead of querying on a timer
+        changed = subscribe_job_events(job_id)
+        try:
+            while not await request.is_disconnected():
+                changed.clear()
+                async with db_session() as session:
+                    job = await get_job(session, job_id)
+                    events = await list_job_events(session, job_id, after_id=last_id)
+                for event in events:
+                    last_id = event.id
+                    yield f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+                # A failed job that was resumed keeps streaming past its job_failed event
+                finished = job is None or job.status in ("completed", "failed")
+                if finished and events and events[-1].type in ("job_completed", "job_failed"):
+                    return
+                if events:
+                    continue
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), JOB_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            unsubscribe_job_events(job_id, changed)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Endpoint to resume a failed job
+@router.post("/srs/jobs/{job_id}/resume", response_model=SRSProcessingResponse)
+async def resume_job(
+    job_id: str,
+    priority: int = 0,
+    profile: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Resume a failed job from its last checkpoint
+    
+    - Nodes that completed before the failure are not run again
+    - A job without a checkpoint starts over from parsing the document
+    """
+    job = await get_job(db, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job with ID {job_id} not found"
+        )
+    if job.status != "failed":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Only failed jobs can be resumed; job {job_id} is {job.status}"
+        )
+    file_path = UPLOAD_DIR / job_id / Path(job.filename).name
+    if not file_path.exists():
+        raise HTTPException(
+            status_code=410,
+            detail=f"The uploaded document of job {job_id} is no longer available"
+        )
+    
+    from_checkpoint = await has_checkpoint(job_id)
+    job.status = "queued"
+    job.error = None
+    job.finished_at = None
+    await db.commit()
+    await add_job_event(job_id, "job_resumed", {"job_id": job_id, "from_checkpoint": from_checkpoint})
+    
+    enqueue_job(
+        job_id,
+        {"file_path": str(file_path), "job_id": job_id, "profile": profile},
+        priority=priority
+    )
     
-    # If no status file or status is not completed/failed
     return SRSProcessingResponse(
         job_id=job_id,
-        message="Processing in progress",
-        status="processing"
+        message="Queued to resume from the last checkpoint" if from_checkpoint
+        else "No checkpoint found. Queued to process from the start",
+        status="queued"
     )
 
+# Endpoint to download a job profile
+@router.get("/srs/jobs/{job_id}/profile")
+async def get_job_profile(job_id: str, kind: str = Query("flamegraph", pattern="^(flamegraph|timeline)$")):
+    """
+    Download the profile of a job uploaded with profile=true
+    
+    - flamegraph: collapsed stacks for flamegraph.pl or speedscope
+    - timeline: node start/end times and sample counts per node as JSON
+    """
+    job_dir = UPLOAD_DIR / job_id
+    path = job_dir / ("profile.collapsed" if kind == "flamegraph" else "profile_timeline.json")
+    if Path(job_id).name != job_id or not path.exists():
+        raise HTTPException(
+            status_code=404,
+            detail=f"No profile found for job {job_id}"
+        )
+    media_type = "text/plain" if kind == "flamegraph" else "application/json"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
 # Endpoint to get generated project
 @router.get("/srs/project/{project_id}", response_model=ProjectGenerationResponse)
 async def get_generated_project(
@@ -170,46 +401,109 @@ async def get_generated_project(
         message="Project generated successfully"
     )
 
-def zip_generated_project(output_dir: str, zip_file_name: str = "generated_project.zip") -> str:
-    zip_path = os.path.join(os.path.dirname(output_dir), zip_file_name)
-    shutil.make_archive(zip_path.replace('.zip', ''), 'zip', output_dir)
-    return zip_path
+# Endpoint to download a generated project
+@router.get("/srs/project/{project_id}/download")
+async def download_generated_project(project_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Download a generated project as a ZIP archive
+    
+    - Returns 409 while the job generating the project has not completed
+    - The first download streams the archive while it is built
+    - Later downloads are served from the cached archive, until the project
+      is generated again
+    """
+    project_dir = GENERATED_DIR / project_id
+    if Path(project_id).name != project_id or not project_dir.is_dir():
+        raise HTTPException(
+            status_code=404,
+            detail=f"Project with ID {project_id} not found"
+        )
+    
+    # Projects generated before jobs were tracked have no jobs and never change
+    jobs = await list_project_jobs(db, project_id)
+    completed = [job for job in jobs if job.status == "completed" and job.finished_at]
+    if any(job.status in ("queued", "processing") for job in jobs) or (jobs and not completed):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Project {project_id} is not complete yet"
+        )
+    version = max(job.finished_at for job in completed).strftime("%Y%m%d%H%M%S%f") if completed else None
+    
+    filename = f"{project_id}.zip"
+    cache_path = cached_archive_path(project_dir, version)
+    if cache_path.exists():
+        return FileResponse(cache_path, media_type="application/zip", filename=filename)
+    
+    return StreamingResponse(
+        stream_project_archive(project_dir, version),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-async def process_srs_document_task(file_path: str, job_id: str):
+async def process_srs_document_task(file_path: str, job_id: str, profile: bool = False):
     """
     Background task to process an SRS document
     
     - Analyzes the document using LangGraph
     - Generates a FastAPI project
     - Updates the job status
+    - Continues from the job's checkpoint when it was interrupted or resumed
+    - With profile set, writes a flamegraph and node timeline next to the upload
     """
-    job_dir = UPLOAD_DIR / job_id
-    status_file = job_dir / "status.txt"
+    # LLM requests are queued under the job they belong to
+    current_job_id.set(job_id)
+    started = time.perf_counter()
+    profiler = JobProfiler(job_id) if profile else None
+    if profiler is not None:
+        current_profiler.set(profiler)
+        profiler.start()
+    
+    async def save_profile():
+        # Written before the final job event so clients can fetch it right away
+        if profiler is not None and profiler.stop():
+            await asyncio.to_thread(profiler.write, Path(file_path).parent)
     
     try:
-        with open(status_file, "w") as f:
-            f.write("processing")
+        await update_job(job_id, status="processing", error=None, started_at=datetime.utcnow())
+        await add_job_event(job_id, "job_started", {"job_id": job_id})
         
-        project_id, langsmith_trace_url = await process_srs_document(file_path)
-
-        with open(job_dir / "project_id.txt", "w") as f:
-            f.write(project_id)
+        async def on_event(event):
+            await add_job_event(job_id, event["type"], event)
+            if event["type"] == "node_finished":
+                await record_progress(job_id, event)
+                # Recorded right away so the unfinished project cannot be downloaded
+                if event.get("project_id"):
+                    await update_job(job_id, project_id=event["project_id"])
+        
+        project_id, langsmith_trace_url, succeeded = await process_srs_document(file_path, on_event=on_event, job_id=job_id)
         
         if langsmith_trace_url:
             with open(GENERATED_DIR / project_id / "langsmith_trace.txt", "w") as f:
                 f.write(langsmith_trace_url)
         
-        with open(status_file, "w") as f:
-            f.write("completed")
-
-        generated_project_path = GENERATED_DIR / project_id
-
-        zip_path = zip_generated_project(generated_project_path)
-
-            
+        await save_profile()
+        if not succeeded:
+            # Not reused for later uploads, and the checkpoint is kept so the job can be resumed
+            error = "Generation finished with errors or did not pass validation"
+            JOB_DURATION.observe(time.perf_counter() - started, status="failed")
+            await update_job(job_id, status="failed", error=error, project_id=project_id, finished_at=datetime.utcnow())
+            await add_job_event(job_id, "job_failed", {"job_id": job_id, "project_id": project_id, "error": error})
+            return
+        JOB_DURATION.observe(time.perf_counter() - started, status="completed")
+        await update_job(
+            job_id,
+            status="completed",
+            project_id=project_id,
+            finished_at=datetime.utcnow()
+        )
+        await save_project_result(job_id, get_pipeline_version())
+        await delete_checkpoints(job_id)
+        await add_job_event(job_id, "job_completed", {"job_id": job_id, "project_id": project_id})
     except Exception as e:
-        with open(job_dir / "error.txt", "w") as f:
-            f.write(str(e))
-        
-        with open(status_file, "w") as f:
-            f.write("failed")
+        await save_profile()
+        JOB_DURATION.observe(time.perf_counter() - started, status="failed")
+        await update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        await add_job_event(job_id, "job_failed", {"job_id": job_id, "error": str(e)})
+    finally:
+        if profiler is not None:
+            profiler.stop()
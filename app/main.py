@@ -1,5 +1,7 @@
 import os
 from fastapi import FastAPI, Depends
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -17,6 +19,10 @@ app = FastAPI(
 
 # Import routers
 from api.routes import srs
+from services.uploads import UploadSizeLimitMiddleware
+
+# Stop oversized uploads while they arrive instead of after they are spooled
+app.add_middleware(UploadSizeLimitMiddleware, paths=["/api/srs/upload"])
 
 # Register routers
 app.include_router(srs.router, prefix="/api", tags=["SRS Processing"])
@@ -25,9 +31,14 @@ app.include_router(srs.router, prefix="/api", tags=["SRS Processing"])
 @app.on_event("startup")
 async def startup_event():
     # Initialize database connection
-    from app.services.database import init_db
+    from services.database import init_db
     await init_db()
     
+    # Start the worker processes that run queued SRS jobs; with several server
+    # processes only the one holding the queue's lease runs them
+    from services.job_queue import worker_pool
+    worker_pool.start()
+    
     # Initialize LangSmith logging if configured
     if os.getenv("LANGCHAIN_API_KEY"):
         import langsmith
@@ -39,8 +50,12 @@ async def startup_event():
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Stop the job workers; interrupted jobs are re-queued on next startup
+    from services.job_queue import worker_pool
+    worker_pool.stop()
+    
     # Close database connection
-    from app.services.database import close_db
+    from services.database import close_db
     await close_db()
 
 # Root endpoint
@@ -52,6 +67,13 @@ async def root():
         "version": app.version,
     }
 
+# Prometheus metrics endpoint
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+async def metrics():
+    from services.metrics import collect_metrics
+    body = await run_in_threadpool(collect_metrics)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,46 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
+
+from services.database import Base
+
+
+class Job(Base):
+    """SRS processing job"""
+    __tablename__ = "jobs"
+
+    id = Column(String(36), primary_key=True)
+    filename = Column(String(255), nullable=False)
+    # SHA-256 of the uploaded document, computed while it is written to disk
+    content_sha256 = Column(String(64), nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False, default="queued")
+    project_id = Column(String(36), nullable=True)
+    error = Column(Text, nullable=True)
+    # Node name -> {"status", "finished_at", "duration", "files"} as the workflow advances
+    progress = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status", "status"),
+        Index("ix_jobs_created_at", "created_at"),
+        Index("ix_jobs_content_sha256", "content_sha256"),
+        Index("ix_jobs_project_id", "project_id"),
+    )
+
+
+class JobEvent(Base):
+    """Progress event emitted while a job runs, streamed to clients over SSE"""
+    __tablename__ = "job_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), nullable=False)
+    type = Column(String(40), nullable=False)
+    data = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_job_events_job_id_id", "job_id", "id"),
+    )
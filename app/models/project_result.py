@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime
+
+from services.database import Base
+
+
+class ProjectResult(Base):
+    """Generated project for a document content hash and pipeline version"""
+    __tablename__ = "project_results"
+
+    content_sha256 = Column(String(64), primary_key=True)
+    pipeline_version = Column(String(64), primary_key=True)
+    project_id = Column(String(36), nullable=False)
+    job_id = Column(String(36), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,128 @@
+import io
+import os
+import uuid
+import asyncio
+import zipfile
+import threading
+import concurrent.futures
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+# Bytes collected before a chunk is handed to the response
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", str(64 * 1024)))
+# Chunks buffered between the archive thread and the response
+ARCHIVE_QUEUE_CHUNKS = 8
+
+
+class ArchiveCancelled(Exception):
+    pass
+
+
+def cached_archive_path(project_dir: Path, version: Optional[str] = None) -> Path:
+    """
+    Where a project's archive is cached; version tells apart the archives of
+    a project that was generated again
+    """
+    suffix = f".{version}.zip" if version else ".zip"
+    return project_dir.with_name(project_dir.name + suffix)
+
+
+class _StreamWriter(io.RawIOBase):
+    """
+    Unseekable file object handing archive bytes to an asyncio queue,
+    and optionally copying them to a cache file
+    """
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop,
+                 cancelled: threading.Event, tee: Optional[io.BufferedWriter] = None):
+        self.queue = queue
+        self.loop = loop
+        self.cancelled = cancelled
+        self.tee = tee
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.cancelled.is_set():
+            raise ArchiveCancelled()
+        self.buffer.extend(data)
+        if len(self.buffer) >= ARCHIVE_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        if self.tee is not None:
+            self.tee.write(chunk)
+        self.put(chunk)
+
+    def put(self, item) -> None:
+        # Blocks while the queue is full, so memory stays bounded by a slow client
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                if self.cancelled.is_set():
+                    future.cancel()
+                    raise ArchiveCancelled()
+
+
+def _build_archive(project_dir: Path, writer: _StreamWriter) -> None:
+    with zipfile.ZipFile(writer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(project_dir.rglob("*")):
+            if path.is_file():
+                archive.write(path, path.relative_to(project_dir).as_posix())
+    writer.flush()
+
+
+async def stream_project_archive(project_dir: Path, version: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP of a generated project as it is built
+
+    - The archive is built in a worker thread, never in memory or a temp file
+    - The bytes are also written to the project's cached archive, which is
+      moved into place only once the archive is complete, replacing the
+      archives of earlier versions
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=ARCHIVE_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    cache_path = cached_archive_path(project_dir, version)
+    partial = cache_path.with_name(f"{cache_path.name}.{uuid.uuid4().hex}.part")
+
+    def build():
+        tee = open(partial, "wb")
+        writer = _StreamWriter(queue, loop, cancelled, tee)
+        try:
+            _build_archive(project_dir, writer)
+            tee.close()
+            os.replace(partial, cache_path)
+            for stale in project_dir.parent.glob(f"{project_dir.name}.*zip"):
+                if stale != cache_path:
+                    stale.unlink(missing_ok=True)
+            writer.put(None)
+        except BaseException as e:
+            tee.close()
+            partial.unlink(missing_ok=True)
+            if not isinstance(e, ArchiveCancelled):
+                writer.put(e)
+
+    task = loop.run_in_executor(None, build)
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        await task
@@ -1,4 +1,5 @@
 import os
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import NullPool
@@ -14,6 +15,10 @@ if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
     print(f"Converted DATABASE_URL: {DATABASE_URL}")
 
+# Schema version recorded by init_db; bump it for model changes that adding
+# tables, nullable columns and indexes cannot migrate, and migrate by hand
+SCHEMA_VERSION = 1
+
 # For SQLite, add check_same_thread=False
 connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
@@ -67,17 +72,68 @@ async def db_session():
         finally:
             await session.close()
 
+def migrate_schema(connection) -> None:
+    """
+    Bring a database created by an earlier version up to date with the models
+
+    - Missing tables are created, and missing nullable columns and indexes
+      are added to existing tables
+    - Raises RuntimeError when the database needs a manual migration: it was
+      recorded at another schema version, or lacks a NOT NULL column that has
+      no server default
+    """
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    if "schema_version" in tables:
+        version = connection.execute(text("SELECT version FROM schema_version")).scalar()
+        if version is not None and version != SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema is at version {version} but this code expects {SCHEMA_VERSION}; migrate it first"
+            )
+
+    preparer = connection.dialect.identifier_preparer
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                missing.append(f"{table.name}.{column.name}")
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+                f"{column.type.compile(dialect=connection.dialect)}"
+            ))
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+    if missing:
+        raise RuntimeError(f"Database is missing required columns {', '.join(missing)}; migrate it first")
+
+    Base.metadata.create_all(connection)
+    connection.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    connection.execute(text("DELETE FROM schema_version"))
+    connection.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": SCHEMA_VERSION})
+
+
 # Initialize database
 async def init_db():
     """
     Initialize database connection
+
+    - Creates the tables, and migrates tables created by earlier versions
+      (see migrate_schema)
     """
-    # In a production environment, you might want to use Alembic for migrations
-    # This is a simple initialization for development
+    # Import models so they are registered on Base.metadata
+    import models.job  # noqa: F401
+    import models.project_result  # noqa: F401
+
     async with engine.begin() as conn:
-        # Uncomment the following line to create tables on startup (development only)
-        # await conn.run_sync(Base.metadata.create_all)
-        pass
+        await conn.run_sync(migrate_schema)
 
 # Close database connection
 async def close_db():
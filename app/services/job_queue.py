@@ -0,0 +1,391 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+# SQLite file holding the durable job queue
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "job_queue.sqlite")
+# Number of worker processes running SRS jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds an idle worker waits before polling the queue again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Attempts before a job that keeps getting interrupted is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds between metric snapshots written by each worker
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "10"))
+# Seconds after which a worker pool that stopped renewing its lease on the
+# queue is considered gone, and a standby process takes over
+JOB_POOL_LEASE_SECONDS = float(os.getenv("JOB_POOL_LEASE_SECONDS", "30"))
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Open the queue database, creating the schema if needed
+    """
+    conn = sqlite3.connect(path or JOB_QUEUE_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_queue (
+            job_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker_pid INTEGER,
+            worker_token TEXT,
+            error TEXT,
+            enqueued_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    """)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(job_queue)")}
+    if "worker_token" not in columns:
+        # Queues created before claims recorded the pool they belong to
+        try:
+            conn.execute("ALTER TABLE job_queue ADD COLUMN worker_token TEXT")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):
+                raise
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_job_queue_claim ON job_queue (status, priority DESC, enqueued_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS worker_pool_lease (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            renewed_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics_snapshots (
+            process TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    return conn
+
+
+def enqueue_job(job_id: str, payload: Dict[str, Any], priority: int = 0, path: Optional[str] = None) -> None:
+    conn = connect(path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO job_queue (job_id, payload, priority, status, attempts, enqueued_at) "
+            "VALUES (?, ?, ?, 'queued', 0, ?)",
+            (job_id, json.dumps(payload), priority, time.time())
+        )
+    finally:
+        conn.close()
+
+
+def claim_job(conn: sqlite3.Connection, worker_pid: int, worker_token: Optional[str] = None) -> Optional[sqlite3.Row]:
+    """
+    Atomically move the highest-priority, oldest queued job to running,
+    recording the worker's pid and the token of the pool it belongs to
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM job_queue WHERE status = 'queued' ORDER BY priority DESC, enqueued_at ASC LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE job_queue SET status = 'running', worker_pid = ?, worker_token = ?, started_at = ?, "
+                "attempts = attempts + 1 WHERE job_id = ?",
+                (worker_pid, worker_token, time.time(), row["job_id"])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def finish_job(conn: sqlite3.Connection, job_id: str, error: Optional[str] = None) -> None:
+    conn.execute(
+        "UPDATE job_queue SET status = ?, error = ?, finished_at = ?, worker_pid = NULL WHERE job_id = ?",
+        ("failed" if error else "done", error, time.time(), job_id)
+    )
+
+
+def acquire_pool_lease(conn: sqlite3.Connection, token: str) -> bool:
+    """
+    Take or renew the queue's worker pool lease for the pool with token
+
+    - Only one pool at a time runs workers on a queue; the lease of a pool
+      that has not renewed it for JOB_POOL_LEASE_SECONDS can be taken over
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT token, renewed_at FROM worker_pool_lease WHERE id = 1").fetchone()
+        now = time.time()
+        acquired = row is None or row["token"] == token or row["renewed_at"] < now - JOB_POOL_LEASE_SECONDS
+        if acquired:
+            conn.execute(
+                "INSERT OR REPLACE INTO worker_pool_lease (id, token, pid, renewed_at) VALUES (1, ?, ?, ?)",
+                (token, os.getpid(), now)
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return acquired
+
+
+def release_pool_lease(conn: sqlite3.Connection, token: str) -> None:
+    conn.execute("DELETE FROM worker_pool_lease WHERE token = ?", (token,))
+
+
+def _fail_job(job_id: str, error: str) -> None:
+    from services.job_store import fail_job
+
+    # Own thread and event loop, since callers may be running inside one
+    thread = threading.Thread(target=lambda: asyncio.run(fail_job(job_id, error)), name="srs-job-fail")
+    thread.start()
+    thread.join()
+
+
+def requeue_orphaned_jobs(conn: sqlite3.Connection, token: str, live_pids: List[int] = ()) -> int:
+    """
+    Put running jobs whose worker has died back on the queue, or fail them
+    once they have used up JOB_MAX_ATTEMPTS
+
+    - Called by the pool holding the lease, with its token and the pids of
+      its live workers; a job claimed under another token belongs to a pool
+      that is gone, so a reused pid cannot pass for its worker
+    - Failed jobs are also failed in the jobs table, with a job_failed event,
+      so status polling and event streams finish and the job can be resumed
+    """
+    rows = conn.execute(
+        "SELECT job_id, worker_pid, worker_token, attempts FROM job_queue WHERE status = 'running'"
+    ).fetchall()
+    requeued = 0
+    for row in rows:
+        if row["worker_token"] == token and row["worker_pid"] in live_pids:
+            continue
+        if row["attempts"] >= JOB_MAX_ATTEMPTS:
+            error = f"Worker died {row['attempts']} times while running the job"
+            cursor = conn.execute(
+                "UPDATE job_queue SET status = 'failed', error = ?, finished_at = ?, worker_pid = NULL "
+                "WHERE job_id = ? AND status = 'running'",
+                (error, time.time(), row["job_id"])
+            )
+            if cursor.rowcount:
+                _fail_job(row["job_id"], error)
+        else:
+            conn.execute(
+                "UPDATE job_queue SET status = 'queued', worker_pid = NULL WHERE job_id = ? AND status = 'running'",
+                (row["job_id"],)
+            )
+            requeued += 1
+    return requeued
+
+
+def get_queue_stats(path: Optional[str] = None) -> Dict[str, int]:
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS count FROM job_queue GROUP BY status").fetchall()
+    finally:
+        conn.close()
+    stats = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    stats.update({row["status"]: row["count"] for row in rows})
+    return stats
+
+
+def save_metrics_snapshot(conn: sqlite3.Connection, process: str, snapshot: Dict[str, Any]) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO metrics_snapshots (process, data, updated_at) VALUES (?, ?, ?)",
+        (process, json.dumps(snapshot), time.time())
+    )
+
+
+def load_metrics_snapshots(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Latest metric snapshot of every worker process, including exited ones so
+    that counters never go backwards while the pool is running
+    """
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT data FROM metrics_snapshots").fetchall()
+    finally:
+        conn.close()
+    return [json.loads(row["data"]) for row in rows]
+
+
+def worker_main(queue_path: str, poll_interval: float, stop_event, token: Optional[str] = None) -> None:
+    """
+    Worker process loop: import the pipeline once, then claim and run jobs
+    on a single long-lived event loop until asked to stop or until the
+    process running its pool exits
+    """
+    # Importing here keeps LangChain / LangGraph warm for every job this worker runs
+    from api.routes.srs import process_srs_document_task
+    from workflow.metrics import get_metrics_snapshot
+    from workflow.llm_scheduler import get_scheduler
+
+    # LLM rate limits are shared by all workers through the queue database
+    get_scheduler().share(queue_path)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    conn = connect(queue_path)
+    pid = os.getpid()
+    parent = os.getppid()
+    process = f"worker-{pid}"
+
+    def flush_metrics():
+        # Own connection, since the main loop's connection is busy claiming jobs
+        metrics_conn = connect(queue_path)
+        try:
+            while not stop_event.wait(METRICS_FLUSH_INTERVAL):
+                save_metrics_snapshot(metrics_conn, process, get_metrics_snapshot())
+        finally:
+            metrics_conn.close()
+
+    flusher = threading.Thread(target=flush_metrics, name="metrics-flush", daemon=True)
+    flusher.start()
+    try:
+        # A pool taking over re-queues the jobs of a pool whose process died
+        while not stop_event.is_set() and os.getppid() == parent:
+            job = claim_job(conn, pid, token)
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+            try:
+                loop.run_until_complete(process_srs_document_task(**json.loads(job["payload"])))
+                finish_job(conn, job["job_id"])
+            except Exception as e:
+                finish_job(conn, job["job_id"], error=str(e))
+            save_metrics_snapshot(conn, process, get_metrics_snapshot())
+    finally:
+        save_metrics_snapshot(conn, process, get_metrics_snapshot())
+        conn.close()
+        # Closes the shared LLM HTTP client of this loop, see workflow.llm_clients
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+class WorkerPool:
+    """
+    Pool of worker processes consuming the SQLite job queue
+
+    - One pool per queue runs workers: the process holding the queue's lease,
+      so starting the API with several server processes does not multiply
+      the workers; the others stand by and take over if that process exits
+    - Jobs left running by a crashed pool are re-queued when a pool takes over
+    - A supervisor thread renews the lease, restarts dead workers and
+      re-queues their job
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_path: str = JOB_QUEUE_PATH,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.workers = workers
+        self.queue_path = queue_path
+        self.poll_interval = poll_interval
+        # Workers are not daemonic so they can run their own parser process pools
+        self._context = multiprocessing.get_context("spawn")
+        self._token: Optional[str] = None
+        self._stop = threading.Event()
+        self._worker_stop = None
+        self._processes: List[multiprocessing.Process] = []
+        self._supervisor: Optional[threading.Thread] = None
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=worker_main,
+            args=(self.queue_path, self.poll_interval, self._worker_stop, self._token),
+            name="srs-job-worker",
+            daemon=False
+        )
+        process.start()
+        return process
+
+    def _take_over(self, conn: sqlite3.Connection) -> bool:
+        """
+        Take the queue's lease and start the workers, unless another process's
+        pool holds it
+        """
+        if not acquire_pool_lease(conn, self._token):
+            return False
+        requeue_orphaned_jobs(conn, self._token)
+        # Metrics restart from zero with the pool, like any restarted exporter
+        conn.execute("DELETE FROM metrics_snapshots")
+        self._worker_stop = self._context.Event()
+        self._processes = [self._spawn() for _ in range(max(1, self.workers))]
+        return True
+
+    def _stop_workers(self, timeout: float) -> None:
+        self._worker_stop.set()
+        deadline = time.time() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.time()))
+        for process in self._processes:
+            if process.is_alive():
+                # Jobs still running are re-queued by the next pool
+                process.terminate()
+                process.join()
+        self._processes = []
+
+    def start(self) -> None:
+        if self._supervisor is not None:
+            return
+        self._token = uuid.uuid4().hex
+        self._stop.clear()
+        conn = connect(self.queue_path)
+        try:
+            self._take_over(conn)
+        finally:
+            conn.close()
+        self._supervisor = threading.Thread(target=self._supervise, name="srs-job-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _supervise(self) -> None:
+        conn = connect(self.queue_path)
+        try:
+            while not self._stop.wait(self.poll_interval * 5):
+                if not self._processes:
+                    self._take_over(conn)
+                    continue
+                if not acquire_pool_lease(conn, self._token):
+                    # Stalled past the lease, and another pool has taken over
+                    self._stop_workers(timeout=0)
+                    continue
+                for index, process in enumerate(self._processes):
+                    if self._stop.is_set():
+                        break
+                    if not process.is_alive():
+                        self._processes[index] = self._spawn()
+                        requeue_orphaned_jobs(conn, self._token, [worker.pid for worker in self._processes])
+        finally:
+            conn.close()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        if self._supervisor is None:
+            return
+        self._stop.set()
+        self._supervisor.join()
+        self._supervisor = None
+        if self._processes:
+            self._stop_workers(timeout)
+            conn = connect(self.queue_path)
+            try:
+                release_pool_lease(conn, self._token)
+            finally:
+                conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._processes),
+            "alive": sum(1 for process in self._processes if process.is_alive()),
+            **get_queue_stats(self.queue_path),
+        }
+
+
+worker_pool = WorkerPool()
@@ -0,0 +1,207 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.database import db_session
+from models.job import Job, JobEvent
+from models.project_result import ProjectResult
+
+
+# Seconds between checks for job events added by other processes (the queue workers)
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", "0.5"))
+
+# Job id -> (loop, event) of every open event stream of this process
+_subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+_watcher: Optional[asyncio.Task] = None
+
+
+async def create_job(
+    session: AsyncSession,
+    job_id: str,
+    filename: str,
+    content_sha256: Optional[str] = None,
+    size_bytes: Optional[int] = None
+) -> Job:
+    job = Job(
+        id=job_id,
+        filename=filename,
+        status="queued",
+        progress={},
+        content_sha256=content_sha256,
+        size_bytes=size_bytes
+    )
+    session.add(job)
+    await session.flush()
+    return job
+
+
+async def get_job(session: AsyncSession, job_id: str) -> Optional[Job]:
+    return await session.get(Job, job_id)
+
+
+async def list_jobs(
+    session: AsyncSession,
+    status: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> Tuple[List[Job], int]:
+    """
+    Return a page of jobs, newest first, and the total number of matching jobs
+    """
+    query = select(Job)
+    count_query = select(func.count()).select_from(Job)
+    if status:
+        query = query.where(Job.status == status)
+        count_query = count_query.where(Job.status == status)
+    query = query.order_by(Job.created_at.desc()).limit(limit).offset(offset)
+    jobs = (await session.execute(query)).scalars().all()
+    total = (await session.execute(count_query)).scalar_one()
+    return list(jobs), total
+
+
+async def list_project_jobs(session: AsyncSession, project_id: str) -> List[Job]:
+    """
+    Jobs that generated or reused a project
+    """
+    query = select(Job).where(Job.project_id == project_id)
+    return list((await session.execute(query)).scalars().all())
+
+
+async def update_job(job_id: str, **fields: Any) -> None:
+    """
+    Update a job from outside a request, e.g. from a queue worker
+    """
+    async with db_session() as session:
+        job = await session.get(Job, job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+
+
+async def record_progress(job_id: str, event: Dict[str, Any]) -> None:
+    """
+    Record a finished workflow node in the job's progress
+    """
+    async with db_session() as session:
+        job = await session.get(Job, job_id)
+        if job is None:
+            return
+        progress = dict(job.progress or {})
+        progress[event["node"]] = {
+            "status": event.get("status", "completed"),
+            "finished_at": event.get("finished_at") or datetime.utcnow().isoformat(),
+            "duration": event.get("duration"),
+            "files": len(event.get("files") or []),
+        }
+        # Reassign so SQLAlchemy sees the JSON column as changed
+        job.progress = progress
+
+
+async def fail_job(job_id: str, error: str) -> None:
+    """
+    Mark a job failed that never got to report its own failure
+    """
+    await update_job(job_id, status="failed", error=error, finished_at=datetime.utcnow())
+    await add_job_event(job_id, "job_failed", {"job_id": job_id, "error": error})
+
+
+async def add_job_event(job_id: str, type: str, data: Dict[str, Any]) -> None:
+    async with db_session() as session:
+        session.add(JobEvent(job_id=job_id, type=type, data=data))
+    _notify(job_id)
+
+
+def _notify(job_id: str) -> None:
+    # Streams may wait on another loop than the one that added the event
+    for loop, event in list(_subscribers.get(job_id, ())):
+        loop.call_soon_threadsafe(event.set)
+
+
+async def _watch_job_events() -> None:
+    """
+    Wake the streams of jobs that got events from other processes
+
+    - One query per poll interval covers every subscribed job of this process
+    """
+    last_ids: Dict[str, int] = {}
+    while _subscribers:
+        job_ids = list(_subscribers)
+        try:
+            async with db_session() as session:
+                rows = (await session.execute(
+                    select(JobEvent.job_id, func.max(JobEvent.id))
+                    .where(JobEvent.job_id.in_(job_ids))
+                    .group_by(JobEvent.job_id)
+                )).all()
+        except Exception as e:
+            # Let the streams query for themselves until the database answers again
+            print(f"Job event watcher failed: {e}")
+            last_ids.clear()
+            rows = []
+            for job_id in job_ids:
+                _notify(job_id)
+        for job_id, last_id in rows:
+            if last_ids.get(job_id) != last_id:
+                last_ids[job_id] = last_id
+                _notify(job_id)
+        await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+
+
+def subscribe_job_events(job_id: str) -> asyncio.Event:
+    """
+    Return an event set whenever the job may have new events
+
+    - Set at once for events added by this process, and within
+      JOB_EVENTS_POLL_INTERVAL for events added by other processes
+    - Call unsubscribe_job_events when the stream closes
+    """
+    global _watcher
+    event = asyncio.Event()
+    _subscribers.setdefault(job_id, set()).add((asyncio.get_running_loop(), event))
+    if _watcher is None or _watcher.done():
+        _watcher = asyncio.create_task(_watch_job_events())
+    return event
+
+
+def unsubscribe_job_events(job_id: str, event: asyncio.Event) -> None:
+    waiters = _subscribers.get(job_id, set())
+    waiters -= {waiter for waiter in waiters if waiter[1] is event}
+    if not waiters:
+        _subscribers.pop(job_id, None)
+
+
+async def list_job_events(session: AsyncSession, job_id: str, after_id: int = 0, limit: int = 100) -> List[JobEvent]:
+    """
+    Return a job's events with an id greater than after_id, oldest first
+    """
+    query = (
+        select(JobEvent)
+        .where(JobEvent.job_id == job_id, JobEvent.id > after_id)
+        .order_by(JobEvent.id)
+        .limit(limit)
+    )
+    return list((await session.execute(query)).scalars().all())
+
+
+async def find_project_result(session: AsyncSession, content_sha256: str, pipeline_version: str) -> Optional[ProjectResult]:
+    return await session.get(ProjectResult, (content_sha256, pipeline_version))
+
+
+async def save_project_result(job_id: str, pipeline_version: str) -> None:
+    """
+    Index a completed job's project by its document hash and pipeline version
+    """
+    async with db_session() as session:
+        job = await session.get(Job, job_id)
+        if job is None or not job.content_sha256 or not job.project_id:
+            return
+        await session.merge(ProjectResult(
+            content_sha256=job.content_sha256,
+            pipeline_version=pipeline_version,
+            project_id=job.project_id,
+            job_id=job.id
+        ))
@@ -0,0 +1,21 @@
+import sys
+import os
+from services.job_queue import worker_pool, load_metrics_snapshots
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from workflow.metrics import get_metrics_snapshot, merge_snapshots, render_metrics
+
+
+def collect_metrics() -> str:
+    """
+    Prometheus exposition of this process's metrics merged with the latest
+    snapshots of the worker processes, plus live queue gauges
+    """
+    stats = worker_pool.stats()
+    gauges = [
+        ("srs_job_queue_depth", "Jobs waiting in the queue", {}, stats["queued"]),
+        ("srs_jobs_in_flight", "Jobs being processed by a worker", {}, stats["running"]),
+        ("srs_job_workers", "Worker processes in the pool", {"state": "configured"}, stats["workers"]),
+        ("srs_job_workers", "Worker processes in the pool", {"state": "alive"}, stats["alive"]),
+    ]
+    snapshots = [get_metrics_snapshot(), *load_metrics_snapshots(worker_pool.queue_path)]
+    return render_metrics(merge_snapshots(snapshots), gauges)
@@ -0,0 +1,91 @@
+import os
+import hashlib
+from pathlib import Path
+from typing import Iterable, Tuple
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Largest accepted upload in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+# Bytes read from the request and written to disk at a time
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Room for multipart boundaries, headers and form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects request bodies to the given paths with 413 as soon as they pass
+    max_bytes, before the multipart parser has spooled them to disk
+
+    - A larger Content-Length is rejected before the body is read
+    - save_upload still enforces the exact limit on the file itself
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str], max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        allowed = self.max_bytes + MULTIPART_OVERHEAD_BYTES
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        declared = int(length) if length.isdigit() else 0
+        received = 0
+        too_large = HTTPException(
+            status_code=413,
+            detail=f"File exceeds the maximum upload size of {self.max_bytes} bytes"
+        )
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            # Raised from inside body parsing; FastAPI passes HTTPExceptions through
+            if declared > allowed:
+                raise too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > allowed:
+                    raise too_large
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def save_upload(file: UploadFile, destination: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[int, str]:
+    """
+    Stream an upload to disk in chunks, hashing it as it is written
+
+    - Writes to a .part file and renames it into place once complete
+    - Raises UploadTooLarge, leaving nothing behind, past max_bytes
+    - Returns the size in bytes and the SHA-256 hex digest
+    """
+    partial = destination.with_name(destination.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+    buffer = await run_in_threadpool(open, partial, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(os.replace, partial, destination)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        partial.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
@@ -0,0 +1,213 @@
+"""
+Per-node benchmark of the SRS processing pipeline
+
+Runs process_srs_document over the sample SRS documents with LLM responses
+replayed from cassettes and reports wall time, CPU time, peak memory and
+token counts for every graph node.
+
+Cassettes and baselines are not committed: the recorded responses depend on
+the prompts and model in use, and timings on the machine. Record them once
+per checkout, then compare later runs against a baseline saved locally:
+
+    # Record cassettes into benchmarks/cassettes (needs GROQ_API_KEY)
+    python benchmarks/run_pipeline.py --record --repeat 1
+
+    # Replay offline, saving a baseline, then compare later runs against it
+    python benchmarks/run_pipeline.py --baseline benchmark_baseline.json --save-baseline
+    python benchmarks/run_pipeline.py --baseline benchmark_baseline.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Metrics compared against the baseline, with the smallest change worth reporting
+COMPARED_METRICS = {
+    "wall_time": 0.01,
+    "cpu_time": 0.01,
+    "peak_memory": 256 * 1024,
+    "prompt_tokens": 1,
+    "completion_tokens": 1,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the SRS processing pipeline per node")
+    parser.add_argument("--documents", default=str(ROOT / "app" / "uploads" / "*" / "*.docx"),
+                        help="glob of SRS documents to run (identical files are run once)")
+    parser.add_argument("--cassettes", default=str(ROOT / "benchmarks" / "cassettes"),
+                        help="directory of recorded LLM responses")
+    parser.add_argument("--record", action="store_true",
+                        help="call the LLM and record cassettes instead of replaying them")
+    parser.add_argument("--latency", default="0",
+                        help='seconds added to each replayed response, or "recorded"')
+    parser.add_argument("--repeat", type=int, default=3, help="runs per document; the median is reported")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative increase over the baseline reported as a regression")
+    return parser.parse_args()
+
+
+def find_documents(pattern: str) -> Dict[str, str]:
+    documents = {}
+    for path in sorted(glob.glob(pattern)):
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+        documents.setdefault(f"{Path(path).stem}-{digest}", path)
+    return documents
+
+
+async def run_once(path: str) -> Dict[str, Any]:
+    from workflow.workflow import process_srs_document
+    from workflow.instrumentation import LLMUsageHandler, add_node_listener, remove_node_listener
+
+    node_runs: List[Dict[str, Any]] = []
+    handler = LLMUsageHandler()
+    add_node_listener(node_runs.append)
+    tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        await process_srs_document(path, callbacks=[handler])
+        total = {
+            "wall_time": time.perf_counter() - wall_start,
+            "cpu_time": time.process_time() - cpu_start,
+            "peak_memory": tracemalloc.get_traced_memory()[1],
+        }
+    finally:
+        tracemalloc.stop()
+        remove_node_listener(node_runs.append)
+
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for run in node_runs:
+        metrics = nodes.setdefault(run["node"], {"runs": 0, "wall_time": 0.0, "cpu_time": 0.0, "peak_memory": 0})
+        metrics["runs"] += 1
+        metrics["wall_time"] += run["wall_time"]
+        metrics["cpu_time"] += run["cpu_time"]
+        metrics["peak_memory"] = max(metrics["peak_memory"], run["peak_memory"] or 0)
+    for name, usage in handler.usage.items():
+        nodes.setdefault(name, {"runs": 0, "wall_time": 0.0, "cpu_time": 0.0, "peak_memory": 0}).update(usage)
+    for metrics in nodes.values():
+        for key in ("llm_calls", "prompt_tokens", "completion_tokens"):
+            metrics.setdefault(key, 0)
+    total.update({
+        key: sum(metrics[key] for metrics in nodes.values())
+        for key in ("llm_calls", "prompt_tokens", "completion_tokens")
+    })
+    return {"total": total, "nodes": nodes}
+
+
+def median_of(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Median of every numeric metric across repeated runs
+    """
+    def merge(values):
+        if isinstance(values[0], dict):
+            keys = {key for value in values for key in value}
+            return {key: merge([value[key] for value in values if key in value]) for key in sorted(keys)}
+        return statistics.median(values)
+    return merge(runs)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    rows = []
+    for document, current in results["documents"].items():
+        previous = baseline.get("documents", {}).get(document)
+        if previous is None:
+            continue
+        sections = [("total", current["total"], previous["total"])] + [
+            (node, metrics, previous["nodes"][node])
+            for node, metrics in current["nodes"].items() if node in previous["nodes"]
+        ]
+        for section, now, before in sections:
+            for metric, min_delta in COMPARED_METRICS.items():
+                if metric not in now or metric not in before:
+                    continue
+                delta = now[metric] - before[metric]
+                change = delta / before[metric] if before[metric] else (0.0 if not delta else float("inf"))
+                rows.append({
+                    "document": document,
+                    "node": section,
+                    "metric": metric,
+                    "baseline": before[metric],
+                    "current": now[metric],
+                    "change": change,
+                    "regression": delta > min_delta and change > threshold,
+                })
+    return rows
+
+
+def main() -> int:
+    args = parse_args()
+    # Must be set before the workflow modules read them
+    os.environ["LLM_CASSETTE_MODE"] = "record" if args.record else "replay"
+    os.environ["LLM_CASSETTE_DIR"] = str(Path(args.cassettes).resolve())
+    os.environ["LLM_CASSETTE_LATENCY"] = args.latency
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    # Parse in-process so parsing shows up in the node's CPU time and memory
+    os.environ["SRS_PARSER_PROCESSES"] = "0"
+    sys.path.insert(0, str(ROOT))
+
+    documents = find_documents(args.documents)
+    if not documents:
+        print(f"No documents match {args.documents}", file=sys.stderr)
+        return 2
+    if not args.record and not any(Path(args.cassettes).glob("*/*.json")):
+        print(f"No cassettes in {args.cassettes}; record them first with --record (needs GROQ_API_KEY)",
+              file=sys.stderr)
+        return 2
+
+    output = Path(args.output).resolve()
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "documents": {},
+    }
+
+    # Generated projects are written relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="srs-benchmark-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for name, path in documents.items():
+            runs = [asyncio.run(run_once(str(Path(cwd, path).resolve()))) for _ in range(max(1, args.repeat))]
+            results["documents"][name] = median_of(runs)
+            total = results["documents"][name]["total"]
+            print(f"{name}: {total['wall_time']:.3f}s wall, {total['cpu_time']:.3f}s CPU, "
+                  f"{total['prompt_tokens']} prompt / {total['completion_tokens']} completion tokens")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if baseline_path is not None and not args.save_baseline and baseline_path.exists():
+        results["comparison"] = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+        regressions = [row for row in results["comparison"] if row["regression"]]
+        for row in regressions:
+            print(f"REGRESSION {row['document']} {row['node']} {row['metric']}: "
+                  f"{row['baseline']:.4g} -> {row['current']:.4g} ({row['change']:+.0%})")
+
+    output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline and baseline_path is not None:
+        baseline_path.write_text(json.dumps(results, indent=2))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import pytest
+
+from workflow.chunking import (
+    chunk_document, deep_merge, find_records, merge_auth_requirements, merge_business_logic, merge_endpoints,
+    merge_tables,
+)
+from workflow.tokens import estimate_tokens
+
+
+def test_duplicate_endpoints_across_chunks_are_merged():
+    merged = merge_endpoints([
+        {"endpoints": [
+            {"method": "get", "path": "/api/users/", "description": "List users"},
+            {"method": "POST", "path": "/api/users"},
+        ]},
+        # The same endpoints again, spelled differently and with more detail
+        [{"method": "GET", "path": "api/Users", "parameters": [{"name": "page"}]}],
+        {"api_endpoints": [{"http_method": "POST", "route": "/api/users", "description": "Create a user"}]},
+    ])
+
+    assert merged == {"endpoints": [
+        {"method": "get", "path": "/api/users/", "description": "List users", "parameters": [{"name": "page"}]},
+        # Fields under other names are kept alongside
+        {"method": "POST", "path": "/api/users", "http_method": "POST", "route": "/api/users",
+         "description": "Create a user"},
+    ]}
+
+
+def test_endpoints_differing_in_method_are_kept_apart():
+    merged = merge_endpoints([
+        {"endpoints": [{"method": "GET", "path": "/users/{id}"}]},
+        {"endpoints": [{"method": "DELETE", "path": "/users/{id}"}]},
+    ])
+    assert [endpoint["method"] for endpoint in merged["endpoints"]] == ["GET", "DELETE"]
+
+
+def test_conflicting_fields_keep_the_first_value_and_union_lists():
+    merged = merge_tables([
+        {"tables": [{"name": "Users", "columns": [{"name": "id", "type": "int"}], "description": "Accounts"}]},
+        {"tables": [
+            {"name": "users", "columns": [{"name": "id", "type": "int"}, {"name": "email", "type": "str"}],
+             "description": "People who log in"},
+            {"table_name": "orders", "columns": []},
+        ]},
+    ])
+
+    assert merged == {"tables": [
+        {
+            "name": "Users",
+            "columns": [{"name": "id", "type": "int"}, {"name": "email", "type": "str"}],
+            "description": "Accounts",
+        },
+        {"table_name": "orders", "columns": []},
+    ]}
+
+
+def test_empty_values_are_filled_from_later_chunks():
+    merged = merge_tables([
+        {"tables": [{"name": "users", "description": "", "primary_key": None}]},
+        {"tables": [{"name": "users", "description": "Accounts", "primary_key": "id"}]},
+    ])
+    assert merged["tables"] == [{"name": "users", "description": "Accounts", "primary_key": "id"}]
+
+
+def test_records_without_a_key_are_deduplicated_by_content():
+    merged = merge_tables([
+        {"tables": [{"columns": [{"name": "id"}]}]},
+        {"tables": [{"columns": [{"name": "id"}]}, {"columns": []}]},
+    ])
+    assert merged["tables"] == [{"columns": [{"name": "id"}]}, {"columns": []}]
+
+
+def test_business_logic_is_merged_by_name_keeping_other_sections():
+    merged = merge_business_logic([
+        {"business_logic": [{"name": "Leave approval", "description": "Managers approve"}]},
+        {"rules": [{"name": "leave approval", "steps": ["submit", "approve"]}, {"title": "Payroll"}]},
+        # A chunk without any rule records still contributes its other findings
+        {"validations": ["email must be unique"]},
+    ])
+
+    assert merged == {
+        "business_logic": [
+            {"name": "Leave approval", "description": "Managers approve", "steps": ["submit", "approve"]},
+            {"title": "Payroll"},
+        ],
+        "validations": ["email must be unique"],
+    }
+
+
+def test_auth_requirements_are_deep_merged():
+    merged = merge_auth_requirements([
+        {"authentication_methods": ["JWT"], "roles": [{"name": "admin"}], "token_expiry": "1h"},
+        {"authentication_methods": ["JWT", "OAuth2"], "roles": [{"name": "employee"}], "token_expiry": "24h"},
+        ["HTTPS only"],
+        "not an object",
+    ])
+
+    assert merged == {
+        "authentication_methods": ["JWT", "OAuth2"],
+        "roles": [{"name": "admin"}, {"name": "employee"}],
+        # The first chunk's value wins a conflict
+        "token_expiry": "1h",
+        "requirements": ["HTTPS only"],
+    }
+
+
+@pytest.mark.parametrize("result, expected", [
+    ([{"a": 1}, "stray"], [{"a": 1}]),
+    ({"endpoints": [{"a": 1}], "other": [{"b": 2}]}, [{"a": 1}]),
+    ({"data": [{"b": 2}]}, [{"b": 2}]),
+    ({"note": "none found"}, []),
+    (None, []),
+])
+def test_find_records(result, expected):
+    assert find_records(result, ("endpoints",)) == expected
+
+
+def test_deep_merge_nested_dicts():
+    assert deep_merge({"a": {"b": 1, "c": []}}, {"a": {"c": [1], "d": 2}}) == {"a": {"b": 1, "c": [1], "d": 2}}
+
+
+def test_chunks_respect_the_token_budget():
+    sections = [f"{number}. Section {number}\n" + "The system shall do something useful. " * 40 for number in range(1, 6)]
+    text = "\n".join(sections)
+
+    chunks = chunk_document(text, max_tokens=200)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+    assert len(chunk_document(text, max_tokens=100000)) == 1
@@ -0,0 +1,107 @@
+import itertools
+
+import pytest
+from langchain_core.outputs import Generation
+
+import workflow.llm_cache as llm_cache
+from workflow.llm_cache import SQLiteLLMCache
+
+LLM = "groq:llama3:temperature=0.2"
+
+
+class Clock:
+    # Strictly increasing timestamps, so the access order never ties
+    def __init__(self):
+        self._ticks = itertools.count(1)
+
+    def time(self) -> float:
+        return float(next(self._ticks))
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(llm_cache, "time", Clock())
+
+
+def entry_size(tmp_path) -> int:
+    probe = SQLiteLLMCache(str(tmp_path / "probe.sqlite"))
+    probe.update("prompt 0", LLM, [Generation(text="response 0")])
+    return probe.stats()["size_bytes"]
+
+
+def keys(cache: SQLiteLLMCache):
+    return {prompt for prompt in (f"prompt {number}" for number in range(10)) if cache.lookup(prompt, LLM)}
+
+
+def test_hit_and_miss_accounting(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"))
+
+    assert cache.lookup("prompt", LLM) is None
+    cache.update("prompt", LLM, [Generation(text="response")])
+    assert [generation.text for generation in cache.lookup("prompt", LLM)] == ["response"]
+    # Same prompt for another model or temperature
+    assert cache.lookup("prompt", "groq:llama3:temperature=0.7") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    size = entry_size(tmp_path)
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_bytes=3 * size)
+    for number in range(3):
+        cache.update(f"prompt {number}", LLM, [Generation(text=f"response {number}")])
+    # Reading prompt 0 makes prompt 1 the least recently used
+    assert cache.lookup("prompt 0", LLM) is not None
+
+    cache.update("prompt 3", LLM, [Generation(text="response 3")])
+
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["size_bytes"] <= 3 * size
+    assert keys(cache) == {"prompt 0", "prompt 2", "prompt 3"}
+
+
+def test_filling_far_past_the_limit_keeps_the_newest(tmp_path):
+    size = entry_size(tmp_path)
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_bytes=2 * size)
+    for number in range(6):
+        cache.update(f"prompt {number}", LLM, [Generation(text=f"response {number}")])
+
+    assert keys(cache) == {"prompt 4", "prompt 5"}
+
+
+def test_replacing_an_entry_does_not_count_it_twice(tmp_path):
+    size = entry_size(tmp_path)
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_bytes=2 * size)
+    cache.update("prompt 0", LLM, [Generation(text="response 0")])
+    cache.update("prompt 1", LLM, [Generation(text="response 1")])
+    cache.update("prompt 1", LLM, [Generation(text="response 9")])
+
+    assert keys(cache) == {"prompt 0", "prompt 1"}
+    assert cache.stats()["size_bytes"] == 2 * size
+
+
+def test_entry_larger_than_the_cache_is_not_stored(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_bytes=64)
+    cache.update("prompt", LLM, [Generation(text="x" * 100)])
+    assert cache.stats()["entries"] == 0
+
+
+def test_unreadable_entry_counts_as_a_miss(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"))
+    cache.update("prompt", LLM, [Generation(text="response")])
+    cache._conn.execute("UPDATE llm_cache SET response = ?", ('["not a serialized generation"]',))
+
+    assert cache.lookup("prompt", LLM) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteLLMCache(path).update("prompt", LLM, [Generation(text="response")])
+
+    cache = SQLiteLLMCache(path)
+    assert cache.lookup("prompt", LLM)[0].text == "response"
+    cache.clear()
+    assert cache.lookup("prompt", LLM) is None
@@ -0,0 +1,164 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import workflow.workflow as workflow
+from workflow.workflow import (
+    GraphState, NODE_ARTIFACTS, apply_update, find_broken_nodes, pick_regeneration_target,
+    run_generation_node, validate_output,
+)
+
+VALID_MODEL = "class User:\n    pass\n"
+BROKEN_MODEL = "class User(:\n    pass\n"
+
+
+@pytest.fixture(autouse=True)
+def static_validation(monkeypatch):
+    # Static checks only: no smoke test subprocess and no LLM review
+    monkeypatch.setattr(workflow, "SMOKE_TEST_ENABLED", False)
+    monkeypatch.setattr(workflow, "VALIDATION_MODE", "static")
+    monkeypatch.setattr(workflow, "get_llm", lambda **kwargs: None)
+
+
+def write(project: Path, path: str, code: str) -> str:
+    target = project / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(code)
+    return str(target)
+
+
+def make_state(project: Path, files, **values) -> GraphState:
+    """
+    A project whose generated files are tagged with the artifact that wrote
+    them, as run_generation_node tags them
+    """
+    generated = []
+    for path, code, artifact, *source in files:
+        entry = {"path": write(project, path, code), "type": "file", "artifact": artifact}
+        if source:
+            entry["source"] = source[0]
+        generated.append(entry)
+    return GraphState(
+        project_id=project.name,
+        project_path=str(project),
+        generated_files=generated,
+        # Every node has produced its artifact, so none is blamed for producing nothing
+        artifact_versions={artifacts["produces"][0]: "v1" for artifacts in NODE_ARTIFACTS.values()},
+        **values
+    )
+
+
+def test_broken_model_module_is_regenerated(tmp_path):
+    state = make_state(tmp_path, [("app/models/user.py", BROKEN_MODEL, "model_files")])
+
+    update = validate_output(state)
+
+    assert update["regeneration_target"] == "generate_database_models"
+    assert update["regeneration_count"] == 1
+    assert not update["validation_results"]["valid"]
+    assert any(issue.startswith("app/models/user.py:1:") for issue in update["validation_results"]["issues"])
+
+
+def test_clean_project_passes_validation(tmp_path):
+    state = make_state(tmp_path, [("app/models/user.py", VALID_MODEL, "model_files")])
+
+    update = validate_output(state)
+
+    assert update["regeneration_target"] is None
+    assert update["validation_results"]["valid"]
+
+
+def test_regeneration_stops_at_the_cap(tmp_path):
+    state = make_state(
+        tmp_path, [("app/models/user.py", BROKEN_MODEL, "model_files")],
+        regeneration_count=2, max_regenerations=3
+    )
+
+    update = validate_output(state)
+
+    assert update["regeneration_count"] == 3
+    assert update["regeneration_target"] is None
+    assert "Maximum regeneration attempts reached" in update["messages"][-1]["content"]
+
+
+def test_template_file_is_reported_not_regenerated(tmp_path):
+    state = make_state(tmp_path, [
+        ("app/models/user.py", VALID_MODEL, "model_files"),
+        ("app/models/base.py", "Base = undefined_base\n", "model_files", "template"),
+    ])
+
+    assert find_broken_nodes(state, {"app/models/base.py": [{"line": 1, "message": "boom"}]}) == {}
+
+    update = validate_output(state)
+
+    assert update["regeneration_target"] is None
+    assert not update["validation_results"]["valid"]
+    assert not update["validation_results"]["regeneration_needed"]
+    assert update["errors"][0]["node"] == "validate_output"
+    assert "app/models/base.py" in update["errors"][0]["error"]
+
+
+def test_issues_are_blamed_on_the_node_that_wrote_the_file(tmp_path):
+    state = make_state(tmp_path, [
+        ("app/models/user.py", VALID_MODEL, "model_files"),
+        ("app/api/routes/users.py", "router = None\n", "route_files"),
+    ])
+
+    broken = find_broken_nodes(state, {
+        "app/api/routes/users.py": [{"line": 2, "message": "GET /users returned 500"}],
+        "app/unknown.py": [{"line": 1, "message": "not generated"}],
+    })
+
+    assert broken == {"generate_api_routes": ["app/api/routes/users.py:2: GET /users returned 500"]}
+
+
+def test_node_that_produced_no_files_is_broken(tmp_path):
+    state = make_state(tmp_path, [], database_schema=[{"name": "users"}])
+    state.artifact_versions.pop("model_files")
+
+    assert find_broken_nodes(state, {}) == {
+        "generate_database_models": ["generate_database_models produced no files"]
+    }
+
+
+def test_regeneration_target_covers_downstream_nodes():
+    # Regenerating the models also regenerates the routes built on them
+    assert pick_regeneration_target(["generate_api_routes", "generate_database_models"]) == "generate_database_models"
+    assert pick_regeneration_target(["generate_documentation"]) == "generate_documentation"
+
+
+def test_renamed_file_is_removed(tmp_path, monkeypatch):
+    state = make_state(tmp_path, [
+        ("app/models/order.py", BROKEN_MODEL, "model_files"),
+        ("app/models/base.py", "", "model_files", "template"),
+    ])
+    old_path = tmp_path / "app" / "models" / "order.py"
+
+    def regenerate(state):
+        # The new version writes the model under another name, and rewrites the template
+        return {"generated_files": [
+            {"path": write(tmp_path, "app/models/orders.py", VALID_MODEL), "type": "file"},
+            {"path": write(tmp_path, "app/models/base.py", ""), "type": "file", "source": "template"},
+        ]}
+
+    monkeypatch.setitem(workflow.GENERATION_NODES, "generate_database_models", regenerate)
+    update = asyncio.run(run_generation_node("generate_database_models", state))
+    state = apply_update(state, update)
+
+    assert not old_path.exists()
+    assert sorted(Path(entry["path"]).name for entry in state.generated_files) == ["base.py", "orders.py"]
+    assert find_broken_nodes(state, {"app/models/order.py": [{"line": 1, "message": "invalid syntax"}]}) == {}
+
+
+def test_failed_regeneration_keeps_previous_files(tmp_path, monkeypatch):
+    state = make_state(tmp_path, [("app/models/order.py", VALID_MODEL, "model_files")])
+
+    monkeypatch.setitem(
+        workflow.GENERATION_NODES, "generate_database_models",
+        lambda state: {"messages": [{"role": "system", "content": "Error generating database models"}]}
+    )
+    update = asyncio.run(run_generation_node("generate_database_models", state))
+
+    assert (tmp_path / "app" / "models" / "order.py").exists()
+    assert "generated_files" not in update
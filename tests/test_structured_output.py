@@ -0,0 +1,170 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.prompts import PromptTemplate
+
+import workflow.structured_output as structured_output
+from workflow.metrics import PARSE_FAILURES
+from workflow.structured_output import (
+    APIEndpoints, generate_file, invoke_structured, parse_code_output, parse_files_output, parse_json_output,
+)
+
+PROMPT = PromptTemplate.from_template("Generate {thing}")
+CODE = "from fastapi import APIRouter\n\nrouter = APIRouter()"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('[{"a": 1}]', [{"a": 1}]),
+    ('Here you go:\n```json\n{"a": 1}\n```', {"a": 1}),
+    # Any language tag, or none
+    ('```JSON5\n{"a": 1}\n```', {"a": 1}),
+    ('```\n{"a": 1}\n```', {"a": 1}),
+    # Trailing commas
+    ('{"a": [1, 2,],}', {"a": [1, 2]}),
+    # The first block that parses wins over invalid ones
+    ('```\nnot json\n```\n```json\n{"a": 2}\n```', {"a": 2}),
+    # Embedded in prose, skipping a citation-like list
+    ('See [1] for details: {"a": {"b": true}} as requested', {"a": {"b": True}}),
+    ('The records are [{"a": 1}, {"a": 2}].', [{"a": 1}, {"a": 2}]),
+])
+def test_parse_json_output(text, expected):
+    assert parse_json_output(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "No JSON here", "Only a citation [1] and [2, 3]", '```json\n{"a": \n```'])
+def test_parse_json_output_without_json(text):
+    with pytest.raises(ValueError):
+        parse_json_output(text)
+
+
+@pytest.mark.parametrize("text, expected", [
+    (f"```python\n{CODE}\n```", CODE),
+    # Any language tag, and prose around the block
+    (f"Here is the module:\n```Python3\n{CODE}\n```\nDone.", CODE),
+    (f"```\n{CODE}\n```", CODE),
+    # Only the first block is the file
+    (f"```py\n{CODE}\n```\n```py\nprint('usage')\n```", CODE),
+    # Cut off before the closing fence
+    (f"```py\n{CODE}\n", CODE),
+    # Bare code without any fence
+    (f"{CODE}\n", CODE),
+])
+def test_parse_code_output(text, expected):
+    assert parse_code_output(text) == {"code": expected}
+
+
+@pytest.mark.parametrize("text", ["", "Sorry", "I cannot do that.", "Done"])
+def test_parse_code_output_without_code(text):
+    with pytest.raises(ValueError):
+        parse_code_output(text)
+
+
+def test_parse_files_output():
+    text = "**app/models/user.py**\n```python\nclass User: pass\n```\n"
+    assert parse_files_output(text) == {"files": [{"path": "app/models/user.py", "code": "class User: pass\n"}]}
+    with pytest.raises(ValueError):
+        parse_files_output("No files")
+
+
+class ToolCallingFakeModel(GenericFakeChatModel):
+    """
+    Replays the given messages, or raises the given exceptions, ignoring bound tools
+    """
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        return self
+
+    def _generate(self, *args: Any, **kwargs: Any):
+        message = next(self.messages)
+        if isinstance(message, Exception):
+            raise message
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class ToolUseFailed(Exception):
+    # Shaped like the 400 Groq returns when a tool call does not parse
+    def __init__(self, failed_generation: str):
+        super().__init__("Failed to call a function")
+        self.body = {"error": {"code": "tool_use_failed", "failed_generation": failed_generation}}
+
+
+def failures(stage: str) -> float:
+    return sum(value for (node, label), value in PARSE_FAILURES.values() if label == stage)
+
+
+def invoke(message, schema=APIEndpoints, parse_text=parse_json_output):
+    return invoke_structured(PROMPT, ToolCallingFakeModel(messages=iter([message])), {"thing": "x"}, schema, parse_text)
+
+
+@pytest.fixture
+def tools_mode(monkeypatch):
+    monkeypatch.setattr(structured_output, "LLM_OUTPUT_MODE", "tools")
+
+
+def tool_call(name: str, args: Any) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call_1"}])
+
+
+def test_tools_mode_validates_the_tool_call(tools_mode):
+    result = invoke(tool_call("APIEndpoints", {"endpoints": [{"method": "GET", "path": "/users"}]}))
+    assert result == {"endpoints": [{"method": "GET", "path": "/users"}]}
+
+
+def test_tools_mode_keeps_arguments_that_miss_the_schema(tools_mode):
+    before = failures("schema")
+    assert invoke(tool_call("APIEndpoints", {"routes": ["/users"]})) == {"routes": ["/users"]}
+    assert failures("schema") == before + 1
+
+
+def test_tools_mode_falls_back_to_the_text_answer(tools_mode):
+    before = failures("schema")
+    result = invoke(AIMessage(content='```json\n{"endpoints": []}\n```'))
+    assert result == {"endpoints": []}
+    assert failures("schema") == before + 1
+
+
+def test_tools_mode_parses_invalid_tool_call_arguments(tools_mode):
+    message = AIMessage(content="", invalid_tool_calls=[
+        {"name": "APIEndpoints", "args": '{"endpoints": [],}', "id": "call_1", "error": "invalid JSON"}
+    ])
+    assert invoke(message) == {"endpoints": []}
+
+
+def test_tools_mode_parses_the_rejected_generation(tools_mode):
+    assert invoke(ToolUseFailed('{"endpoints": [{"method": "GET", "path": "/"}]}')) == {
+        "endpoints": [{"method": "GET", "path": "/"}]
+    }
+
+
+def test_other_errors_are_raised(tools_mode):
+    with pytest.raises(RuntimeError):
+        invoke(RuntimeError("connection reset"))
+
+
+def test_unparseable_answer_is_counted(tools_mode):
+    before = failures("text")
+    with pytest.raises(ValueError):
+        invoke(AIMessage(content="I could not find any endpoints."))
+    assert failures("text") == before + 1
+
+
+@pytest.mark.parametrize("mode, message", [
+    ("tools", tool_call("GeneratedFile", {"path": "app/api/routes/users.py", "code": CODE + "\n"})),
+    ("tools", AIMessage(content=f"```python\n{CODE}\n```")),
+    ("text", AIMessage(content=f"Here it is:\n```py\n{CODE}\n")),
+])
+def test_generate_file(monkeypatch, mode, message):
+    monkeypatch.setattr(structured_output, "LLM_OUTPUT_MODE", mode)
+    llm = ToolCallingFakeModel(messages=iter([message]))
+    assert asyncio.run(generate_file(PROMPT, llm, {"thing": "x"})) == CODE
+
+
+def test_generate_file_without_code(tools_mode):
+    llm = ToolCallingFakeModel(messages=iter([tool_call("GeneratedFile", {"path": "x.py", "code": "  "})]))
+    with pytest.raises(ValueError):
+        asyncio.run(generate_file(PROMPT, llm, {"thing": "x"}))
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult, LLMResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+# off | record | replay
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "cassettes")
+# Seconds added to every replayed response, or "recorded" to replay the recorded latency
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "0")
+
+
+class CassetteMissError(KeyError):
+    pass
+
+
+class _ChunkCollector(AsyncCallbackHandler):
+    """
+    Hands the chunks streamed by the wrapped model to the recording cassette
+    as they arrive
+    """
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def on_llm_new_token(self, token: str, *, chunk: Optional[ChatGenerationChunk] = None, **kwargs: Any) -> None:
+        if chunk is not None:
+            await self.queue.put(chunk)
+
+
+def _chat_result(result: LLMResult) -> ChatResult:
+    return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+
+def _as_chunk(generation: ChatGeneration) -> ChatGenerationChunk:
+    # Whole responses (cache hits, non-streamed records) are streamed as one chunk
+    message = generation.message
+    tool_call_chunks = [
+        {"name": call["name"], "args": json.dumps(call["args"]), "id": call.get("id"), "index": index}
+        for index, call in enumerate(getattr(message, "tool_calls", None) or [])
+    ]
+    return ChatGenerationChunk(
+        message=AIMessageChunk(
+            content=message.content,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            usage_metadata=getattr(message, "usage_metadata", None),
+            tool_call_chunks=tool_call_chunks,
+            id=message.id
+        ),
+        generation_info=generation.generation_info
+    )
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Record/replay chat model
+
+    - record: sends each request through the wrapped model's public API, so
+      its LLM cache still applies, and stores the request and response in a
+      content-addressed cassette file, with the chunks of streamed responses
+    - replay: answers from the cassette files only, never touching the network,
+      streaming the recorded chunks when the caller streams
+    - The key covers the model, temperature, messages, stop words and any
+      bound kwargs such as tools, so different requests never collide; the
+      stream flag is left out since it does not change the response
+    - Existing cassettes are kept; delete them to record again
+    - Callbacks fire once, on this model, the same way in both modes
+    """
+
+    model_name: str
+    temperature: float = 0.0
+    mode: str = "replay"
+    directory: str = LLM_CASSETTE_DIR
+    latency: str = LLM_CASSETTE_LATENCY
+    inner: Optional[BaseChatModel] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature}
+
+    def _request(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "messages": [
+                {"type": message.type, "content": message.content, "tool_calls": getattr(message, "tool_calls", None)}
+                for message in messages
+            ],
+            "stop": stop,
+            "kwargs": json.loads(json.dumps(
+                {key: value for key, value in kwargs.items() if key != "stream"}, sort_keys=True, default=str
+            )),
+        }
+
+    def _path(self, request: Dict[str, Any]) -> Path:
+        key = hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+        return Path(self.directory) / key[:2] / f"{key}.json"
+
+    def _load(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        path = self._path(request)
+        if not path.exists():
+            raise CassetteMissError(f"No cassette recorded for this request ({path})")
+        return json.loads(path.read_text())
+
+    def _save(self, request: Dict[str, Any], result: ChatResult, elapsed: float,
+              chunks: Sequence[ChatGenerationChunk] = ()) -> None:
+        path = self._path(request)
+        if path.exists():
+            # Same request; a response served from the LLM cache would only lose
+            # the recorded chunks and latency
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "request": request,
+            "generations": [
+                {"message": message_to_dict(generation.message), "generation_info": generation.generation_info}
+                for generation in result.generations
+            ],
+            "chunks": [
+                {"message": message_to_dict(chunk.message), "generation_info": chunk.generation_info}
+                for chunk in chunks
+            ] or None,
+            "llm_output": result.llm_output,
+            "latency": elapsed,
+        }
+        # Write then rename so concurrent recorders never leave a partial file
+        partial = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        partial.write_text(json.dumps(record, indent=2, default=str))
+        os.replace(partial, path)
+
+    def _replay_delay(self, record: Dict[str, Any]) -> float:
+        if self.latency == "recorded":
+            return float(record.get("latency") or 0.0)
+        return float(self.latency or 0.0)
+
+    def _result(self, record: Dict[str, Any]) -> ChatResult:
+        return ChatResult(
+            generations=[
+                ChatGeneration(
+                    message=messages_from_dict([generation["message"]])[0],
+                    generation_info=generation.get("generation_info")
+                )
+                for generation in record["generations"]
+            ],
+            llm_output=record.get("llm_output")
+        )
+
+    def _chunks(self, record: Dict[str, Any]) -> List[ChatGenerationChunk]:
+        if not record.get("chunks"):
+            return [_as_chunk(generation) for generation in self._result(record).generations[:1]]
+        return [
+            ChatGenerationChunk(
+                message=messages_from_dict([chunk["message"]])[0],
+                generation_info=chunk.get("generation_info")
+            )
+            for chunk in record["chunks"]
+        ]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        request = self._request(messages, stop, kwargs)
+        if self.mode == "replay":
+            record = self._load(request)
+            time.sleep(self._replay_delay(record))
+            return self._result(record)
+        started = time.perf_counter()
+        result = _chat_result(self.inner.generate([messages], stop=stop, **kwargs))
+        self._save(request, result, time.perf_counter() - started)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        request = self._request(messages, stop, kwargs)
+        if self.mode == "replay":
+            record = await asyncio.to_thread(self._load, request)
+            await asyncio.sleep(self._replay_delay(record))
+            return self._result(record)
+        started = time.perf_counter()
+        result = _chat_result(await self.inner.agenerate([messages], stop=stop, **kwargs))
+        await asyncio.to_thread(self._save, request, result, time.perf_counter() - started)
+        return result
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        request = self._request(messages, stop, kwargs)
+        if self.mode == "replay":
+            record = await asyncio.to_thread(self._load, request)
+            chunks = self._chunks(record)
+            # The recorded latency is spread over the chunks
+            delay = self._replay_delay(record) / len(chunks)
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                yield chunk
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def generate() -> LLMResult:
+            try:
+                # Streamed the same way as stream_file_blocks does
+                return await self.inner.agenerate(
+                    [messages], stop=stop, callbacks=[_ChunkCollector(queue)], **{**kwargs, "stream": True}
+                )
+            finally:
+                await queue.put(None)
+
+        started = time.perf_counter()
+        task = asyncio.ensure_future(generate())
+        chunks = []
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                chunks.append(chunk)
+                yield chunk
+            result = _chat_result(await task)
+        finally:
+            if not task.done():
+                task.cancel()
+        if not chunks:
+            # Answered from the LLM cache, in one piece
+            yield _as_chunk(result.generations[0])
+        await asyncio.to_thread(self._save, request, result, time.perf_counter() - started, chunks)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
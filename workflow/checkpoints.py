@@ -0,0 +1,34 @@
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+
+# SQLite file holding workflow checkpoints, keyed by job id
+WORKFLOW_CHECKPOINT_PATH = os.getenv("WORKFLOW_CHECKPOINT_PATH", "workflow_checkpoints.sqlite")
+# Keep the checkpoints of completed jobs instead of deleting them
+WORKFLOW_KEEP_CHECKPOINTS = os.getenv("WORKFLOW_KEEP_CHECKPOINTS", "false").lower() == "true"
+
+
+@asynccontextmanager
+async def open_checkpointer(path: Optional[str] = None) -> AsyncIterator[AsyncSqliteSaver]:
+    """
+    Open the SQLite checkpointer; every job is a separate thread keyed by its id
+    """
+    async with AsyncSqliteSaver.from_conn_string(path or WORKFLOW_CHECKPOINT_PATH) as checkpointer:
+        yield checkpointer
+
+
+async def has_checkpoint(job_id: str) -> bool:
+    async with open_checkpointer() as checkpointer:
+        return await checkpointer.aget_tuple({"configurable": {"thread_id": job_id}}) is not None
+
+
+async def delete_checkpoints(job_id: str) -> None:
+    """
+    Drop the checkpoints of a finished job unless WORKFLOW_KEEP_CHECKPOINTS is set
+    """
+    if WORKFLOW_KEEP_CHECKPOINTS:
+        return
+    async with open_checkpointer() as checkpointer:
+        await checkpointer.adelete_thread(job_id)
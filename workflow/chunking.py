@@ -0,0 +1,230 @@
+import re
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from workflow.tokens import estimate_tokens
+
+
+HEADING_PATTERNS = [
+    re.compile(r"^#{1,6}\s+\S"),                        # Markdown style headings
+    re.compile(r"^\d+(\.\d+)*\.?\s+[A-Z][^.:;]{0,120}$"),  # Numbered headings, e.g. "3.2 Leave Requests"
+    re.compile(r"^[A-Z][A-Z0-9 &/\-]{3,80}$"),           # Short all-caps headings
+]
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    return bool(line) and any(pattern.match(line) for pattern in HEADING_PATTERNS)
+
+
+def split_sections(text: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Split a document into (heading, body) sections at heading lines
+    """
+    sections = []
+    heading = None
+    lines = []
+    for line in text.splitlines():
+        if is_heading(line):
+            if heading is not None or any(l.strip() for l in lines):
+                sections.append((heading, "\n".join(lines).strip()))
+            heading = line.strip()
+            lines = []
+        else:
+            lines.append(line)
+    if heading is not None or any(l.strip() for l in lines):
+        sections.append((heading, "\n".join(lines).strip()))
+    return sections
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text that exceeds the budget on paragraph, then line, then word boundaries
+    """
+    for separator in ("\n\n", "\n", " "):
+        parts = [part for part in text.split(separator) if part.strip()]
+        if len(parts) > 1:
+            break
+    else:
+        # A single unbreakable run of characters; cut it by estimated size
+        size = max(1, len(text) * max_tokens // max(1, estimate_tokens(text)))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    pieces = []
+    current = []
+    current_tokens = 0
+    for part in parts:
+        part_tokens = estimate_tokens(part)
+        if part_tokens > max_tokens:
+            if current:
+                pieces.append(separator.join(current))
+                current, current_tokens = [], 0
+            pieces.extend(_split_oversized(part, max_tokens))
+            continue
+        if current and current_tokens + part_tokens > max_tokens:
+            pieces.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens
+    if current:
+        pieces.append(separator.join(current))
+    return pieces
+
+
+def chunk_document(text: str, max_tokens: int) -> List[str]:
+    """
+    Pack whole sections into chunks of at most max_tokens
+
+    - Sections are never merged across a chunk boundary
+    - A section larger than the budget is split, repeating its heading on each piece
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_tokens = [], 0
+
+    for heading, body in split_sections(text):
+        section = f"{heading}\n{body}".strip() if heading else body
+        section_tokens = estimate_tokens(section)
+
+        if section_tokens > max_tokens:
+            flush()
+            heading_tokens = estimate_tokens(heading) if heading else 0
+            for piece in _split_oversized(body, max(1, max_tokens - heading_tokens)):
+                chunks.append(f"{heading}\n{piece}" if heading else piece)
+            continue
+
+        if current and current_tokens + section_tokens > max_tokens:
+            flush()
+        current.append(section)
+        current_tokens += section_tokens
+    flush()
+    return chunks
+
+
+def find_records(result: Any, preferred_keys: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Return the list of records from an extraction result, which may be a bare
+    list or an object holding the list under some key
+    """
+    if isinstance(result, list):
+        return [record for record in result if isinstance(record, dict)]
+    if not isinstance(result, dict):
+        return []
+    for key in preferred_keys:
+        if isinstance(result.get(key), list):
+            return find_records(result[key])
+    for value in result.values():
+        if isinstance(value, list) and any(isinstance(record, dict) for record in value):
+            return find_records(value)
+    return []
+
+
+def _first(record: Dict[str, Any], keys: Iterable[str]) -> Optional[str]:
+    for key in keys:
+        value = record.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
+def deep_merge(left: Any, right: Any) -> Any:
+    """
+    Merge two extraction values: dicts recursively, lists as an ordered union,
+    scalars keep the first non-empty value
+    """
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = deep_merge(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(left, list) and isinstance(right, list):
+        merged = list(left)
+        seen = {json.dumps(item, sort_keys=True, default=str) for item in left}
+        for item in right:
+            marker = json.dumps(item, sort_keys=True, default=str)
+            if marker not in seen:
+                seen.add(marker)
+                merged.append(item)
+        return merged
+    if left in (None, "", [], {}):
+        return right
+    return left
+
+
+def _merge_records(records: Iterable[Dict[str, Any]], key_func) -> List[Dict[str, Any]]:
+    merged = {}
+    unkeyed = []
+    for record in records:
+        key = key_func(record)
+        if key is None:
+            unkeyed.append(record)
+        elif key in merged:
+            merged[key] = deep_merge(merged[key], record)
+        else:
+            merged[key] = record
+    return list(merged.values()) + deep_merge([], unkeyed)
+
+
+def merge_endpoints(results: List[Any]) -> Dict[str, Any]:
+    """
+    Merge per-chunk endpoint extractions, deduplicating by HTTP method and path
+    """
+    def key(record):
+        method = _first(record, ("method", "http_method", "verb"))
+        path = _first(record, ("path", "route", "endpoint", "url"))
+        if not path:
+            return None
+        return ((method or "").upper(), "/" + path.strip("/").lower())
+
+    records = [record for result in results for record in find_records(result, ("endpoints", "api_endpoints"))]
+    return {"endpoints": _merge_records(records, key)}
+
+
+def merge_tables(results: List[Any]) -> Dict[str, Any]:
+    """
+    Merge per-chunk schema extractions, deduplicating tables by name
+    """
+    def key(record):
+        name = _first(record, ("table_name", "name", "table", "model"))
+        return name.lower() if name else None
+
+    records = [record for result in results for record in find_records(result, ("tables", "models", "database_schema"))]
+    return {"tables": _merge_records(records, key)}
+
+
+def merge_business_logic(results: List[Any]) -> Dict[str, Any]:
+    """
+    Merge per-chunk business logic extractions, deduplicating by name
+    """
+    def key(record):
+        name = _first(record, ("name", "title", "rule", "component"))
+        return name.lower() if name else None
+
+    records = []
+    extras = {}
+    for result in results:
+        found = find_records(result, ("business_logic", "components", "rules"))
+        if found:
+            records.extend(found)
+        elif isinstance(result, dict):
+            extras = deep_merge(extras, result)
+    merged = {"business_logic": _merge_records(records, key)}
+    return deep_merge(merged, extras) if extras else merged
+
+
+def merge_auth_requirements(results: List[Any]) -> Dict[str, Any]:
+    """
+    Deep-merge per-chunk authentication and authorization extractions
+    """
+    merged = {}
+    for result in results:
+        if isinstance(result, list):
+            result = {"requirements": result}
+        if isinstance(result, dict):
+            merged = deep_merge(merged, result)
+    return merged
@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import re
+import zipfile
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+PARAGRAPH = W_NS + "p"
+TABLE = W_NS + "tbl"
+TABLE_ROW = W_NS + "tr"
+TABLE_CELL = W_NS + "tc"
+TEXT = W_NS + "t"
+TAB = W_NS + "tab"
+BREAKS = (W_NS + "br", W_NS + "cr")
+PARAGRAPH_PROPERTIES = W_NS + "pPr"
+PARAGRAPH_STYLE = W_NS + "pStyle"
+OUTLINE_LEVEL = W_NS + "outlineLvl"
+STYLE = W_NS + "style"
+STYLE_NAME = W_NS + "name"
+VAL = W_NS + "val"
+STYLE_ID = W_NS + "styleId"
+
+
+def _load_heading_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """
+    Map paragraph style ids to heading levels using word/styles.xml
+    """
+    levels = {}
+    try:
+        stream = archive.open("word/styles.xml")
+    except KeyError:
+        return levels
+    with stream:
+        for _, elem in ET.iterparse(stream):
+            if elem.tag != STYLE:
+                continue
+            style_id = elem.get(STYLE_ID)
+            name = elem.find(STYLE_NAME)
+            name = (name.get(VAL) or "").lower() if name is not None else ""
+            outline = elem.find(f"{PARAGRAPH_PROPERTIES}/{OUTLINE_LEVEL}")
+            match = re.fullmatch(r"heading (\d)", name)
+            if match:
+                levels[style_id] = int(match.group(1))
+            elif name == "title":
+                levels[style_id] = 1
+            elif outline is not None and (outline.get(VAL) or "").isdigit():
+                levels[style_id] = int(outline.get(VAL)) + 1
+            elem.clear()
+    return levels
+
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == TEXT and node.text:
+            parts.append(node.text)
+        elif node.tag == TAB:
+            parts.append("\t")
+        elif node.tag in BREAKS:
+            parts.append("\n")
+    return "".join(parts).strip()
+
+
+def _heading_level(paragraph: ET.Element, heading_styles: Dict[str, int]) -> Optional[int]:
+    properties = paragraph.find(PARAGRAPH_PROPERTIES)
+    if properties is None:
+        return None
+    outline = properties.find(OUTLINE_LEVEL)
+    if outline is not None and (outline.get(VAL) or "").isdigit():
+        # Level 9 means "body text" in WordprocessingML
+        level = int(outline.get(VAL))
+        return level + 1 if level < 9 else None
+    style = properties.find(PARAGRAPH_STYLE)
+    if style is not None:
+        return heading_styles.get(style.get(VAL))
+    return None
+
+
+def iter_docx_blocks(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream typed blocks out of a .docx file
+
+    - Reads word/document.xml incrementally and discards each element once handled
+    - Yields {"type": "heading", "level", "text"}, {"type": "paragraph", "text"}
+      and {"type": "table_row", "cells"} in document order
+    """
+    with zipfile.ZipFile(path) as archive:
+        heading_styles = _load_heading_styles(archive)
+        with archive.open("word/document.xml") as stream:
+            table_depth = 0
+            # Stacks so nested tables keep their own row and cell buffers
+            rows: List[List[str]] = []
+            cells: List[List[str]] = []
+
+            for event, elem in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == TABLE:
+                        table_depth += 1
+                    elif elem.tag == TABLE_ROW:
+                        rows.append([])
+                    elif elem.tag == TABLE_CELL:
+                        cells.append([])
+                    continue
+
+                if elem.tag == PARAGRAPH:
+                    text = _paragraph_text(elem)
+                    if table_depth and cells:
+                        if text:
+                            cells[-1].append(text)
+                    elif text:
+                        level = _heading_level(elem, heading_styles)
+                        if level:
+                            yield {"type": "heading", "level": level, "text": text}
+                        else:
+                            yield {"type": "paragraph", "text": text}
+                    elem.clear()
+                elif elem.tag == TABLE_CELL:
+                    cell = cells.pop() if cells else []
+                    if rows:
+                        rows[-1].append(" ".join(cell))
+                    elem.clear()
+                elif elem.tag == TABLE_ROW:
+                    row = rows.pop() if rows else []
+                    if any(row):
+                        yield {"type": "table_row", "cells": row}
+                    elem.clear()
+                elif elem.tag == TABLE:
+                    table_depth -= 1
+                    elem.clear()
+
+
+def parse_docx(path: str) -> str:
+    """
+    Parse a .docx file into markdown-like text
+
+    - Blocks are rendered as they are streamed, so only the text is held in memory
+    """
+    return render_blocks(iter_docx_blocks(path))
+
+
+def render_blocks(blocks: Iterable[Dict[str, Any]]) -> str:
+    """
+    Render parsed blocks as markdown-like text, keeping headings and table rows
+    """
+    lines = []
+    previous = None
+    for block in blocks:
+        if block["type"] == "heading":
+            text = "#" * min(block["level"], 6) + " " + block["text"]
+        elif block["type"] == "table_row":
+            text = "| " + " | ".join(cell.replace("|", "\\|") for cell in block["cells"]) + " |"
+        else:
+            text = block["text"]
+        # Table rows stay on consecutive lines; everything else is separated by a blank line
+        if lines:
+            lines.append("\n" if previous == "table_row" and block["type"] == "table_row" else "\n\n")
+        lines.append(text)
+        previous = block["type"]
+    return "".join(lines)
+
+
+_parser_pool: Optional[ProcessPoolExecutor] = None
+_parser_pool_lock = threading.Lock()
+
+
+def get_parser_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Return the worker process pool used for parsing, or None to parse in a thread
+    """
+    global _parser_pool
+    processes = int(os.getenv("SRS_PARSER_PROCESSES", "1"))
+    if processes <= 0:
+        return None
+    with _parser_pool_lock:
+        if _parser_pool is None:
+            # Spawned rather than forked: callers run threads (job workers, the event loop)
+            _parser_pool = ProcessPoolExecutor(
+                max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _parser_pool
@@ -0,0 +1,94 @@
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.prompts import BasePromptTemplate
+
+
+# A line ending in a .py path (in bold, backticks, a heading or after "File:")
+# followed by a fenced code block, captured as (path, code)
+FILE_BLOCK_PATTERN = r"[^\n]*?([\w./-]+\.py)[^\n\w]*\s*```[ \t]*(?:python|py)?[^\n]*\n(.*?)```"
+
+
+class FileBlockParser:
+    """
+    Incremental parser for completions made of file path headers, each
+    followed by a fenced code block
+
+    - feed() returns the (name, code) blocks completed by the new text
+    - Text is only searched again when a backtick arrives, since a block can
+      only complete with its closing fence
+    - Consumed text is dropped, so only the block being written is kept
+    """
+
+    def __init__(self, pattern: str):
+        self._pattern = re.compile(pattern, re.DOTALL)
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        self._buffer += text
+        if "`" not in text:
+            return []
+        blocks = []
+        while True:
+            match = self._pattern.search(self._buffer)
+            if match is None:
+                return blocks
+            blocks.append(match.groups())
+            self._buffer = self._buffer[match.end():]
+
+
+class FileBlockStreamHandler(AsyncCallbackHandler):
+    """
+    Feeds streamed LLM tokens to a FileBlockParser and awaits on_block for
+    every file as soon as its closing fence arrives
+    """
+
+    def __init__(self, parser: FileBlockParser, on_block: Callable[[str, str], Awaitable[None]]):
+        self.parser = parser
+        self.on_block = on_block
+        self.streamed = False
+        self.blocks = 0
+
+    async def _emit(self, text: str) -> None:
+        for name, code in self.parser.feed(text):
+            self.blocks += 1
+            await self.on_block(name, code)
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.streamed = True
+        await self._emit(token)
+
+    async def finish(self, content: str) -> None:
+        # Cached and non-streaming responses arrive in one piece
+        if not self.streamed:
+            await self._emit(content)
+
+
+async def stream_file_blocks(
+    prompt: BasePromptTemplate,
+    llm: BaseChatModel,
+    inputs: Dict[str, Any],
+    on_block: Callable[[str, str], Awaitable[None]],
+    pattern: str = FILE_BLOCK_PATTERN
+) -> int:
+    """
+    Run prompt | llm with a streamed completion, awaiting on_block(path, code)
+    for each file block while the rest of the response is still arriving
+
+    - Goes through ainvoke, so the LLM cache, scheduler and callbacks still apply
+    - The stream=True call kwarg makes chat models use their streaming API
+      inside ainvoke, so tokens reach on_llm_new_token as they arrive
+    - Returns the number of file blocks found
+    """
+    handler = FileBlockStreamHandler(FileBlockParser(pattern), on_block)
+    response = await (prompt | llm.bind(stream=True).with_config(callbacks=[handler])).ainvoke(inputs)
+    await handler.finish(response.content if isinstance(response.content, str) else str(response.content))
+    return handler.blocks
+
+
+def parse_file_blocks(text: str, pattern: str = FILE_BLOCK_PATTERN) -> List[Tuple[str, str]]:
+    """
+    Every (path, code) file block of a complete response
+    """
+    return FileBlockParser(pattern).feed(text)
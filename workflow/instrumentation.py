@@ -0,0 +1,150 @@
+import time
+import asyncio
+import functools
+import threading
+import tracemalloc
+import contextvars
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+# Graph node currently executing in this context, used to attribute LLM usage
+current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_node", default=None)
+
+_listeners: List[Callable[[Dict[str, Any]], None]] = []
+_active_lock = threading.Lock()
+# Names of the nodes currently running, with how many instances of each
+_active_nodes: Dict[str, int] = {}
+
+
+def add_node_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Register a callback receiving the metrics of every finished node
+    """
+    _listeners.append(listener)
+
+
+def remove_node_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def get_active_nodes() -> List[str]:
+    """
+    Names of the graph nodes running in this process right now
+    """
+    with _active_lock:
+        return sorted(_active_nodes)
+
+
+def _start(name: str) -> Dict[str, Any]:
+    with _active_lock:
+        # The tracemalloc peak is process-wide, so it is only reset when no
+        # other node is running; overlapping nodes share their peaks
+        if tracemalloc.is_tracing() and not _active_nodes:
+            tracemalloc.reset_peak()
+        _active_nodes[name] = _active_nodes.get(name, 0) + 1
+    return {
+        "node": name,
+        "wall_start": time.perf_counter(),
+        "cpu_start": time.process_time(),
+        "memory_start": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+    }
+
+
+def _finish(started: Dict[str, Any], error: Optional[BaseException]) -> None:
+    name = started["node"]
+    with _active_lock:
+        _active_nodes[name] -= 1
+        if not _active_nodes[name]:
+            del _active_nodes[name]
+    metrics = {
+        "node": started["node"],
+        "wall_time": time.perf_counter() - started["wall_start"],
+        # Process CPU time, which includes nodes running in parallel with this one
+        "cpu_time": time.process_time() - started["cpu_start"],
+        "peak_memory": (
+            max(0, tracemalloc.get_traced_memory()[1] - started["memory_start"])
+            if started["memory_start"] is not None and tracemalloc.is_tracing() else None
+        ),
+        "error": repr(error) if error is not None else None,
+    }
+    for listener in list(_listeners):
+        listener(metrics)
+
+
+def instrument_node(name: str, func: Callable) -> Callable:
+    """
+    Wrap a graph node so it runs with current_node set and reports its
+    timings and memory to the registered listeners
+    """
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_node(state):
+            token = current_node.set(name)
+            started = _start(name)
+            error = None
+            try:
+                return await func(state)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _finish(started, error)
+                current_node.reset(token)
+        return async_node
+
+    @functools.wraps(func)
+    def node(state):
+        token = current_node.set(name)
+        started = _start(name)
+        error = None
+        try:
+            return func(state)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _finish(started, error)
+            current_node.reset(token)
+    return node
+
+
+def token_usage(response: LLMResult) -> Tuple[int, int]:
+    """
+    Prompt and completion tokens reported for an LLM call
+    """
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += metadata.get("input_tokens", 0)
+            completion_tokens += metadata.get("output_tokens", 0)
+    if not prompt_tokens and not completion_tokens:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """
+    Callback handler totalling LLM calls and token usage per graph node
+    """
+
+    # Run in the caller's context so current_node is visible
+    run_inline = True
+
+    def __init__(self):
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        prompt_tokens, completion_tokens = token_usage(response)
+        node = current_node.get() or "unknown"
+        with self._lock:
+            totals = self.usage.setdefault(node, {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            totals["llm_calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
@@ -0,0 +1,275 @@
+import os
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from workflow.llm_cache import get_llm_cache
+from workflow.llm_scheduler import ScheduledChatGroq
+from workflow.cassette import CassetteChatModel, LLM_CASSETTE_MODE
+
+
+# Connections each shared HTTP client may open to the LLM API
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# Idle connections kept open for reuse
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# Seconds an idle connection is kept before it is closed
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+# Seconds to wait for a response from the LLM API
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+
+
+class PoolStats:
+    """
+    Request counters for one shared HTTP client
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _TrackedAsyncStream(httpx.AsyncByteStream):
+    """
+    Response body that counts its request as in flight until it is closed
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, stats: PoolStats):
+        self._stream = stream
+        self._stats = stats
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._stats.finished()
+
+
+class _TrackedSyncStream(httpx.SyncByteStream):
+
+    def __init__(self, stream: httpx.SyncByteStream, stats: PoolStats):
+        self._stream = stream
+        self._stats = stats
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._stats.finished()
+
+
+class TrackedAsyncTransport(httpx.AsyncHTTPTransport):
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.started()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.stats.finished()
+            raise
+        response.stream = _TrackedAsyncStream(response.stream, self.stats)
+        return response
+
+
+class TrackedTransport(httpx.HTTPTransport):
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.started()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self.stats.finished()
+            raise
+        response.stream = _TrackedSyncStream(response.stream, self.stats)
+        return response
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+    )
+
+
+def _pool_connections(transport: httpx.BaseTransport) -> Tuple[int, int]:
+    # httpx does not expose its connection pool publicly
+    connections = getattr(getattr(transport, "_pool", None), "connections", [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return len(connections), idle
+
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_sync_stats = PoolStats()
+# One async client per event loop, since httpx async connections are bound to a loop,
+# with the async generator that closes it when the loop shuts down
+_async_clients: Dict[int, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient, PoolStats, AsyncIterator[None]]] = {}
+_chat_models: Dict[Tuple[str, float, Optional[int]], BaseChatModel] = {}
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(
+            transport=TrackedTransport(_sync_stats, limits=_limits()),
+            timeout=LLM_REQUEST_TIMEOUT
+        )
+    return _sync_client
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def _register_close(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    """
+    Close client while its event loop is shutting down
+
+    - A client cannot be closed once its loop has closed, since its
+      connections' transports belong to that loop
+    - Event loops close their pending async generators in shutdown_asyncgens(),
+      which asyncio.run calls before closing the loop, so a generator suspended
+      in _close_with_loop closes the client on the right loop at the right time
+    """
+    closer = _close_with_loop(client)
+    try:
+        # Runs up to the yield without awaiting, registering the generator with the running loop
+        closer.asend(None).send(None)
+    except StopIteration:
+        pass
+    return closer
+
+
+def _prune_closed_loops() -> None:
+    # Their clients were closed by the loops' shutdown_asyncgens()
+    for key, (loop, _, _, _) in list(_async_clients.items()):
+        if loop.is_closed():
+            del _async_clients[key]
+            for model_key in [k for k in _chat_models if k[2] == key]:
+                del _chat_models[model_key]
+
+
+def _get_async_client(loop: asyncio.AbstractEventLoop) -> httpx.AsyncClient:
+    entry = _async_clients.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        stats = PoolStats()
+        client = httpx.AsyncClient(
+            transport=TrackedAsyncTransport(stats, limits=_limits()),
+            timeout=LLM_REQUEST_TIMEOUT
+        )
+        entry = (loop, client, stats, _register_close(client))
+        _async_clients[id(loop)] = entry
+    return entry[1]
+
+
+def get_chat_model(model: str, temperature: float) -> BaseChatModel:
+    """
+    Return the shared chat model for a model and temperature
+
+    - Every instance reuses one pooled, keep-alive HTTP client per event loop
+      (plus one for synchronous calls) instead of opening new connections
+    - Requests are paced by the process-wide LLM scheduler
+    - LLM_CASSETTE_MODE=record wraps the model to record its responses;
+      replay answers from recorded cassettes without any network access
+    """
+    if LLM_CASSETTE_MODE == "replay":
+        return CassetteChatModel(model_name=model, temperature=temperature, mode="replay")
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    key = (model, temperature, id(loop) if loop is not None else None)
+    with _lock:
+        _prune_closed_loops()
+        chat_model = _chat_models.get(key)
+        if chat_model is None:
+            chat_model = ScheduledChatGroq(
+                model=model,
+                temperature=temperature,
+                max_tokens=None,
+                timeout=None,
+                # Rate limits and transient errors are retried by the scheduler
+                max_retries=0,
+                api_key=os.getenv("GROQ_API_KEY"),
+                cache=get_llm_cache(),
+                http_client=_get_sync_client(),
+                http_async_client=_get_async_client(loop) if loop is not None else None
+            )
+            if LLM_CASSETTE_MODE == "record":
+                chat_model = CassetteChatModel(
+                    model_name=model,
+                    temperature=temperature,
+                    mode="record",
+                    inner=chat_model
+                )
+            _chat_models[key] = chat_model
+    return chat_model
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Utilization of the shared HTTP clients in this process
+    """
+    clients = []
+    if _sync_client is not None:
+        clients.append(("sync", _sync_client, _sync_stats))
+    clients.extend(("async", client, stats) for _, client, stats, _ in _async_clients.values())
+
+    pools = []
+    for kind, client, stats in clients:
+        connections, idle = _pool_connections(client._transport)
+        active = connections - idle
+        pools.append({
+            "kind": kind,
+            "requests": stats.requests,
+            # In-flight requests include those still waiting for a free connection
+            "in_flight": stats.in_flight,
+            "peak_in_flight": stats.peak_in_flight,
+            "waiting": max(0, stats.in_flight - active),
+            "connections": connections,
+            "idle_connections": idle,
+            "utilization": active / LLM_MAX_CONNECTIONS,
+        })
+    return {
+        "chat_models": len(_chat_models),
+        "max_connections": LLM_MAX_CONNECTIONS,
+        "max_keepalive_connections": LLM_MAX_KEEPALIVE_CONNECTIONS,
+        "pools": pools,
+    }
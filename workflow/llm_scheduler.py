@@ -0,0 +1,475 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+import groq
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_groq import ChatGroq
+from workflow.tokens import estimate_tokens
+
+
+# Provider limits, shared by every process drawing from the same rate state; 0 disables the limit
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "30"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "30000"))
+# Seconds of full-rate traffic the buckets may release at once
+LLM_BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", "10"))
+# Completion tokens assumed for a request that does not set max_tokens
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+# Attempts for a request that keeps hitting rate limits or transient errors
+LLM_SCHEDULER_MAX_ATTEMPTS = int(os.getenv("LLM_SCHEDULER_MAX_ATTEMPTS", "6"))
+# Longest pause after repeated 429s
+LLM_MAX_BACKOFF = float(os.getenv("LLM_MAX_BACKOFF", "60"))
+
+# Job the current LLM call belongs to, used to queue requests per job within a process
+current_job_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_job_id", default=None)
+
+RETRYABLE_ERRORS = (groq.APIConnectionError, groq.InternalServerError)
+
+
+class _Ticket:
+
+    def __init__(self, job_id: str, cost: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.job_id = job_id
+        self.cost = cost
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.enqueued_at = time.time()
+        self.refunded = False
+
+    def grant(self) -> bool:
+        if self.future is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+        except RuntimeError:
+            # The requesting event loop has closed, so nobody is waiting any more
+            return False
+        return True
+
+
+class _SharedState:
+    """
+    Bucket levels and backoff kept in a SQLite row, so that every process
+    using the same file draws from the same limits
+    """
+
+    FIELDS = ("_requests", "_tokens", "_refilled_at", "rate_factor", "backoff", "backoff_until")
+
+    def __init__(self, path: str, key: str = "default"):
+        self.path = path
+        self.key = key
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_rate_limits (
+                    key TEXT PRIMARY KEY,
+                    requests REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    refilled_at REAL NOT NULL,
+                    rate_factor REAL NOT NULL,
+                    backoff REAL NOT NULL,
+                    backoff_until REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    @contextlib.contextmanager
+    def synced(self, scheduler: "LLMScheduler") -> Iterator[None]:
+        """
+        Load the shared state into scheduler, and write it back once the block
+        has updated it, holding the database's write lock throughout
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT requests, tokens, refilled_at, rate_factor, backoff, backoff_until "
+                "FROM llm_rate_limits WHERE key = ?", (self.key,)
+            ).fetchone()
+            if row is not None:
+                for field, value in zip(self.FIELDS, row):
+                    setattr(scheduler, field, value)
+            yield
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_rate_limits VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key, *(getattr(scheduler, field) for field in self.FIELDS))
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class LLMScheduler:
+    """
+    Paces LLM requests to requests-per-minute and tokens-per-minute limits
+
+    - Each request is charged its estimated prompt plus completion tokens
+    - After share(), the buckets live in a SQLite file and the limits hold
+      across every process using it, such as the job queue's workers
+    - Requests waiting in one process are granted round-robin across its
+      jobs, FIFO within a job
+    - A 429 pauses all requests and halves the sending rate, which then
+      recovers gradually as requests succeed
+    - _condition only guards the in-memory queues; the buckets, and the
+      database transactions on shared ones, are guarded by _state_lock so a
+      busy database never blocks submitting requests
+    """
+
+    def __init__(self, rpm: int = LLM_RPM_LIMIT, tpm: int = LLM_TPM_LIMIT, burst_seconds: float = LLM_BURST_SECONDS):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.burst_seconds = burst_seconds
+        self.rate_factor = 1.0
+        self.backoff_until = 0.0
+        self.backoff = 0.0
+        self._requests = self._capacity(rpm)
+        self._tokens = self._capacity(tpm)
+        self._refilled_at = time.time()
+        self._shared: Optional[_SharedState] = None
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._refunds: List[int] = []
+        self._condition = threading.Condition()
+        self._state_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.granted = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+
+    def _capacity(self, limit: int) -> float:
+        return max(1.0, limit * self.burst_seconds / 60) if limit else float("inf")
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.rpm:
+            self._requests = min(self._capacity(self.rpm), self._requests + elapsed * self.rpm * self.rate_factor / 60)
+        if self.tpm:
+            self._tokens = min(self._capacity(self.tpm), self._tokens + elapsed * self.tpm * self.rate_factor / 60)
+
+    def _seconds_until_affordable(self, cost: float) -> float:
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / (self.rpm * self.rate_factor))
+        if self.tpm and self._tokens < cost:
+            wait = max(wait, (cost - self._tokens) * 60 / (self.tpm * self.rate_factor))
+        return wait
+
+    def share(self, path: str) -> None:
+        """
+        Keep the buckets in the SQLite file at path, shared with every other
+        process using it
+        """
+        with self._state_lock:
+            self._shared = _SharedState(path)
+
+    def _synced(self):
+        return self._shared.synced(self) if self._shared is not None else contextlib.nullcontext()
+
+    def _take(self, cost: int) -> float:
+        """
+        Charge a request to the buckets, or return the seconds until it can be
+        """
+        with self._state_lock, self._synced():
+            now = time.time()
+            if now < self.backoff_until:
+                return self.backoff_until - now
+            self._refill(now)
+            # A request larger than the bucket is let through once the bucket is full
+            cost = min(cost, self._capacity(self.tpm))
+            wait = self._seconds_until_affordable(cost)
+            if wait <= 0:
+                self._requests -= 1
+                self._tokens -= cost
+            return wait
+
+    def _refund(self, cost: int) -> None:
+        with self._state_lock, self._synced():
+            self._requests = min(self._capacity(self.rpm), self._requests + 1)
+            self._tokens = min(self._capacity(self.tpm), self._tokens + min(cost, self._capacity(self.tpm)))
+
+    def _refund_ticket(self, ticket: _Ticket) -> None:
+        """
+        Hand a charged ticket that will not be used back to the scheduler
+        thread, which returns its cost to the buckets
+        """
+        with self._condition:
+            if ticket.refunded:
+                return
+            ticket.refunded = True
+            self._refunds.append(ticket.cost)
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queues and not self._refunds:
+                    self._condition.wait()
+                refunds, self._refunds = self._refunds, []
+                ticket = next(iter(self._queues.values()))[0] if self._queues else None
+            for cost in refunds:
+                self._refund(cost)
+            if ticket is None:
+                continue
+            wait = self._take(ticket.cost)
+            with self._condition:
+                queue = self._queues.get(ticket.job_id)
+                if not queue or queue[0] is not ticket:
+                    # Withdrawn while the buckets were being charged
+                    if wait <= 0:
+                        ticket.refunded = True
+                        self._refunds.append(ticket.cost)
+                    continue
+                if wait > 0:
+                    # Other processes may take from shared buckets meanwhile, so check again
+                    self._condition.wait(wait)
+                    continue
+                queue.popleft()
+                # Rotate so the next grant goes to the next job in line
+                del self._queues[ticket.job_id]
+                if queue:
+                    self._queues[ticket.job_id] = queue
+            if not ticket.grant():
+                self._refund_ticket(ticket)
+                continue
+            with self._condition:
+                self.granted += 1
+                self.total_wait += time.time() - ticket.enqueued_at
+
+    def _submit(self, ticket: _Ticket) -> None:
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+                self._thread.start()
+            self._queues.setdefault(ticket.job_id, deque()).append(ticket)
+            self._condition.notify()
+
+    def _withdraw(self, ticket: _Ticket) -> bool:
+        """
+        Take a ticket out of its queue, returning False if it was already granted
+        """
+        with self._condition:
+            queue = self._queues.get(ticket.job_id)
+            if queue is None or ticket not in queue:
+                return False
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.job_id]
+            return True
+
+    def _enabled(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    async def acquire(self, cost: int) -> None:
+        if not self._enabled():
+            return
+        ticket = _Ticket(current_job_id.get() or "default", cost, asyncio.get_running_loop())
+        self._submit(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if not self._withdraw(ticket):
+                # Granted, but the request will never be sent
+                self._refund_ticket(ticket)
+            raise
+
+    def acquire_sync(self, cost: int) -> None:
+        if not self._enabled():
+            return
+        ticket = _Ticket(current_job_id.get() or "default", cost, None)
+        self._submit(ticket)
+        ticket.event.wait()
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """
+        Record a successful request, charging the difference between its
+        estimated and reported tokens
+        """
+        with self._state_lock, self._synced():
+            if actual and self.tpm:
+                self._tokens -= actual - min(estimated, self._capacity(self.tpm))
+            # Recover the sending rate gradually after a 429
+            self.rate_factor = min(1.0, self.rate_factor + 0.1)
+            self.backoff = 0.0
+
+    def rate_limit_hit(self, retry_after: Optional[float]) -> None:
+        """
+        Pause every queued request after a 429 and halve the sending rate
+        """
+        with self._state_lock, self._synced():
+            self.rate_factor = max(0.1, self.rate_factor / 2)
+            self.backoff = min(LLM_MAX_BACKOFF, max(retry_after or 0.0, self.backoff * 2 or 1.0))
+            delay = self.backoff * (1 + random.random() * 0.1)
+            self.backoff_until = max(self.backoff_until, time.time() + delay)
+        with self._condition:
+            self.rate_limited += 1
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "rate_factor": self.rate_factor,
+                "queued": {job_id: len(queue) for job_id, queue in self._queues.items()},
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "average_wait": self.total_wait / self.granted if self.granted else 0.0,
+                "backing_off": time.time() < self.backoff_until,
+                "shared": self._shared is not None,
+            }
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+    return _scheduler
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    return get_scheduler().stats()
+
+
+def _retry_after(error: groq.RateLimitError) -> Optional[float]:
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _reported_tokens(result: ChatResult) -> Optional[int]:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+def _chunk_tokens(chunk: ChatGenerationChunk) -> int:
+    # Groq reports usage on the final chunk of a stream
+    usage = getattr(chunk.message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class ScheduledChatGroq(ChatGroq):
+    """
+    ChatGroq whose requests go through the process-wide LLMScheduler
+    """
+
+    def _estimate_cost(self, messages: List[BaseMessage]) -> int:
+        prompt = sum(estimate_tokens(str(message.content)) for message in messages)
+        return prompt + (self.max_tokens or LLM_EXPECTED_OUTPUT_TOKENS)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        scheduler = get_scheduler()
+        cost = self._estimate_cost(messages)
+        for attempt in range(LLM_SCHEDULER_MAX_ATTEMPTS):
+            scheduler.acquire_sync(cost)
+            try:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except groq.RateLimitError as e:
+                if attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                # The retry is queued again and held until the backoff ends
+                scheduler.rate_limit_hit(_retry_after(e))
+                continue
+            except RETRYABLE_ERRORS:
+                if attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(min(LLM_MAX_BACKOFF, 2 ** attempt))
+                continue
+            scheduler.settle(cost, _reported_tokens(result))
+            return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        scheduler = get_scheduler()
+        cost = self._estimate_cost(messages)
+        for attempt in range(LLM_SCHEDULER_MAX_ATTEMPTS):
+            await scheduler.acquire(cost)
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except groq.RateLimitError as e:
+                if attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                # The scheduler's state may live in a database shared with other processes
+                await asyncio.to_thread(scheduler.rate_limit_hit, _retry_after(e))
+                continue
+            except RETRYABLE_ERRORS:
+                if attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(min(LLM_MAX_BACKOFF, 2 ** attempt))
+                continue
+            await asyncio.to_thread(scheduler.settle, cost, _reported_tokens(result))
+            return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        scheduler = get_scheduler()
+        cost = self._estimate_cost(messages)
+        for attempt in range(LLM_SCHEDULER_MAX_ATTEMPTS):
+            scheduler.acquire_sync(cost)
+            streamed = False
+            reported = 0
+            try:
+                for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    reported += _chunk_tokens(chunk)
+                    yield chunk
+            except groq.RateLimitError as e:
+                # Chunks already handed on cannot be taken back, so only retry before the first one
+                if streamed or attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                scheduler.rate_limit_hit(_retry_after(e))
+                continue
+            except RETRYABLE_ERRORS:
+                if streamed or attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(min(LLM_MAX_BACKOFF, 2 ** attempt))
+                continue
+            scheduler.settle(cost, reported or None)
+            return
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        scheduler = get_scheduler()
+        cost = self._estimate_cost(messages)
+        for attempt in range(LLM_SCHEDULER_MAX_ATTEMPTS):
+            await scheduler.acquire(cost)
+            streamed = False
+            reported = 0
+            try:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    reported += _chunk_tokens(chunk)
+                    yield chunk
+            except groq.RateLimitError as e:
+                if streamed or attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                await asyncio.to_thread(scheduler.rate_limit_hit, _retry_after(e))
+                continue
+            except RETRYABLE_ERRORS:
+                if streamed or attempt == LLM_SCHEDULER_MAX_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(min(LLM_MAX_BACKOFF, 2 ** attempt))
+                continue
+            await asyncio.to_thread(scheduler.settle, cost, reported or None)
+            return
@@ -0,0 +1,246 @@
+import time
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from workflow.instrumentation import add_node_listener, current_node, token_usage
+
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+TOKEN_BUCKETS = (64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2)
+
+
+class Counter:
+    """
+    Monotonic counter, one value per label combination
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets, one set of bucket counts per label combination
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label key: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def values(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return [(key, {"counts": list(counts), "sum": total}) for key, (counts, total) in self._values.items()]
+
+
+_registry: Dict[str, Any] = {}
+
+
+def _register(metric):
+    _registry[metric.name] = metric
+    return metric
+
+
+NODE_DURATION = _register(Histogram(
+    "srs_node_duration_seconds", "Wall time of each workflow node",
+    DURATION_BUCKETS, labels=("node", "status")
+))
+JOB_DURATION = _register(Histogram(
+    "srs_job_duration_seconds", "End-to-end processing time of a job",
+    DURATION_BUCKETS, labels=("status",)
+))
+LLM_LATENCY = _register(Histogram(
+    "srs_llm_request_duration_seconds", "Latency of LLM calls, including scheduler waits and retries",
+    DURATION_BUCKETS, labels=("node", "status")
+))
+LLM_TOKENS = _register(Histogram(
+    "srs_llm_tokens_per_call", "Tokens per LLM call",
+    TOKEN_BUCKETS, labels=("node", "kind")
+))
+LLM_CACHE_LOOKUPS = _register(Counter(
+    "srs_llm_cache_lookups_total", "LLM response cache lookups", labels=("result",)
+))
+UPLOAD_SIZE = _register(Histogram(
+    "srs_upload_size_bytes", "Size of uploaded SRS documents", SIZE_BUCKETS
+))
+PROJECT_CACHE_LOOKUPS = _register(Counter(
+    "srs_project_cache_lookups_total", "Uploads checked against previously generated projects",
+    labels=("result",)
+))
+REGENERATIONS = _register(Counter(
+    "srs_regenerations_total", "Regeneration rounds requested by validation", labels=("target",)
+))
+REGENERATED_NODES = _register(Counter(
+    "srs_regenerated_nodes_total", "Generation nodes re-run or skipped during regeneration",
+    labels=("node", "outcome")
+))
+PARSE_FAILURES = _register(Counter(
+    "srs_llm_parse_failures_total",
+    "LLM answers that did not match their schema (stage=schema) or could not be parsed at all (stage=text)",
+    labels=("node", "stage")
+))
+
+
+def _observe_node(metrics: Dict[str, Any]) -> None:
+    NODE_DURATION.observe(metrics["wall_time"], node=metrics["node"], status="failed" if metrics["error"] else "ok")
+
+
+add_node_listener(_observe_node)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler recording the latency and token counts of every LLM
+    call, labelled with the graph node that made it
+    """
+
+    # Run in the caller's context so current_node is visible
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[float, str]] = {}
+
+    def _start(self, run_id: UUID) -> None:
+        self._started[run_id] = (time.perf_counter(), current_node.get() or "unknown")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started, node = self._started.pop(run_id, (None, current_node.get() or "unknown"))
+        if started is not None:
+            LLM_LATENCY.observe(time.perf_counter() - started, node=node, status="ok")
+        prompt_tokens, completion_tokens = token_usage(response)
+        LLM_TOKENS.observe(prompt_tokens, node=node, kind="prompt")
+        LLM_TOKENS.observe(completion_tokens, node=node, kind="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started, node = self._started.pop(run_id, (None, current_node.get() or "unknown"))
+        if started is not None:
+            LLM_LATENCY.observe(time.perf_counter() - started, node=node, status="error")
+
+
+def get_metrics_snapshot() -> Dict[str, Any]:
+    """
+    JSON-serializable copy of every metric in this process
+    """
+    return {
+        name: {
+            "type": metric.type,
+            "help": metric.help,
+            "labels": list(metric.labels),
+            "buckets": list(getattr(metric, "buckets", ())),
+            "values": [[list(key), value] for key, value in metric.values()],
+        }
+        for name, metric in _registry.items()
+    }
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sum the snapshots of several processes into one
+    """
+    merged: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            if target["buckets"] != metric["buckets"]:
+                # Written by a process running a different bucket layout
+                continue
+            for key, value in metric["values"]:
+                key = tuple(key)
+                current = target["values"].get(key)
+                if metric["type"] == "counter":
+                    target["values"][key] = (current or 0) + value
+                elif current is None:
+                    target["values"][key] = {"counts": list(value["counts"]), "sum": value["sum"]}
+                else:
+                    current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                    current["sum"] += value["sum"]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [(name, value) for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_metrics(merged: Dict[str, Any], gauges: Sequence[Tuple[str, str, Dict[str, Any], float]] = ()) -> str:
+    """
+    Render merged snapshots plus (name, help, labels, value) gauges in the
+    Prometheus text exposition format
+    """
+    lines = []
+    for name in sorted({gauge[0] for gauge in gauges}):
+        samples = [gauge for gauge in gauges if gauge[0] == name]
+        lines.append(f"# HELP {name} {samples[0][1]}")
+        lines.append(f"# TYPE {name} gauge")
+        for _, _, labels, value in samples:
+            lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+
+    for name, metric in sorted(merged.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key, value in sorted(metric["values"].items(), key=lambda item: item[0]):
+            if metric["type"] == "counter":
+                lines.append(f"{name}{_labels(metric['labels'], key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + [float("inf")], value["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(metric['labels'], key, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], key)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(metric['labels'], key)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import contextvars
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional, Tuple
+from workflow.instrumentation import add_node_listener, remove_node_listener, get_active_nodes
+
+
+# Seconds between stack samples while a job is profiled
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Deepest stack kept per sample; deeper frames are cut at the root end
+PROFILE_MAX_DEPTH = int(os.getenv("PROFILE_MAX_DEPTH", "128"))
+
+# Profiler of the job running in this context, if it is being profiled
+current_profiler: contextvars.ContextVar[Optional["JobProfiler"]] = contextvars.ContextVar(
+    "current_profiler", default=None
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+# Threads whose samples are never useful in a job profile
+IGNORED_THREADS = {"llm-scheduler", "job-profiler"}
+
+
+@functools.lru_cache(maxsize=None)
+def _describe(code: CodeType) -> Tuple[str, bool]:
+    """
+    Flamegraph label of a code object and whether it belongs to this repository
+    """
+    path = Path(code.co_filename).resolve()
+    try:
+        filename, in_repo = path.relative_to(ROOT).as_posix(), True
+    except ValueError:
+        filename, in_repo = path.name, False
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})", in_repo
+
+
+def _waiting_for_io(frame: FrameType) -> bool:
+    # An idle event loop sits in the selector until a socket or timer is ready
+    return frame.f_code.co_name in ("select", "poll", "control") and "selectors" in frame.f_code.co_filename
+
+
+class JobProfiler:
+    """
+    Sampling profiler for one job
+
+    - A background thread samples the stacks of every thread in the process,
+      so it relies on a worker process running one job at a time
+    - Each stack is rooted at the graph nodes running when it was taken, so
+      the flamegraph splits the job by node
+    - Samples of the event loop idling in its selector are recorded as
+      <awaiting I/O>, which is where waiting on the LLM API shows up
+    - Other threads with no frames from this repository (idle pool workers) are skipped
+    - Node start and end times are recorded as a timeline
+    """
+
+    def __init__(self, job_id: str, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.timeline: List[Dict[str, Any]] = []
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._started_at = 0.0
+        self._duration = 0.0
+
+    def _on_node_finished(self, metrics: Dict[str, Any]) -> None:
+        end = time.perf_counter() - self._started
+        self.timeline.append({
+            "node": metrics["node"],
+            "start": max(0.0, end - metrics["wall_time"]),
+            "end": end,
+            "wall_time": metrics["wall_time"],
+            "cpu_time": metrics["cpu_time"],
+            "error": metrics["error"],
+        })
+
+    def _stack(self, thread_name: str, frame: FrameType, keep: bool) -> Optional[Tuple[str, ...]]:
+        frames = []
+        in_repo = False
+        leaf = frame
+        while frame is not None:
+            label, repo_frame = _describe(frame.f_code)
+            in_repo = in_repo or repo_frame
+            frames.append(label)
+            frame = frame.f_back
+        if not (in_repo or keep):
+            return None
+        frames = frames[:PROFILE_MAX_DEPTH]
+        frames.reverse()
+        if _waiting_for_io(leaf):
+            frames.append("<awaiting I/O>")
+        nodes = "+".join(get_active_nodes()) or "<no node>"
+        return (nodes, thread_name, *frames)
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            if ident == own or name in IGNORED_THREADS:
+                continue
+            if ident == self._loop_thread:
+                stack = self._stack("event-loop", frame, keep=True)
+            else:
+                stack = self._stack(name, frame, keep=False)
+            if stack is not None:
+                self.stacks[stack] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        """
+        Start sampling; called from the thread running the job's event loop
+        """
+        self._loop_thread = threading.get_ident()
+        self._started = time.perf_counter()
+        self._started_at = time.time()
+        add_node_listener(self._on_node_finished)
+        self._thread = threading.Thread(target=self._run, name="job-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> bool:
+        """
+        Stop sampling; returns False if it was already stopped
+        """
+        if self._stop.is_set():
+            return False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        remove_node_listener(self._on_node_finished)
+        self._duration = time.perf_counter() - self._started
+        return True
+
+    def collapsed(self) -> str:
+        """
+        Stacks in the collapsed format read by flamegraph.pl and speedscope
+        """
+        return "".join(
+            f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        nodes: Dict[str, Dict[str, int]] = {}
+        functions: Counter = Counter()
+        for stack, count in self.stacks.items():
+            totals = nodes.setdefault(stack[0], {"samples": 0, "awaiting_io": 0})
+            totals["samples"] += count
+            if stack[-1] == "<awaiting I/O>":
+                totals["awaiting_io"] += count
+            else:
+                functions[stack[-1]] += count
+        return {
+            "job_id": self.job_id,
+            "started_at": self._started_at,
+            "duration": self._duration,
+            "sample_interval": self.interval,
+            "samples": self.samples,
+            "nodes": sorted(self.timeline, key=lambda entry: entry["start"]),
+            "samples_by_node": nodes,
+            "top_functions": [
+                {"function": function, "samples": count}
+                for function, count in functions.most_common(25)
+            ],
+        }
+
+    def write(self, directory: Path) -> Dict[str, str]:
+        """
+        Write profile.collapsed and profile_timeline.json into directory
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        collapsed_path = directory / "profile.collapsed"
+        timeline_path = directory / "profile_timeline.json"
+        collapsed_path.write_text(self.collapsed())
+        timeline_path.write_text(json.dumps(self.summary(), indent=2))
+        return {"flamegraph": str(collapsed_path), "timeline": str(timeline_path)}
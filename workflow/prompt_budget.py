@@ -0,0 +1,118 @@
+import os
+import json
+from typing import Any, Dict, Tuple
+from langchain.prompts import PromptTemplate
+from workflow.tokens import estimate_tokens
+
+
+# Largest number of input tokens a single generation or validation prompt may use
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "24000"))
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _render(value: Any) -> str:
+    return value if isinstance(value, str) else compact_json(value)
+
+
+def _truncate_text(text: str, max_tokens: int) -> str:
+    marker = " ...[truncated]"
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= estimate_tokens(marker):
+        return ""
+    keep = len(text) * (max_tokens - estimate_tokens(marker)) // max(1, estimate_tokens(text))
+    return text[:max(0, keep)] + marker
+
+
+def shrink(value: Any, max_tokens: int) -> Any:
+    """
+    Reduce a value to roughly max_tokens of compact JSON
+
+    - Lists keep their leading items and note how many were omitted
+    - Dicts shrink their largest member first
+    - Strings are truncated
+    """
+    if estimate_tokens(_render(value)) <= max_tokens:
+        return value
+    if isinstance(value, list):
+        low, high = 0, len(value)
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = value[:middle] + [{"omitted_items": len(value) - middle}]
+            if estimate_tokens(compact_json(candidate)) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return value[:low] + [{"omitted_items": len(value) - low}]
+    if isinstance(value, dict) and value:
+        shrunk = dict(value)
+        for key in sorted(shrunk, key=lambda k: estimate_tokens(_render(shrunk[k])), reverse=True):
+            rest = estimate_tokens(compact_json({k: v for k, v in shrunk.items() if k != key}))
+            shrunk[key] = shrink(shrunk[key], max(0, max_tokens - rest))
+            if estimate_tokens(compact_json(shrunk)) <= max_tokens:
+                return shrunk
+        return shrunk
+    return _truncate_text(_render(value), max_tokens)
+
+
+def budget_prompt(
+    prompt: PromptTemplate,
+    sections: Dict[str, Tuple[Any, int]],
+    budget: int = PROMPT_TOKEN_BUDGET
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Serialize prompt sections compactly and fit them into the token budget
+
+    - sections maps a template variable to (value, priority); strings are sent as is
+    - When over budget, the lowest-priority sections are trimmed first
+    - Returns the template inputs and a usage report comparing the tokens sent
+      with the indented JSON the prompt used before
+    """
+    template_tokens = estimate_tokens(prompt.template)
+    values = {name: value for name, (value, _) in sections.items()}
+    tokens = {name: estimate_tokens(_render(value)) for name, value in values.items()}
+    baseline = template_tokens + sum(
+        estimate_tokens(value if isinstance(value, str) else json.dumps(value, indent=2, default=str))
+        for value in values.values()
+    )
+
+    trimmed = []
+    total = template_tokens + sum(tokens.values())
+    for name in sorted(sections, key=lambda n: sections[n][1]):
+        if total <= budget:
+            break
+        target = max(0, tokens[name] - (total - budget))
+        values[name] = shrink(values[name], target)
+        new_tokens = estimate_tokens(_render(values[name]))
+        total -= tokens[name] - new_tokens
+        tokens[name] = new_tokens
+        trimmed.append(name)
+
+    usage = {
+        "sections": tokens,
+        "sent": total,
+        "saved": max(0, baseline - total),
+        "trimmed": trimmed,
+        "over_budget": total > budget,
+        "prompts": 1,
+    }
+    return {name: _render(value) for name, value in values.items()}, usage
+
+
+def combine_usage(usages) -> Dict[str, Any]:
+    """
+    Sum the usage reports of several prompts sent by one node, e.g. shards
+    """
+    combined = {"sections": {}, "sent": 0, "saved": 0, "trimmed": [], "over_budget": False, "prompts": 0}
+    for usage in usages:
+        combined["prompts"] += usage.get("prompts", 1)
+        combined["sent"] += usage["sent"]
+        combined["saved"] += usage["saved"]
+        combined["over_budget"] = combined["over_budget"] or usage["over_budget"]
+        for name, count in usage["sections"].items():
+            combined["sections"][name] = combined["sections"].get(name, 0) + count
+        combined["trimmed"].extend(name for name in usage["trimmed"] if name not in combined["trimmed"])
+    return combined
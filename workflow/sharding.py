@@ -0,0 +1,115 @@
+import re
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from workflow.chunking import find_records
+
+
+# Path segments skipped when grouping endpoints, e.g. /api/v1/users -> users
+ROUTE_PREFIX_SEGMENTS = re.compile(r"^(api|v\d+)$", re.IGNORECASE)
+# Model modules written from templates, which generated models must not replace
+RESERVED_MODEL_MODULES = {"base", "__init__"}
+
+
+def to_module_name(name: str) -> str:
+    """
+    Snake-case, singular module name for a table, e.g. LeaveRequests -> leave_request
+    """
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name.strip())
+    name = re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()
+    if name.endswith("ies") and len(name) > 4:
+        name = name[:-3] + "y"
+    elif name.endswith("s") and not name.endswith("ss") and len(name) > 3:
+        name = name[:-1]
+    if not name or name[0].isdigit():
+        name = f"model_{name}"
+    if name in RESERVED_MODEL_MODULES:
+        name = f"{name}_table"
+    return name
+
+
+def to_class_name(name: str) -> str:
+    return "".join(part.capitalize() for part in to_module_name(name).split("_"))
+
+
+def build_model_index(database_schema: Any) -> List[Dict[str, Any]]:
+    """
+    Compact index of every table with the module and class it is generated into
+
+    - Distinct tables whose names map to the same module, such as user and
+      users, get a numbered module and class, e.g. user_2 and User2
+    """
+    index = []
+    seen = set()
+    modules = set()
+    for table in find_records(database_schema, ("tables", "models", "database_schema")):
+        name = next(
+            (table[key] for key in ("table_name", "name", "table", "model") if isinstance(table.get(key), str)),
+            None
+        )
+        if not name or name.lower() in seen:
+            continue
+        seen.add(name.lower())
+        module = to_module_name(name)
+        number = 2
+        while module in modules:
+            module = f"{to_module_name(name)}_{number}"
+            number += 1
+        modules.add(module)
+        index.append({
+            "table": name,
+            "module": module,
+            "class": to_class_name(module),
+            "definition": table,
+        })
+    return index
+
+
+def format_model_index(index: List[Dict[str, Any]]) -> str:
+    return "\n".join(
+        f"- table {entry['table']}: class {entry['class']} in app.models.{entry['module']}"
+        for entry in index
+    )
+
+
+def group_endpoints(api_endpoints: Any) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Group endpoints into route files by their first meaningful path segment
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for endpoint in find_records(api_endpoints, ("endpoints", "api_endpoints")):
+        path = next(
+            (endpoint[key] for key in ("path", "route", "endpoint", "url") if isinstance(endpoint.get(key), str)),
+            ""
+        )
+        segments = [
+            segment for segment in path.strip("/").split("/")
+            if segment and not ROUTE_PREFIX_SEGMENTS.match(segment) and not segment.startswith(("{", ":"))
+        ]
+        group = re.sub(r"[^0-9a-zA-Z]+", "_", segments[0]).strip("_").lower() if segments else "root"
+        groups.setdefault(group or "root", []).append(endpoint)
+    return groups
+
+
+async def run_shards(
+    shards: List[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+    max_retries: int
+) -> List[Tuple[Any, Any]]:
+    """
+    Run worker over every shard under a semaphore, retrying each failed
+    shard on its own; returns (shard, result or last exception) pairs
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(shard):
+        error = None
+        for _ in range(max_retries + 1):
+            try:
+                async with semaphore:
+                    return shard, await worker(shard)
+            except Exception as e:
+                error = e
+        return shard, error
+
+    return list(await asyncio.gather(*(run(shard) for shard in shards)))
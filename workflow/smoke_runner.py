@@ -0,0 +1,242 @@
+"""
+Boot a generated FastAPI project and call each of its routes once
+
+Started by workflow/smoke_test.py in a subprocess, with the project's
+DATABASE_URL pointed at a throwaway SQLite file:
+
+    python -I smoke_runner.py <project_dir> <result.json>
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import pkgutil
+import importlib
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Sample values for string formats used in request schemas
+SAMPLE_STRINGS = {
+    "email": "smoke@example.com",
+    "date": "2024-01-01",
+    "date-time": "2024-01-01T00:00:00",
+    "time": "12:00:00",
+    "uuid": "00000000-0000-0000-0000-000000000001",
+    "uri": "http://example.com",
+    "password": "Smoke-test-1",
+}
+
+
+def limit_resources() -> None:
+    if resource is None:
+        return
+    cpu_seconds = int(os.environ.get("SMOKE_TEST_CPU_SECONDS", "30"))
+    memory = int(os.environ.get("SMOKE_TEST_MEMORY_MB", "1024")) * 1024 * 1024
+    # SIGXCPU at the soft limit, so the crash can be told apart from other kills
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    # Generated code has no business writing large files
+    resource.setrlimit(resource.RLIMIT_FSIZE, (64 * 1024 * 1024, 64 * 1024 * 1024))
+
+
+def project_frame(error: BaseException, project_dir: Path) -> Tuple[Optional[str], int]:
+    """
+    The innermost project file and line in an error's traceback, to blame for it
+    """
+    candidates = [(frame.filename, frame.lineno) for frame in traceback.extract_tb(error.__traceback__)]
+    if isinstance(error, SyntaxError) and error.filename:
+        candidates.append((error.filename, error.lineno))
+    for filename, line in reversed(candidates):
+        path = Path(filename).resolve()
+        if path.is_relative_to(project_dir):
+            return path.relative_to(project_dir).as_posix(), line or 0
+    return None, 0
+
+
+def failure(step: str, error: BaseException, project_dir: Path) -> Dict[str, Any]:
+    file, line = project_frame(error, project_dir)
+    return {"step": step, "error": f"{type(error).__name__}: {error}", "file": file, "line": line}
+
+
+def import_package(package: str, directory: Path, project_dir: Path, failures: List[Dict[str, Any]]) -> List[Any]:
+    modules = []
+    for info in pkgutil.iter_modules([str(directory)]):
+        try:
+            modules.append(importlib.import_module(f"{package}.{info.name}"))
+        except Exception as e:
+            failures.append(failure("import", e, project_dir))
+    return modules
+
+
+def mount_routers(app, modules: List[Any]) -> List[str]:
+    """
+    Include the routers of route modules that the application does not include itself
+    """
+    from fastapi import APIRouter
+
+    mounted_endpoints = {getattr(route, "endpoint", None) for route in app.routes}
+    mounted = []
+    for module in modules:
+        router = getattr(module, "router", None)
+        if not isinstance(router, APIRouter) or not router.routes:
+            continue
+        if any(getattr(route, "endpoint", None) in mounted_endpoints for route in router.routes):
+            continue
+        app.include_router(router)
+        mounted.append(module.__name__)
+    return mounted
+
+
+async def create_tables(database) -> None:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+    if isinstance(database.engine, AsyncEngine):
+        async with database.engine.begin() as connection:
+            await connection.run_sync(database.Base.metadata.create_all)
+    else:
+        database.Base.metadata.create_all(database.engine)
+
+
+def sample(schema: Dict[str, Any], components: Dict[str, Any], depth: int = 0) -> Any:
+    """
+    A minimal value satisfying a JSON schema: required properties only
+    """
+    if depth > 8:
+        return None
+    if "$ref" in schema:
+        return sample(components.get(schema["$ref"].rsplit("/", 1)[-1], {}), components, depth + 1)
+    for key in ("anyOf", "oneOf", "allOf"):
+        options = [option for option in schema.get(key, []) if option.get("type") != "null"]
+        if options:
+            return sample(options[0], components, depth + 1)
+    if "default" in schema:
+        return schema["default"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        required = set(schema.get("required", []))
+        return {
+            name: sample(prop, components, depth + 1)
+            for name, prop in schema.get("properties", {}).items() if name in required
+        }
+    if kind == "array":
+        return []
+    if kind == "integer":
+        return max(1, int(schema.get("minimum", 1)))
+    if kind == "number":
+        return float(max(1, schema.get("minimum", 1)))
+    if kind == "boolean":
+        return True
+    if kind == "string":
+        value = SAMPLE_STRINGS.get(schema.get("format"), "smoke")
+        return value.ljust(schema.get("minLength", 0), "x")
+    return None
+
+
+def build_request(path: str, operation: Dict[str, Any], components: Dict[str, Any]) -> Dict[str, Any]:
+    query = {}
+    for parameter in operation.get("parameters", []):
+        value = sample(parameter.get("schema", {}), components)
+        if parameter.get("in") == "path":
+            path = path.replace("{" + parameter["name"] + "}", str(value if value is not None else 1))
+        elif parameter.get("in") == "query" and parameter.get("required"):
+            query[parameter["name"]] = value
+    request = {"url": path, "params": query}
+    content = operation.get("requestBody", {}).get("content", {})
+    if "application/json" in content:
+        request["json"] = sample(content["application/json"].get("schema", {}), components)
+    elif content:
+        # Form and multipart bodies: send the required fields as form data
+        schema = next(iter(content.values())).get("schema", {})
+        request["data"] = sample(schema, components) or {}
+    return request
+
+
+def endpoint_file(app, path: str, method: str, project_dir: Path) -> Optional[str]:
+    for route in app.routes:
+        if getattr(route, "path", None) == path and method.upper() in getattr(route, "methods", ()):
+            code = getattr(getattr(route, "endpoint", None), "__code__", None)
+            filename = Path(code.co_filename).resolve() if code is not None else None
+            if filename is not None and filename.is_relative_to(project_dir):
+                return filename.relative_to(project_dir).as_posix()
+    return None
+
+
+def call_routes(client, app, project_dir: Path) -> List[Dict[str, Any]]:
+    schema = app.openapi()
+    components = schema.get("components", {}).get("schemas", {})
+    results = []
+    for path, operations in schema.get("paths", {}).items():
+        for method, operation in operations.items():
+            if method.upper() not in ("GET", "POST", "PUT", "PATCH", "DELETE"):
+                continue
+            result = {"method": method.upper(), "path": path}
+            started = time.perf_counter()
+            try:
+                response = client.request(method.upper(), **build_request(path, operation, components))
+                result["status"] = response.status_code
+                if response.status_code >= 500:
+                    result["error"] = response.text[:500]
+            except Exception as e:
+                # Unhandled exceptions are raised by the test client, with the traceback
+                # pointing at the project file that failed
+                result["status"] = 500
+                result["error"] = f"{type(e).__name__}: {e}"
+                result["file"], result["line"] = project_frame(e, project_dir)
+            result["latency"] = time.perf_counter() - started
+            if result["status"] >= 500 and not result.get("file"):
+                result["file"] = endpoint_file(app, path, method, project_dir)
+            results.append(result)
+    return results
+
+
+def run(project_dir: Path) -> Dict[str, Any]:
+    started = time.perf_counter()
+    sys.path.insert(0, str(project_dir))
+    result = {"booted": False, "failures": [], "mounted_routers": [], "routes": []}
+
+    try:
+        app = importlib.import_module("app.main").app
+        result["boot_time"] = time.perf_counter() - started
+    except Exception as e:
+        result["failures"].append(failure("boot", e, project_dir))
+        return result
+    result["booted"] = True
+
+    import_package("app.models", project_dir / "app" / "models", project_dir, result["failures"])
+    routes = import_package("app.api.routes", project_dir / "app" / "api" / "routes", project_dir, result["failures"])
+    result["mounted_routers"] = mount_routers(app, routes)
+
+    try:
+        asyncio.run(create_tables(importlib.import_module("app.services.database")))
+    except Exception as e:
+        result["failures"].append(failure("database", e, project_dir))
+
+    from fastapi.testclient import TestClient
+    try:
+        with TestClient(app) as client:
+            result["routes"] = call_routes(client, app, project_dir)
+    except Exception as e:
+        result["failures"].append(failure("requests", e, project_dir))
+    return result
+
+
+def main() -> int:
+    limit_resources()
+    sys.dont_write_bytecode = True
+    project_dir, result_path = Path(sys.argv[1]).resolve(), Path(sys.argv[2])
+    result = run(project_dir)
+    result_path.write_text(json.dumps(result, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Sandboxed boot-and-smoke test of generated projects
+
+Each project is imported in its own subprocess, limited in CPU time, memory
+and wall time, with its database pointed at a throwaway SQLite file. Every
+route is called once through FastAPI's test client.
+
+    # Verify several projects in parallel
+    python -m workflow.smoke_test app/generated_projects/*
+"""
+import os
+import re
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+# Smoke test generated projects during validation
+SMOKE_TEST_ENABLED = os.getenv("SMOKE_TEST_ENABLED", "true").lower() == "true"
+# Wall-clock seconds a project gets to boot and answer all its routes
+SMOKE_TEST_TIMEOUT = float(os.getenv("SMOKE_TEST_TIMEOUT", "60"))
+# CPU seconds and address space allowed to the smoke test process
+SMOKE_TEST_CPU_SECONDS = int(os.getenv("SMOKE_TEST_CPU_SECONDS", "30"))
+SMOKE_TEST_MEMORY_MB = int(os.getenv("SMOKE_TEST_MEMORY_MB", "1024"))
+# Projects smoke tested at once by smoke_test_projects (the command line)
+SMOKE_TEST_PROCESSES = int(os.getenv("SMOKE_TEST_PROCESSES", "2"))
+
+RUNNER = Path(__file__).resolve().with_name("smoke_runner.py")
+
+# Run-specific details in error text, replaced so regeneration prompts stay
+# the same from run to run
+VOLATILE_PATTERNS = [
+    (re.compile(r"(?:[A-Za-z]:)?(?:[\\/][\w.@+-]+)+[\\/]([\w.@+-]+)"), r"\1"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "0x..."),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<uuid>"),
+    (re.compile(r"\b(pid|process|thread)( id)?([ =:]+)\d+", re.IGNORECASE), r"\1\2\3<n>"),
+    (re.compile(r"\b\d+(?:\.\d+)?\s*(?:ms|s|sec|seconds)\b"), "<time>"),
+]
+
+
+def _normalize_error(text: str, limit: int = 200) -> str:
+    """
+    The line of an error worth showing the LLM, without run-specific details
+
+    - Tracebacks are reduced to their last line, the exception type and message
+    - Paths are reduced to the file name; addresses, ids and timings are masked
+    """
+    lines = [
+        line.strip() for line in (text or "").splitlines()
+        if line.strip() and not line.strip().startswith("For further information")
+    ]
+    if lines and lines[0].startswith("Traceback"):
+        lines = lines[-1:]
+    error = "; ".join(lines)
+    for pattern, replacement in VOLATILE_PATTERNS:
+        error = pattern.sub(replacement, error)
+    return error[:limit]
+
+
+def _issues_by_file(result: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    files: Dict[str, List[Dict[str, Any]]] = {}
+    for item in result.get("failures", []):
+        if item.get("file"):
+            files.setdefault(item["file"], []).append({
+                "line": item.get("line", 0), "check": "smoke",
+                "message": f"{item['step']} failed: {_normalize_error(item['error'])}"
+            })
+    for route in result.get("routes", []):
+        if route.get("file"):
+            error = _normalize_error(route.get("error"))
+            files.setdefault(route["file"], []).append({
+                "line": route.get("line", 0), "check": "smoke",
+                "message": f"{route['method']} {route['path']} returned {route['status']}" + (f": {error}" if error else "")
+            })
+    return files
+
+
+def smoke_test_project(project_dir: str, timeout: float = SMOKE_TEST_TIMEOUT) -> Dict[str, Any]:
+    """
+    Boot a generated project in a sandboxed subprocess and call each of its routes
+
+    - status is "passed", "failed" (boot, import or database errors, or 5xx
+      responses), "timeout" or "crashed" (killed by a resource limit)
+    - files maps project files to the problems blamed on them, in the same
+      shape as the static check issues
+    """
+    project_dir = str(Path(project_dir).resolve())
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="srs-smoke-") as workdir:
+        result_path = Path(workdir) / "result.json"
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": workdir,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{Path(workdir) / 'smoke.db'}",
+            "SECRET_KEY": "smoke-test-secret",
+            "SMOKE_TEST_CPU_SECONDS": str(SMOKE_TEST_CPU_SECONDS),
+            "SMOKE_TEST_MEMORY_MB": str(SMOKE_TEST_MEMORY_MB),
+        }
+        try:
+            # -I keeps the server's PYTHONPATH, user site-packages and this
+            # directory out of the project's imports
+            completed = subprocess.run(
+                [sys.executable, "-I", str(RUNNER), project_dir, str(result_path)],
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return {"project": project_dir, "status": "timeout", "duration": time.perf_counter() - started,
+                    "booted": False, "failures": [{"step": "timeout", "error": f"Timed out after {timeout}s", "file": None}],
+                    "routes": [], "files": {}}
+
+        if not result_path.exists():
+            output = (completed.stderr or completed.stdout or "").strip().splitlines()
+            if completed.returncode < 0:
+                error = f"Killed by {signal.Signals(-completed.returncode).name}"
+            else:
+                error = output[-1] if output else f"Exited with code {completed.returncode}"
+            return {"project": project_dir, "status": "crashed", "duration": time.perf_counter() - started,
+                    "booted": False, "returncode": completed.returncode,
+                    "failures": [{"step": "crash", "error": error, "file": None}],
+                    "routes": [], "files": {}}
+        result = json.loads(result_path.read_text())
+
+    failed = result["failures"] or any(route["status"] >= 500 for route in result["routes"])
+    result.update({
+        "project": project_dir,
+        "status": "failed" if failed else "passed",
+        "duration": time.perf_counter() - started,
+        "files": _issues_by_file(result),
+    })
+    return result
+
+
+def summarize(result: Dict[str, Any]) -> str:
+    routes = result.get("routes", [])
+    errors = sum(1 for route in routes if route["status"] >= 500)
+    latencies = sorted(route["latency"] for route in routes)
+    return (
+        f"Smoke test {result['status']} in {result['duration']:.1f}s: "
+        + (f"{len(routes)} routes called, {errors} failed" if result.get("booted") else "project did not boot")
+        + (f", median latency {latencies[len(latencies) // 2] * 1000:.0f}ms" if latencies else "")
+    )
+
+
+def smoke_test_projects(project_dirs: List[str]) -> List[Dict[str, Any]]:
+    """
+    Smoke test several projects in parallel, in the order given
+
+    - Every project already runs in its own subprocess, so threads only wait on them
+    """
+    with ThreadPoolExecutor(max_workers=max(1, SMOKE_TEST_PROCESSES)) as pool:
+        return list(pool.map(smoke_test_project, project_dirs))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Boot generated projects and call every route once")
+    parser.add_argument("projects", nargs="+", help="generated project directories")
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    results = smoke_test_projects(args.projects)
+    for result in results:
+        print(f"{result['project']}: {summarize(result)}")
+        for item in result["failures"]:
+            print(f"  {item['step']}: {item['error']}" + (f" ({item['file']})" if item["file"] else ""))
+        for route in result["routes"]:
+            print(f"  {route['method']:6} {route['path']} -> {route['status']} ({route['latency'] * 1000:.0f}ms)")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0 if all(result["status"] == "passed" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
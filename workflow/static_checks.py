@@ -0,0 +1,331 @@
+import ast
+import builtins
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+
+# Names every module can use without binding them
+MODULE_NAMES = set(dir(builtins)) | {
+    "__file__", "__name__", "__doc__", "__package__", "__spec__", "__loader__", "__path__", "__annotations__",
+}
+# Generic wrappers skipped when reading the target model from a Mapped[...] annotation
+ANNOTATION_WRAPPERS = {"Mapped", "List", "list", "Set", "set", "Optional", "Union", "Sequence", "WriteOnlyMapped", "DynamicMapped"}
+
+
+def _issue(line: Optional[int], check: str, message: str) -> Dict[str, Any]:
+    return {"line": line or 0, "check": check, "message": message}
+
+
+def _module_name(relative: Path) -> str:
+    parts = list(relative.with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _module_level(tree: ast.Module) -> Iterator[ast.AST]:
+    # Every node outside function and class bodies
+    stack: List[ast.AST] = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node is tree or not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _import_names(node: ast.AST) -> List[str]:
+    if isinstance(node, ast.Import):
+        return [alias.asname or alias.name.split(".")[0] for alias in node.names]
+    if isinstance(node, ast.ImportFrom):
+        return [alias.asname or alias.name for alias in node.names if alias.name != "*"]
+    return []
+
+
+def _has_star_import(tree: ast.Module) -> bool:
+    return any(
+        isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names)
+        for node in ast.walk(tree)
+    )
+
+
+def _top_level_names(tree: ast.Module) -> Set[str]:
+    names = set()
+    for node in _module_level(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        names.update(_import_names(node))
+    return names
+
+
+def _bound_names(tree: ast.Module) -> Set[str]:
+    # Every name bound anywhere in the file; scopes are not told apart
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        # Match statement captures, looked up by name since ast only has them from 3.10
+        elif type(node).__name__ in ("MatchAs", "MatchStar") and node.name:
+            names.add(node.name)
+        elif type(node).__name__ == "MatchMapping" and node.rest:
+            names.add(node.rest)
+        names.update(_import_names(node))
+    return names
+
+
+def load_project(project_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Compile every .py file of a generated project, keyed by module name
+
+    - Each entry holds the project-relative path, the AST (None when the file
+      does not compile) and the issues found so far
+    """
+    modules = {}
+    for path in sorted(project_dir.rglob("*.py")):
+        relative = path.relative_to(project_dir)
+        entry = {
+            "path": relative.as_posix(),
+            "package": path.name == "__init__.py",
+            "tree": None,
+            "issues": [],
+        }
+        try:
+            source = path.read_text(encoding="utf-8", errors="replace")
+            compile(source, entry["path"], "exec", dont_inherit=True)
+            entry["tree"] = ast.parse(source, entry["path"])
+        except SyntaxError as e:
+            entry["issues"].append(_issue(e.lineno, "syntax", f"{type(e).__name__}: {e.msg}"))
+        except ValueError as e:
+            entry["issues"].append(_issue(0, "syntax", str(e)))
+        modules[_module_name(relative)] = entry
+    return modules
+
+
+def _resolve(module: str, entry: Dict[str, Any], node: ast.ImportFrom) -> Optional[str]:
+    if not node.level:
+        return node.module
+    package = module.split(".") if entry["package"] else module.split(".")[:-1]
+    if node.level - 1 > len(package):
+        return None
+    base = package[:len(package) - (node.level - 1)]
+    return ".".join(base + ([node.module] if node.module else []))
+
+
+def check_imports(modules: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Report imports of project modules, and names imported from them, that do not exist
+    """
+    roots = {name.split(".")[0] for name in modules}
+
+    def exists(name: str) -> bool:
+        return name in modules or any(other.startswith(name + ".") for other in modules)
+
+    top_level = {}
+    for module, entry in modules.items():
+        tree = entry["tree"]
+        if tree is None:
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name.split(".")[0] in roots and not exists(alias.name):
+                        entry["issues"].append(_issue(node.lineno, "import", f"No module named '{alias.name}' in the project"))
+                continue
+            if not isinstance(node, ast.ImportFrom):
+                continue
+            target = _resolve(module, entry, node)
+            if target is None or (node.level == 0 and target.split(".")[0] not in roots):
+                continue
+            if not exists(target):
+                entry["issues"].append(_issue(node.lineno, "import", f"No module named '{target}' in the project"))
+                continue
+            source = modules.get(target)
+            if source is None or source["tree"] is None or _has_star_import(source["tree"]):
+                continue
+            if target not in top_level:
+                top_level[target] = _top_level_names(source["tree"])
+            for alias in node.names:
+                if alias.name != "*" and alias.name not in top_level[target] and not exists(f"{target}.{alias.name}"):
+                    entry["issues"].append(_issue(
+                        node.lineno, "import", f"Cannot import name '{alias.name}' from '{target}' ({source['path']})"
+                    ))
+
+
+def check_undefined_names(modules: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Report names that are used but never bound or imported anywhere in their file
+    """
+    for entry in modules.values():
+        tree = entry["tree"]
+        if tree is None or _has_star_import(tree):
+            continue
+        bound = _bound_names(tree) | MODULE_NAMES
+        reported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in bound and node.id not in reported:
+                reported.add(node.id)
+                entry["issues"].append(_issue(node.lineno, "undefined", f"Name '{node.id}' is not defined"))
+
+
+def _call_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Name):
+            return node.func.id
+        if isinstance(node.func, ast.Attribute):
+            return node.func.attr
+    return None
+
+
+def _string(node: Optional[ast.AST]) -> Optional[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def _annotation_target(annotation: Optional[ast.AST]) -> Optional[str]:
+    target = None
+    for node in ast.walk(annotation) if annotation is not None else ():
+        name = _string(node)
+        if name and name not in ANNOTATION_WRAPPERS:
+            target = name
+    return target
+
+
+def build_model_index(modules: Dict[str, Dict[str, Any]], package: str = "app.models") -> Dict[str, Dict[str, Any]]:
+    """
+    Symbol index of the SQLAlchemy models: table name, relationships and
+    foreign keys of every mapped class under package
+    """
+    index = {}
+    for module, entry in modules.items():
+        if entry["tree"] is None or not module.startswith(package + "."):
+            continue
+        for cls in entry["tree"].body:
+            if not isinstance(cls, ast.ClassDef):
+                continue
+            model = {"module": module, "path": entry["path"], "line": cls.lineno, "table": None,
+                     "relationships": {}, "foreign_keys": []}
+            for statement in cls.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                    target, annotation, value = statement.targets[0], None, statement.value
+                elif isinstance(statement, ast.AnnAssign):
+                    target, annotation, value = statement.target, statement.annotation, statement.value
+                else:
+                    continue
+                if not isinstance(target, ast.Name):
+                    continue
+                if target.id == "__tablename__":
+                    model["table"] = _string(value)
+                elif _call_name(value) == "relationship":
+                    keywords = {keyword.arg: keyword.value for keyword in value.keywords}
+                    model["relationships"][target.id] = {
+                        "target": _string(value.args[0]) if value.args else _annotation_target(annotation),
+                        "back_populates": _string(keywords.get("back_populates")),
+                        "line": statement.lineno,
+                    }
+                for node in ast.walk(value) if value is not None else ():
+                    reference = _string(node.args[0]) if _call_name(node) == "ForeignKey" and node.args else None
+                    if reference:
+                        model["foreign_keys"].append({"reference": reference, "line": node.lineno})
+            is_mapped = model["table"] or any(_string(base) in ("Base", "DeclarativeBase") for base in cls.bases)
+            if is_mapped:
+                index[cls.name] = model
+    return index
+
+
+def check_models(modules: Dict[str, Dict[str, Any]], index: Dict[str, Dict[str, Any]], package: str = "app.models") -> None:
+    """
+    Report relationships to unknown models, back_populates pairs that do not
+    match and foreign keys to unknown tables
+    """
+    by_path = {entry["path"]: entry for entry in modules.values()}
+    tables = {model["table"] for model in index.values() if model["table"]}
+    # Models in files that do not compile are missing from the index
+    complete = all(entry["tree"] is not None for module, entry in modules.items() if module.startswith(package + "."))
+    for name, model in index.items():
+        issues = by_path[model["path"]]["issues"]
+        for attribute, relationship in model["relationships"].items():
+            target = (relationship["target"] or "").rsplit(".", 1)[-1]
+            if not target:
+                continue
+            if target not in index:
+                if complete:
+                    issues.append(_issue(relationship["line"], "relationship",
+                                         f"{name}.{attribute} refers to unknown model '{target}'"))
+                continue
+            back = relationship["back_populates"]
+            if back is None:
+                continue
+            other = index[target]["relationships"].get(back)
+            if other is None:
+                issues.append(_issue(relationship["line"], "relationship",
+                                     f"{name}.{attribute} has back_populates='{back}' but {target} has no relationship '{back}'"))
+            elif other["back_populates"] != attribute:
+                issues.append(_issue(relationship["line"], "relationship",
+                                     f"{name}.{attribute} has back_populates='{back}' but {target}.{back} "
+                                     f"has back_populates='{other['back_populates']}'"))
+        for foreign_key in model["foreign_keys"]:
+            table = foreign_key["reference"].rsplit(".", 1)[0]
+            if complete and "." in foreign_key["reference"] and table not in tables:
+                issues.append(_issue(foreign_key["line"], "foreign_key",
+                                     f"ForeignKey('{foreign_key['reference']}') refers to unknown table '{table}'"))
+
+
+def check_project(project_dir: Path) -> Dict[str, Any]:
+    """
+    Static analysis of a generated project without importing or running it
+
+    - Compiles every file, resolves imports between project modules, flags
+      undefined names and checks model relationships against each other
+    - Returns the issues per file (files without issues are left out) and
+      the model index
+    """
+    modules = load_project(project_dir)
+    check_imports(modules)
+    check_undefined_names(modules)
+    index = build_model_index(modules)
+    check_models(modules, index)
+    files = {
+        entry["path"]: sorted(entry["issues"], key=lambda issue: issue["line"])
+        for entry in modules.values() if entry["issues"]
+    }
+    return {
+        "files_checked": len(modules),
+        "issue_count": sum(len(issues) for issues in files.values()),
+        "files": files,
+        "models": {
+            name: {
+                "module": model["module"],
+                "table": model["table"],
+                "relationships": {
+                    attribute: {"target": relationship["target"], "back_populates": relationship["back_populates"]}
+                    for attribute, relationship in model["relationships"].items()
+                },
+            }
+            for name, model in index.items()
+        },
+    }
+
+
+def format_issues(files: Dict[str, List[Dict[str, Any]]], prefix: str = "") -> List[str]:
+    """
+    One "path:line: message" line per issue in files under prefix
+    """
+    return [
+        f"{path}:{issue['line']}: {issue['message']}"
+        for path, issues in sorted(files.items()) if path.startswith(prefix)
+        for issue in issues
+    ]
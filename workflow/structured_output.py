@@ -0,0 +1,318 @@
+import os
+import re
+import ast
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import BasePromptTemplate
+from workflow.instrumentation import current_node
+from workflow.metrics import PARSE_FAILURES
+from workflow.file_blocks import stream_file_blocks, parse_file_blocks
+
+
+# "text" parses JSON and file blocks out of free-form completions, "tools" makes
+# the model answer through a tool call validated against a per-node schema
+LLM_OUTPUT_MODE = os.getenv("LLM_OUTPUT_MODE", "text")
+
+FENCED_BLOCK = re.compile(r"```[\w-]*[ \t]*\n(.*?)```", re.DOTALL)
+# A code block whose closing fence never came, e.g. a completion cut off at max tokens
+UNCLOSED_BLOCK = re.compile(r"```[\w-]*[ \t]*\n(.*)\Z", re.DOTALL)
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+class _Schema(BaseModel):
+    # Fields the model adds beyond the schema are kept
+    model_config = ConfigDict(extra="allow")
+
+
+class Endpoint(_Schema):
+    method: str = Field(description="HTTP method, e.g. GET or POST")
+    path: str = Field(description="Route path, e.g. /users/{user_id}")
+    description: Optional[str] = None
+    parameters: List[Dict[str, Any]] = Field(default_factory=list, description="Request parameters with their types")
+    response: Optional[Dict[str, Any]] = Field(default=None, description="Response structure")
+    status_codes: List[int] = Field(default_factory=list)
+    authentication: Optional[str] = Field(default=None, description="Authentication required, if any")
+
+
+class APIEndpoints(_Schema):
+    """
+    API endpoints required by the SRS document
+    """
+    endpoints: List[Endpoint]
+
+
+class Column(_Schema):
+    name: str
+    type: str
+    primary_key: bool = False
+    foreign_key: Optional[str] = Field(default=None, description="Referenced table.column")
+    nullable: Optional[bool] = None
+    unique: Optional[bool] = None
+
+
+class Table(_Schema):
+    name: str
+    columns: List[Column]
+    relationships: List[Dict[str, Any]] = Field(default_factory=list)
+    constraints: List[str] = Field(default_factory=list)
+
+
+class DatabaseSchema(_Schema):
+    """
+    Database tables required by the SRS document
+    """
+    tables: List[Table]
+
+
+class BusinessRule(_Schema):
+    name: str
+    description: str
+    type: Optional[str] = Field(default=None, description="rule, validation, calculation, workflow or integration")
+
+
+class BusinessLogic(_Schema):
+    """
+    Business logic components required by the SRS document
+    """
+    business_logic: List[BusinessRule]
+
+
+class Role(_Schema):
+    name: str
+    permissions: List[str] = Field(default_factory=list)
+
+
+class AuthRequirements(_Schema):
+    """
+    Authentication and authorization requirements of the SRS document
+    """
+    authentication_methods: List[str] = Field(default_factory=list, description="e.g. JWT, OAuth2")
+    roles: List[Role] = Field(default_factory=list)
+    access_control: List[str] = Field(default_factory=list)
+    security_constraints: List[str] = Field(default_factory=list)
+
+
+class GeneratedFile(_Schema):
+    path: str = Field(description="Path of the file in the project, e.g. app/models/user.py")
+    code: str = Field(description="Complete content of the file")
+
+
+class GeneratedFiles(_Schema):
+    """
+    Source files generated for the project
+    """
+    files: List[GeneratedFile]
+
+
+class ValidationReport(_Schema):
+    """
+    Evaluation of a generated project
+    """
+    valid: bool
+    score: int = Field(default=0, description="Overall quality from 0 to 100")
+    issues: List[str] = Field(default_factory=list)
+    recommendations: List[str] = Field(default_factory=list)
+    regeneration_needed: bool = False
+    regeneration_target: Optional[str] = None
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(TRAILING_COMMA.sub(r"\1", text))
+
+
+def parse_json_output(text: str) -> Any:
+    """
+    The JSON object or list in an LLM response
+
+    - Fenced blocks are tried first, whatever their language tag, then the
+      whole response, then the first object or list of objects embedded in the prose
+    - Trailing commas are tolerated
+    """
+    for candidate in [block.strip() for block in FENCED_BLOCK.findall(text)] + [text.strip()]:
+        try:
+            value = _loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, (dict, list)):
+            return value
+    decoder = json.JSONDecoder()
+    text = TRAILING_COMMA.sub(r"\1", text)
+    for match in re.finditer(r"[\[{]", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        # Skip stray brackets such as citations; records are objects
+        if isinstance(value, dict) or any(isinstance(item, dict) for item in value):
+            return value
+    raise ValueError("No JSON found in LLM output")
+
+
+def parse_files_output(text: str) -> Dict[str, Any]:
+    """
+    The file blocks of a response, shaped like GeneratedFiles
+    """
+    blocks = parse_file_blocks(text)
+    if not blocks:
+        raise ValueError("No file blocks found in LLM output")
+    return {"files": [{"path": path, "code": code} for path, code in blocks]}
+
+
+def parse_code_output(text: str) -> Dict[str, Any]:
+    """
+    The code of a single-file response, shaped like GeneratedFile
+
+    - The first fenced block, whatever its language tag, then a block missing
+      its closing fence, then the whole response if it is Python code
+    """
+    blocks = FENCED_BLOCK.findall(text) or UNCLOSED_BLOCK.findall(text)
+    if blocks:
+        return {"code": blocks[0].strip()}
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        tree = None
+    # A word or two of prose can parse as a bare expression
+    if tree is None or all(isinstance(node, ast.Expr) for node in tree.body):
+        raise ValueError("No code block found in LLM output")
+    return {"code": text.strip()}
+
+
+def _content(message: AIMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+def _failed_generation(error: Exception) -> Optional[str]:
+    # Groq rejects tool calls that do not parse with a 400 carrying the raw completion
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        body = body.get("error", body)
+        if isinstance(body, dict) and isinstance(body.get("failed_generation"), str):
+            return body["failed_generation"]
+    return None
+
+
+def _bind_schema(llm: BaseChatModel, schema: Type[BaseModel]):
+    return llm.bind_tools([schema], tool_choice={"type": "function", "function": {"name": schema.__name__}})
+
+
+def _parse_response(message: AIMessage, schema: Type[BaseModel], parse_text: Callable[[str], Any]) -> Any:
+    node = current_node.get() or "unknown"
+    text = _content(message)
+    if LLM_OUTPUT_MODE == "tools":
+        for call in message.tool_calls:
+            if call["name"] != schema.__name__:
+                continue
+            try:
+                return schema.model_validate(call["args"]).model_dump(exclude_unset=True)
+            except ValidationError:
+                # Close enough to use; consumers already accept loose shapes
+                PARSE_FAILURES.inc(node=node, stage="schema")
+                return call["args"]
+        PARSE_FAILURES.inc(node=node, stage="schema")
+        # Arguments that are not valid JSON end up in invalid_tool_calls
+        text = "\n".join([call.get("args") or "" for call in message.invalid_tool_calls] + [text])
+    try:
+        return parse_text(text)
+    except ValueError:
+        PARSE_FAILURES.inc(node=node, stage="text")
+        raise
+
+
+async def ainvoke_structured(
+    prompt: BasePromptTemplate,
+    llm: BaseChatModel,
+    inputs: Dict[str, Any],
+    schema: Type[BaseModel],
+    parse_text: Callable[[str], Any] = parse_json_output
+) -> Any:
+    """
+    Run prompt | llm and return its answer as plain data
+
+    - In tools mode the answer is a tool call validated against schema
+    - Free-form answers, and tool calls the model got wrong, go through the
+      tolerant parse_text
+    - Parse failures are counted in srs_llm_parse_failures_total
+    """
+    runnable = _bind_schema(llm, schema) if LLM_OUTPUT_MODE == "tools" else llm
+    try:
+        message = await (prompt | runnable).ainvoke(inputs)
+    except Exception as e:
+        failed = _failed_generation(e)
+        if failed is None:
+            raise
+        message = AIMessage(content=failed)
+    return _parse_response(message, schema, parse_text)
+
+
+def invoke_structured(
+    prompt: BasePromptTemplate,
+    llm: BaseChatModel,
+    inputs: Dict[str, Any],
+    schema: Type[BaseModel],
+    parse_text: Callable[[str], Any] = parse_json_output
+) -> Any:
+    """
+    Synchronous ainvoke_structured
+    """
+    runnable = _bind_schema(llm, schema) if LLM_OUTPUT_MODE == "tools" else llm
+    try:
+        message = (prompt | runnable).invoke(inputs)
+    except Exception as e:
+        failed = _failed_generation(e)
+        if failed is None:
+            raise
+        message = AIMessage(content=failed)
+    return _parse_response(message, schema, parse_text)
+
+
+async def generate_file(prompt: BasePromptTemplate, llm: BaseChatModel, inputs: Dict[str, Any]) -> str:
+    """
+    Generate the code of one source file whose path the caller already knows
+
+    - Tools mode asks for a GeneratedFile tool call, text mode parses the
+      response with parse_code_output
+    - Raises ValueError when the response holds no code
+    """
+    result = await ainvoke_structured(prompt, llm, inputs, GeneratedFile, parse_code_output)
+    code = result.get("code") if isinstance(result, dict) else None
+    if not isinstance(code, str) or not code.strip():
+        PARSE_FAILURES.inc(node=current_node.get() or "unknown", stage="schema")
+        raise ValueError("No code found in LLM output")
+    return code.strip()
+
+
+async def generate_files(
+    prompt: BasePromptTemplate,
+    llm: BaseChatModel,
+    inputs: Dict[str, Any],
+    on_file: Callable[[str, str], Awaitable[None]]
+) -> int:
+    """
+    Generate source files, awaiting on_file(path, code) for each one
+
+    - Text mode streams the completion and writes each file as its block completes
+    - Tools mode writes the files once the whole tool call has arrived
+    - Raises ValueError when the response holds no file
+    """
+    if LLM_OUTPUT_MODE == "tools":
+        result = await ainvoke_structured(prompt, llm, inputs, GeneratedFiles, parse_files_output)
+        files = [
+            file for file in result.get("files", [])
+            if isinstance(file, dict) and isinstance(file.get("path"), str) and isinstance(file.get("code"), str)
+        ]
+        for file in files:
+            await on_file(file["path"], file["code"])
+        count = len(files)
+    else:
+        count = await stream_file_blocks(prompt, llm, inputs, on_file)
+    if not count:
+        PARSE_FAILURES.inc(node=current_node.get() or "unknown", stage="text")
+        raise ValueError("No file blocks found in LLM output")
+    return count
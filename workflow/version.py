@@ -0,0 +1,24 @@
+import os
+import hashlib
+import functools
+from pathlib import Path
+
+
+# Settings that change what the pipeline generates for the same document
+OUTPUT_SETTINGS = ("ANALYSIS_MODE", "ANALYSIS_CHUNK_TOKENS", "GENERATION_MODE", "LLM_OUTPUT_MODE", "VALIDATION_MODE",
+                   "SMOKE_TEST_ENABLED")
+
+
+@functools.lru_cache(maxsize=1)
+def get_pipeline_version() -> str:
+    """
+    Fingerprint of the pipeline: the workflow sources, which hold the prompts
+    and model settings, plus the settings that affect its output
+    """
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    for name in OUTPUT_SETTINGS:
+        digest.update(f"{name}={os.getenv(name, '')}".encode())
+    return digest.hexdigest()[:16]
@@ -2,9 +2,13 @@
 import os
 import uuid
 import json
-import docx2txt
+import time
+import asyncio
+import hashlib
+import operator
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Union, Callable, Awaitable
 from pydantic import BaseModel, Field
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
@@ -14,30 +18,104 @@ from langchain.schema.runnable import RunnablePassthrough, RunnableLambda
 from langchain.schema.messages import HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.config import get_stream_writer
 from langchain_groq import ChatGroq
 from typing import Annotated
 from langchain_core.messages import AnyMessage
+from workflow.llm_clients import get_chat_model
+from workflow.instrumentation import instrument_node
+from workflow.profiling import current_profiler
+from workflow.metrics import LLMMetricsHandler, REGENERATIONS, REGENERATED_NODES
+from workflow.checkpoints import open_checkpointer
+from workflow.static_checks import check_project, format_issues
+from workflow.smoke_test import smoke_test_project, summarize as summarize_smoke_test, SMOKE_TEST_ENABLED
+from workflow.structured_output import (
+    ainvoke_structured,
+    invoke_structured,
+    generate_file,
+    generate_files,
+    APIEndpoints,
+    DatabaseSchema,
+    BusinessLogic,
+    AuthRequirements,
+    ValidationReport,
+)
+from workflow.tokens import estimate_tokens
+from workflow.prompt_budget import budget_prompt, combine_usage
+from workflow.docx_parser import parse_docx, get_parser_pool
+from workflow.sharding import (
+    build_model_index,
+    format_model_index,
+    group_endpoints,
+    run_shards,
+    RESERVED_MODEL_MODULES,
+)
+from workflow.chunking import (
+    chunk_document,
+    merge_endpoints,
+    merge_tables,
+    merge_business_logic,
+    merge_auth_requirements,
+)
+from dotenv import load_dotenv
 import re
 import os
 load_dotenv()
 
+# Maximum number of requirement-extraction LLM calls in flight per job
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+# "full" sends the whole document to each extraction, "chunked" maps the
+# extractions over sections and merges the results, "auto" picks by size
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "auto")
+ANALYSIS_CHUNK_TOKENS = int(os.getenv("ANALYSIS_CHUNK_TOKENS", "6000"))
+# "single" generates all models / routes in one completion, "sharded" generates
+# one model file per table and one route file per endpoint group concurrently
+GENERATION_MODE = os.getenv("GENERATION_MODE", "single")
+SHARD_MAX_CONCURRENCY = int(os.getenv("SHARD_MAX_CONCURRENCY", "4"))
+SHARD_MAX_RETRIES = int(os.getenv("SHARD_MAX_RETRIES", "2"))
+# "static" trusts the static checks and skips the LLM review of clean projects,
+# "llm" also asks the LLM to review projects that pass them
+VALIDATION_MODE = os.getenv("VALIDATION_MODE", "static")
+
+def merge_generated_files(left: List[Dict[str, str]], right: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Reducer for generated_files: merge records from parallel branches,
+    letting the latest record for a path replace an earlier one
+    - A record marked "removed" drops the path
+    """
+    merged = {}
+    for entry in (left or []) + (right or []):
+        key = entry.get("path") if isinstance(entry, dict) else entry
+        if isinstance(entry, dict) and entry.get("removed"):
+            merged.pop(key, None)
+            continue
+        merged[key] = entry
+    return list(merged.values())
+
+
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    return {**(left or {}), **(right or {})}
+
+
 class GraphState(BaseModel):
 
     srs_document: Optional[str] = None
     srs_path: Optional[str] = None
     
 
-    api_endpoints: List[Dict[str, Any]] = Field(default_factory=list)
-    database_schema: List[Dict[str, Any]] = Field(default_factory=list)
-    business_logic: List[Dict[str, Any]] = Field(default_factory=list)
-    auth_requirements: Dict[str, Any] = Field(default_factory=dict)
+    # Extraction results are either a list or the JSON object returned by the LLM
+    api_endpoints: Union[List[Dict[str, Any]], Dict[str, Any]] = Field(default_factory=list)
+    database_schema: Union[List[Dict[str, Any]], Dict[str, Any]] = Field(default_factory=list)
+    business_logic: Union[List[Dict[str, Any]], Dict[str, Any]] = Field(default_factory=list)
+    auth_requirements: Union[List[Dict[str, Any]], Dict[str, Any]] = Field(default_factory=dict)
     
     project_id: Optional[str] = None
     project_path: Optional[str] = None
-    generated_files: List[Dict[str, str]] = Field(default_factory=list)
+    generated_files: Annotated[List[Dict[str, str]], merge_generated_files] = Field(default_factory=list)
     test_results: List[Dict[str, Any]] = Field(default_factory=list)
     
-    errors: List[Dict[str, Any]] = Field(default_factory=list)
+    errors: Annotated[List[Dict[str, Any]], operator.add] = Field(default_factory=list)
     status: str = "initialized"
     langsmith_trace_url: Optional[str] = None
     
@@ -48,19 +126,23 @@ class GraphState(BaseModel):
     regeneration_count: int = 0
     max_regenerations: int = 3
     regeneration_target: Optional[str] = None
+    # Fingerprint of each generated artifact, used to skip unaffected regenerations
+    artifact_versions: Annotated[Dict[str, str], merge_dicts] = Field(default_factory=dict)
+    # Per-node prompt token usage: tokens sent, tokens saved and sections trimmed
+    prompt_usage: Annotated[Dict[str, Dict[str, Any]], merge_dicts] = Field(default_factory=dict)
 
 
 def get_llm(temperature=0.2):
-    return ChatGroq(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        temperature=temperature,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-        api_key=os.getenv("GROQ_API_KEY"))
+    return get_chat_model("meta-llama/llama-4-scout-17b-16e-instruct", temperature)
 
 
-def parse_srs_document(state: GraphState) -> GraphState:
+async def parse_srs_document(state: GraphState) -> Dict[str, Any]:
+    """
+    Parse the uploaded .docx into markdown-like text in a worker process
+
+    - Profiled jobs parse in a thread so the parsing shows up in the profile
+    """
+    update = {}
     if state.srs_path:
         file_ext = os.path.splitext(state.srs_path)[1].lower()
         
@@ -68,36 +150,156 @@ def parse_srs_document(state: GraphState) -> GraphState:
             raise ValueError("Only .docx files are supported for parsing.")
 
         try:
-            text = docx2txt.process(state.srs_path)
-            state.srs_document = text
+            loop = asyncio.get_running_loop()
+            pool = None if current_profiler.get() is not None else get_parser_pool()
+            text = await loop.run_in_executor(pool, parse_docx, state.srs_path)
+            update["srs_document"] = text
 
-            state.messages.append({
+            update["messages"] = [{
                 "role": "system",
                 "content": f"Parsed SRS document: {len(text)} characters"
-            })
+            }]
         except Exception as e:
             raise ValueError(f"Failed to parse .docx file: {e}")
-    return state
+    return update
+
 
 
+def emit_file_generated(node: str, path: Path) -> None:
+    """
+    Report a file written by a node that is still running
+    """
+    get_stream_writer()({"type": "file_generated", "node": node, "path": str(path)})
+
+
+async def process_srs_document(
+    file_path: str,
+    on_event: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    callbacks: Optional[List[Any]] = None,
+    job_id: Optional[str] = None
+) -> Tuple[str, Optional[str], bool]:
+    """
+    Run the workflow on an SRS document
+
+    - on_event is awaited with a node_started / node_finished event for every
+      node, carrying timings and the files generated so far, and with a
+      file_generated event for every file as soon as it is written
+    - callbacks are LangChain callback handlers passed to every LLM call, in
+      addition to the handler recording LLM latency and token metrics
+    - With a job_id every step is checkpointed under that id, and running the
+      same job again continues after its last completed node; a run that
+      finished without succeeding runs again from before the step that failed
+    - Returns the project id, the LangSmith trace URL and whether the run
+      succeeded (see run_succeeded)
+    """
+    async with open_checkpointer() if job_id else nullcontext() as checkpointer:
+        workflow = create_workflow(checkpointer)
+        config = {"callbacks": [*(callbacks or []), LLMMetricsHandler()]}
+        state = GraphState(srs_path=file_path)
+        result = {}
+        started = {}
+        files_so_far = []
+        if checkpointer is not None:
+            config["configurable"] = {"thread_id": job_id}
+            snapshot = await workflow.aget_state(config)
+            if snapshot.values:
+                result = snapshot.values
+                files_so_far = [entry["path"] for entry in result.get("generated_files") or [] if "path" in entry]
+                if not snapshot.next:
+                    restart = None if run_succeeded(result) else await find_restart_config(workflow, config, result)
+                    if restart is None:
+                        # The graph already ran to the end
+                        return result["project_id"], result.get("langsmith_trace_url"), run_succeeded(result)
+                    config["configurable"] = restart["configurable"]
+                # Continue from the checkpoint instead of starting over
+                state = None
+        async for mode, chunk in workflow.astream(state, config=config, stream_mode=["debug", "values", "custom"]):
+            if mode == "values":
+                result = chunk
+                continue
+            if mode == "custom":
+                if chunk.get("type") == "file_generated":
+                    if chunk["path"] not in files_so_far:
+                        files_so_far.append(chunk["path"])
+                    if on_event is not None:
+                        await on_event({**chunk, "files_so_far": list(files_so_far)})
+                continue
+            if on_event is None or chunk["type"] not in ("task", "task_result"):
+                continue
+            payload = chunk["payload"]
+            if chunk["type"] == "task":
+                started[payload["id"]] = (time.perf_counter(), chunk["timestamp"])
+                await on_event({
+                    "type": "node_started",
+                    "node": payload["name"],
+                    "step": chunk["step"],
+                    "started_at": chunk["timestamp"],
+                })
+                continue
+            # Older LangGraph releases report the writes as (channel, value) pairs
+            writes = payload.get("result") or {}
+            writes = dict(writes) if isinstance(writes, list) else writes
+            written = [entry for entry in writes.get("generated_files") or [] if "path" in entry]
+            files = [entry["path"] for entry in written if not entry.get("removed")]
+            removed = {entry["path"] for entry in written if entry.get("removed")}
+            files_so_far = [path for path in files_so_far if path not in removed]
+            files_so_far.extend(path for path in files if path not in files_so_far)
+            start_time, started_at = started.pop(payload["id"], (time.perf_counter(), chunk["timestamp"]))
+            await on_event({
+                "type": "node_finished",
+                "node": payload["name"],
+                "step": chunk["step"],
+                "status": "failed" if payload.get("error") or writes.get("status") == "failed" else "completed",
+                "started_at": started_at,
+                "finished_at": chunk["timestamp"],
+                "duration": round(time.perf_counter() - start_time, 3),
+                "files": files,
+                "files_so_far": list(files_so_far),
+                "prompt_usage": writes.get("prompt_usage") or {},
+                "project_id": writes.get("project_id"),
+            })
+    return result["project_id"], result.get("langsmith_trace_url"), run_succeeded(result)
 
-async def process_srs_document(file_path: str) -> Tuple[str, Optional[str]]:
 
-    workflow = create_workflow()
-    state = GraphState(srs_path=file_path)
-    result = await workflow.ainvoke(state)
-    return result["project_id"], result.get("langsmith_trace_url")
+async def find_restart_config(workflow, config: Dict[str, Any], result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Config of the checkpoint to run an unsuccessful run again from: the
+    earliest one about to run a node that recorded errors, or the first
+    validation when only validation failed
+    """
+    targets = {error.get("node") for error in result.get("errors") or []} - {"validate_output"}
+    restart = None
+    # History comes newest first, so the last match is the earliest checkpoint
+    async for snapshot in workflow.aget_state_history(config):
+        if set(snapshot.next).intersection(targets or {"validate_output"}):
+            restart = snapshot.config
+    return restart
+
+
+def run_succeeded(result: Dict[str, Any]) -> bool:
+    """
+    Whether a finished run produced a project worth reusing: no node failed or
+    recorded errors, and the project passed validation
+    """
+    return (
+        result.get("status") != "failed"
+        and not result.get("errors")
+        and bool((result.get("validation_results") or {}).get("valid"))
+    )
 
 
-def analyze_requirements(state: GraphState) -> GraphState:
+async def analyze_requirements(state: GraphState) -> Dict[str, Any]:
+    """
+    Extract API, database, business logic and auth requirements concurrently
+    """
     if not state.srs_document:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "user",
                 "content": "Error: No SRS document to analyze"
-            })
-
-        state.status = "failed"
-        return state
+            }],
+            "status": "failed"
+        }
     llm = get_llm()
     
     api_prompt = PromptTemplate.from_template(
@@ -180,58 +382,97 @@ def analyze_requirements(state: GraphState) -> GraphState:
         """
     )
     
-    try:
+    extractions = {
+        "api_endpoints": api_prompt,
+        "database_schema": db_prompt,
+        "business_logic": logic_prompt,
+        "auth_requirements": auth_prompt,
+    }
+    schemas = {
+        "api_endpoints": APIEndpoints,
+        "database_schema": DatabaseSchema,
+        "business_logic": BusinessLogic,
+        "auth_requirements": AuthRequirements,
+    }
+    mergers = {
+        "api_endpoints": merge_endpoints,
+        "database_schema": merge_tables,
+        "business_logic": merge_business_logic,
+        "auth_requirements": merge_auth_requirements,
+    }
+    semaphore = asyncio.Semaphore(max(1, ANALYSIS_MAX_CONCURRENCY))
 
-        import re
-        def extract_json_from_llm_output(x):
-            content = x.content.strip()
-            match = re.search(r'```json\s*(\{.*?\})\s*```', content, re.DOTALL)
-            if not match:
-                raise ValueError("No JSON block found in LLM output")
-            json_str = match.group(1)
-            return json.loads(json_str)
+    chunked = ANALYSIS_MODE == "chunked" or (
+        ANALYSIS_MODE == "auto" and estimate_tokens(state.srs_document) > ANALYSIS_CHUNK_TOKENS
+    )
+    chunks = chunk_document(state.srs_document, ANALYSIS_CHUNK_TOKENS) if chunked else [state.srs_document]
 
+    async def run_extraction(field: str, prompt: PromptTemplate, document: str):
+        async with semaphore:
+            return await ainvoke_structured(prompt, llm, {"srs_document": document}, schemas[field])
 
-        api_chain = api_prompt | llm | RunnableLambda(extract_json_from_llm_output)
-        api_endpoints = api_chain.invoke({"srs_document": state.srs_document})
-        state.api_endpoints = api_endpoints
+    fields = list(extractions)
+    tasks = [(field, index) for field in fields for index in range(len(chunks))]
+    results = await asyncio.gather(
+        *(run_extraction(field, extractions[field], chunks[index]) for field, index in tasks),
+        return_exceptions=True
+    )
 
-        db_chain = db_chain = db_prompt | llm | RunnableLambda(extract_json_from_llm_output)
-        database_schema = db_chain.invoke({"srs_document": state.srs_document})
+    update = {"errors": [], "messages": []}
+    if chunked:
+        update["messages"].append({
+            "role": "system",
+            "content": f"Analyzing SRS document in {len(chunks)} chunks of up to {ANALYSIS_CHUNK_TOKENS} tokens"
+        })
 
-        state.database_schema = database_schema
-        
-        logic_chain = logic_prompt | llm | RunnableLambda(extract_json_from_llm_output)
-        business_logic = logic_chain.invoke({"srs_document": state.srs_document})
-        state.business_logic = business_logic
+    failed = []
+    for field in fields:
+        succeeded = []
+        for (task_field, index), result in zip(tasks, results):
+            if task_field != field:
+                continue
+            if isinstance(result, Exception):
+                update["errors"].append({
+                    "node": "analyze_requirements",
+                    "extraction": field,
+                    "chunk": index,
+                    "error": str(result)
+                })
+                update["messages"].append({
+                    "role": "system",
+                    "content": f"Error extracting {field}" + (f" from chunk {index}" if chunked else "") + f": {str(result)}"
+                })
+            else:
+                succeeded.append(result)
 
-        auth_chain = auth_prompt | llm | RunnableLambda(extract_json_from_llm_output)
-        auth_requirements = auth_chain.invoke({"srs_document": state.srs_document})
-        state.auth_requirements = auth_requirements
-        
-        # Add message to state
-        state.messages.append({
+        if not succeeded:
+            failed.append(field)
+        elif chunked:
+            update[field] = mergers[field](succeeded)
+        else:
+            update[field] = succeeded[0]
+
+    if len(failed) == len(fields):
+        update["messages"].append({
                 "role": "system",
-                "content": "Successfully analyzed SRS document and extracted requirements"
+                "content": "Error analyzing requirements: all extractions failed"
             })
-        
-    except Exception as e:
-        state.messages.append({
+        update["status"] = "failed"
+    else:
+        # Add message to state
+        update["messages"].append({
                 "role": "system",
-                "content": f"Error analyzing requirements: {str(e)}"
+                "content": "Successfully analyzed SRS document and extracted requirements"
             })
-        state.status = "failed"
     
-    return state
+    return update
 
 
-def generate_project_structure(state: GraphState) -> GraphState:
+def generate_project_structure(state: GraphState) -> Dict[str, Any]:
     project_id = str(uuid.uuid4())
-    state.project_id = project_id
 
     project_dir = Path("generated_projects") / project_id
     project_dir.mkdir(parents=True, exist_ok=True)
-    state.project_path = str(project_dir)
     
     (project_dir / "app").mkdir(exist_ok=True)
     (project_dir / "app" / "api").mkdir(exist_ok=True)
@@ -247,25 +488,134 @@ def generate_project_structure(state: GraphState) -> GraphState:
     (project_dir / "app" / "models" / "__init__.py").touch()
     (project_dir / "app" / "services" / "__init__.py").touch()
     
-    state.generated_files.append({
-        "path": str(project_dir),
-        "type": "directory",
-        "description": "Project root directory"
-    })
-    
-    state.messages.append({
+    return {
+        "project_id": project_id,
+        "project_path": str(project_dir),
+        "generated_files": [{
+            "path": str(project_dir),
+            "type": "directory",
+            "description": "Project root directory"
+        }],
+        "messages": [{
                 "role": "system",
                 "content": f"Generated project structure at {project_dir}"
+            }]
+    }
+
+def write_base_model(project_dir: Path) -> Dict[str, str]:
+    base_model_path = project_dir / "app" / "models" / "base.py"
+    with open(base_model_path, "w") as f:
+        f.write('''
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.services.database import Base
+
+class TimestampMixin:
+    """Mixin for adding timestamp fields to models"""
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+''')
+    
+    return {
+        "path": str(base_model_path),
+        "type": "file",
+        "description": "Base model with timestamp mixin",
+        "source": "template"
+    }
+
+
+async def generate_database_models_sharded(state: GraphState) -> Dict[str, Any]:
+    """
+    Generate one model file per table, sharing a compact index of table,
+    module and class names so cross-references stay consistent
+    """
+    llm = get_llm()
+    project_dir = Path(state.project_path)
+    index = build_model_index(state.database_schema)
+    model_index = format_model_index(index)
+
+    shard_prompt = PromptTemplate.from_template(
+        """
+        You are a Python developer specializing in SQLAlchemy ORM.
+        
+        Generate the SQLAlchemy model for the table "{table}" as class {class_name}
+        in the module app/models/{module}.py.
+        
+        Table definition:
+        {definition}
+        
+        All models in the project (use exactly these class and module names
+        for relationships and foreign keys):
+        {model_index}
+        
+        Requirements:
+        1. Use SQLAlchemy 2.0 syntax with type annotations
+        2. Inherit from the Base class imported from app.services.database
+        3. Include proper relationships between models
+        4. Add appropriate indexes and constraints
+        5. Include docstrings for each model and field
+        
+        Respond with a single ```python code block containing the complete file.
+        """
+    )
+    usages = []
+
+    async def generate_model(entry):
+        inputs, usage = budget_prompt(shard_prompt, {
+            "table": (entry["table"], 4),
+            "class_name": (entry["class"], 4),
+            "module": (entry["module"], 4),
+            "definition": (entry["definition"], 3),
+            "model_index": (model_index, 2)
+        })
+        usages.append(usage)
+        code = await generate_file(shard_prompt, llm, inputs)
+        model_path = project_dir / "app" / "models" / f"{entry['module']}.py"
+        await asyncio.to_thread(model_path.write_text, code)
+        emit_file_generated("generate_database_models", model_path)
+        return {
+            "path": str(model_path),
+            "type": "file",
+            "description": f"{entry['module']}.py SQLAlchemy model"
+        }
+
+    model_files = [write_base_model(project_dir)]
+    messages = []
+    errors = []
+    for entry, result in await run_shards(index, generate_model, SHARD_MAX_CONCURRENCY, SHARD_MAX_RETRIES):
+        if isinstance(result, Exception):
+            errors.append({"node": "generate_database_models", "shard": entry["table"], "error": str(result)})
+            messages.append({
+                "role": "system",
+                "content": f"Error generating model for table {entry['table']}: {str(result)}"
             })
-    return state
+        else:
+            model_files.append(result)
+
+    messages.append({
+        "role": "system",
+        "content": f"Generated {len(model_files) - 1} of {len(index)} database models in shards"
+    })
+    return {
+        "generated_files": model_files,
+        "messages": messages,
+        "errors": errors,
+        "prompt_usage": {"generate_database_models": combine_usage(usages)}
+    }
+
 
-def generate_database_models(state: GraphState) -> GraphState:
+async def generate_database_models(state: GraphState) -> Dict[str, Any]:
     if not state.database_schema:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": "Error: No database schema to generate models from"
-            })
-        return state
+            }]
+        }
+    
+    if GENERATION_MODE == "sharded":
+        return await generate_database_models_sharded(state)
     
     llm = get_llm()
     
@@ -284,69 +634,70 @@ def generate_database_models(state: GraphState) -> GraphState:
         4. Add appropriate indexes and constraints
         5. Include docstrings for each model and field
         
+        Problems found in the previous version of these files, to be fixed:
+        {previous_issues}
+        
         For each model, create a separate file in the app/models directory.
-        Provide the complete code for each model file.
+        Provide the complete code for each model file, with its path in bold on
+        its own line (e.g. **app/models/user.py**) followed by a python code block.
         """
     )
     
     try:
-        model_chain = model_prompt | llm
-        model_response = model_chain.invoke({"database_schema": json.dumps(state.database_schema, indent=2)})
+        inputs, usage = budget_prompt(model_prompt, {
+            "database_schema": (state.database_schema, 1),
+            "previous_issues": (previous_issues(state, "app/models/"), 2)
+        })
         model_files = []
         
         project_dir = Path(state.project_path)
         
-        base_model_path = project_dir / "app" / "models" / "base.py"
-        with open(base_model_path, "w") as f:
-            f.write('''
-            from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-            from sqlalchemy.orm import relationship
-            from datetime import datetime
-            from app.services.database import Base
-
-            class TimestampMixin:
-                """Mixin for adding timestamp fields to models"""
-                created_at = Column(DateTime, default=datetime.utcnow)
-                updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-            ''')
-        
-        model_files.append({
-            "path": str(base_model_path),
-            "type": "file",
-            "description": "Base model with timestamp mixin"
-        })
-
-        model_response_str = model_response.content if isinstance(model_response.content, str) else str(model_response.content)
+        model_files.append(write_base_model(project_dir))
+        skipped = []
 
-        matches = re.findall(r"\*\*app/models/(.+?)\.py\*\*\n```python\n(.*?)```", model_response_str, re.DOTALL)
-        for filename, code in matches:
+        # Each model file is written as soon as its code block is complete
+        async def write_model(path, code):
+            filename = Path(path.strip()).stem
+            if filename in RESERVED_MODEL_MODULES:
+                # Would replace the template Base module or the package
+                skipped.append(path.strip())
+                return
             model_path = project_dir / "app" / "models" / f"{filename}.py"
-            with open(model_path, "w") as f:
-                f.write(code.strip())
-
+            await asyncio.to_thread(model_path.write_text, code.strip())
             model_files.append({
                 "path": str(model_path),
                 "type": "file",
                 "description": f"{filename}.py SQLAlchemy model"
             })
+            emit_file_generated("generate_database_models", model_path)
 
-        state.generated_files.extend(model_files)
-        
-        state.messages.append({
+        await generate_files(model_prompt, llm, inputs, write_model)
+
+        messages = [{
+            "role": "system",
+            "content": f"Generated database models based on the extracted schema"
+        }]
+        if skipped:
+            messages.append({
                 "role": "system",
-                "content": f"Generated database models based on the extracted schema"
+                "content": f"Skipped generated files that would replace template modules: {', '.join(skipped)}"
             })
+        return {
+            "generated_files": model_files,
+            "messages": messages,
+            "prompt_usage": {"generate_database_models": usage}
+        }
         
     except Exception as e:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": f"Error generating database models: {str(e)}"
-            })
-    
-    return state
+            }]
+        }
 
 
-def generate_main_application(state: GraphState) -> GraphState:
+def generate_main_application(state: GraphState) -> Dict[str, Any]:
     """
     Generate the main FastAPI application file
     """
@@ -498,41 +849,150 @@ async def close_db():
 ''')
         
         # Add to generated files
-        state.generated_files.append({
-            "path": str(main_path),
-            "type": "file",
-            "description": "Main FastAPI application"
-        })
-        
-        state.generated_files.append({
-            "path": str(db_path),
-            "type": "file",
-            "description": "Database service"
-        })
-        
-        state.messages.append({
+        return {
+            "generated_files": [
+                {
+                    "path": str(main_path),
+                    "type": "file",
+                    "description": "Main FastAPI application",
+                    "source": "template"
+                },
+                {
+                    "path": str(db_path),
+                    "type": "file",
+                    "description": "Database service",
+                    "source": "template"
+                }
+            ],
+            "messages": [{
                 "role": "system",
                 "content":  f"Generated main FastAPI application file"
-            })
+            }]
+        }
         
     except Exception as e:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": f"Error generating main application: {str(e)}"
+            }]
+        }
+
+def get_model_modules(state: GraphState) -> List[str]:
+    """
+    Import paths of the model modules generated so far, e.g. app.models.user
+    """
+    modules = []
+    for entry in state.generated_files:
+        path = Path(entry["path"]) if isinstance(entry, dict) else Path(entry)
+        if path.suffix == ".py" and path.parent.name == "models" and path.stem != "__init__":
+            modules.append(f"app.models.{path.stem}")
+    return sorted(modules)
+
+
+async def generate_api_routes_sharded(state: GraphState) -> Dict[str, Any]:
+    """
+    Generate one route file per endpoint group, sharing a compact index of
+    model classes and modules
+    """
+    llm = get_llm()
+    routes_dir = Path(state.project_path) / "app" / "api" / "routes"
+    groups = group_endpoints(state.api_endpoints)
+    model_index = format_model_index(build_model_index(state.database_schema))
+
+    shard_prompt = PromptTemplate.from_template(
+        """
+        You are a Python developer specializing in FastAPI.
+        
+        Generate the FastAPI route module app/api/routes/{group}.py exposing an
+        APIRouter named router for the following API endpoints:
+        
+        {endpoints}
+        
+        Models available (import them from these exact modules):
+        {model_index}
+        
+        Generated Model Modules:
+        {model_modules}
+        
+        Business Logic:
+        {business_logic}
+        
+        Authentication Requirements:
+        {auth_requirements}
+        
+        Requirements:
+        1. Use FastAPI's dependency injection for database sessions
+        2. Implement proper request and response models using Pydantic
+        3. Include appropriate error handling
+        4. Add comprehensive docstrings and OpenAPI documentation
+        5. Implement authentication and authorization as required
+        
+        Respond with a single ```python code block containing the complete file.
+        """
+    )
+    usages = []
+
+    async def generate_route(group):
+        inputs, usage = budget_prompt(shard_prompt, {
+            "group": (group, 5),
+            "endpoints": (groups[group], 4),
+            "model_index": (model_index or "None", 3),
+            "model_modules": ("\n".join(get_model_modules(state)) or "None", 3),
+            "auth_requirements": (state.auth_requirements, 2),
+            "business_logic": (state.business_logic, 1)
+        })
+        usages.append(usage)
+        code = await generate_file(shard_prompt, llm, inputs)
+        file_path = routes_dir / f"{group}.py"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(file_path.write_text, code)
+        emit_file_generated("generate_api_routes", file_path)
+        return {
+            "path": str(file_path),
+            "type": "file",
+            "description": f"{group}.py FastAPI routes"
+        }
+
+    route_files = []
+    messages = []
+    errors = []
+    for group, result in await run_shards(list(groups), generate_route, SHARD_MAX_CONCURRENCY, SHARD_MAX_RETRIES):
+        if isinstance(result, Exception):
+            errors.append({"node": "generate_api_routes", "shard": group, "error": str(result)})
+            messages.append({
+                "role": "system",
+                "content": f"Error generating routes for {group}: {str(result)}"
             })
-    
-    return state
+        else:
+            route_files.append(result)
 
-def generate_api_routes(state: GraphState) -> GraphState:
+    messages.append({
+        "role": "system",
+        "content": f"Generated {len(route_files)} of {len(groups)} route files in shards"
+    })
+    return {
+        "generated_files": route_files,
+        "messages": messages,
+        "errors": errors,
+        "prompt_usage": {"generate_api_routes": combine_usage(usages)}
+    }
+
+
+async def generate_api_routes(state: GraphState) -> Dict[str, Any]:
     """
     Generate API routes based on the extracted endpoints
     """
     if not state.api_endpoints:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": "Error: No API endpoints to generate routes from"
-            })
-        return state
+            }]
+        }
+    
+    if GENERATION_MODE == "sharded":
+        return await generate_api_routes_sharded(state)
     
     llm = get_llm()
     
@@ -553,61 +1013,71 @@ def generate_api_routes(state: GraphState) -> GraphState:
         Authentication Requirements:
         {auth_requirements}
         
+        Generated Model Modules:
+        {model_modules}
+        
         Requirements:
         1. Use FastAPI's dependency injection for database sessions
         2. Implement proper request and response models using Pydantic
         3. Include appropriate error handling
         4. Add comprehensive docstrings and OpenAPI documentation
         5. Implement authentication and authorization as required
+        6. Import SQLAlchemy models from the generated model modules listed above
+        
+        Problems found in the previous version of these files, to be fixed:
+        {previous_issues}
         
         For each logical group of endpoints, create a separate file in the app/api/routes directory.
-        Provide the complete code for each route file.
+        Provide the complete code for each route file, with its path in bold on
+        its own line (e.g. **app/api/routes/users.py**) followed by a python code block.
         """
     )
     
     try:
-        route_chain = route_prompt | llm
-        route_response = route_chain.invoke({
-            "api_endpoints": json.dumps(state.api_endpoints, indent=2),
-            "database_schema": json.dumps(state.database_schema, indent=2),
-            "business_logic": json.dumps(state.business_logic, indent=2),
-            "auth_requirements": json.dumps(state.auth_requirements, indent=2)
+        inputs, usage = budget_prompt(route_prompt, {
+            "api_endpoints": (state.api_endpoints, 4),
+            "model_modules": ("\n".join(get_model_modules(state)) or "None", 4),
+            "previous_issues": (previous_issues(state, "app/api/routes/"), 4),
+            "database_schema": (state.database_schema, 3),
+            "auth_requirements": (state.auth_requirements, 2),
+            "business_logic": (state.business_logic, 1)
         })
-
         route_files = []
 
-        content = route_response.content
-        code_blocks = re.findall(r"\*\*(.*?)\*\*\s*```python(.*?)```", content, re.DOTALL)
-
-        for filename, code in code_blocks:  
-            filename = filename.strip()
+        # Each route file is written as soon as its code block is complete
+        async def write_route(path, code):
+            filename = Path(path.strip()).name
             file_path = Path(state.project_path) / "app" / "api" / "routes" / filename
             file_path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(file_path.write_text, code.strip())
+            route_files.append({
+                "path": str(file_path),
+                "type": "file",
+                "description": f"{filename} FastAPI routes"
+            })
+            emit_file_generated("generate_api_routes", file_path)
 
-            with open(file_path, "w") as f:
-                f.write(code.strip())
-
-            route_files.append(str(file_path.relative_to(state.project_path)))
+        await generate_files(route_prompt, llm, inputs, write_route)
 
-        state.generated_files.extend(route_files)
-        project_dir = Path(state.project_path)
-        state.generated_files.extend(route_files)
-        
-        state.messages.append({
+        return {
+            "generated_files": route_files,
+            "messages": [{
                 "role": "system",
                 "content": f"Generated API routes based on the extracted endpoints"
-            })
+            }],
+            "prompt_usage": {"generate_api_routes": usage}
+        }
         
     except Exception as e:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": f"Error generating API routes: {str(e)}"
-            })
-    
-    return state
+            }]
+        }
 
 
-def generate_config_files(state: GraphState) -> GraphState:
+def generate_config_files(state: GraphState) -> Dict[str, Any]:
     """
     Generate configuration files for the FastAPI application
     """
@@ -799,23 +1269,24 @@ Run tests with pytest: `pytest`
             "description": "Project documentation"
         })
         
-        state.generated_files.extend(config_files)
-        
-        state.messages.append({
+        return {
+            "generated_files": config_files,
+            "messages": [{
                 "role": "system",
                 "content": f"Generated configuration files for the FastAPI application"
-            })
+            }]
+        }
         
     except Exception as e:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": f"Error generating configuration files: {str(e)}"
-            })
-    
-    return state
+            }]
+        }
 
 
-def generate_documentation(state: GraphState) -> GraphState:
+def generate_documentation(state: GraphState) -> Dict[str, Any]:
     """
     Generate documentation for the FastAPI application
     """
@@ -857,10 +1328,13 @@ graph TD
     B --> C[Generate Project Structure]
     C --> D[Generate Database Models]
     D --> E[Generate API Routes]
-    E --> F[Generate Tests]
-    F --> G[Generate Configuration Files]
-    G --> H[Generate Main Application]
-    H --> I[Generate Documentation]
+    C --> F[Generate Configuration Files]
+    C --> G[Generate Main Application]
+    C --> H[Generate Documentation]
+    E --> I[Validate Output]
+    F --> I
+    G --> I
+    H --> I
 ```
 
 ## Workflow Nodes
@@ -870,39 +1344,125 @@ graph TD
 3. **Generate Project Structure**: Create the basic project directory structure
 4. **Generate Database Models**: Create SQLAlchemy models based on the database schema
 5. **Generate API Routes**: Create FastAPI routes based on the API endpoints
-6. **Generate Tests**: Create pytest tests
-7. **Generate Configuration Files**: Create configuration files like requirements.txt, Dockerfile, etc.
-8. **Generate Main Application**: Create the main FastAPI application file
-9. **Generate Documentation**: Create documentation for the API and workflow
+6. **Generate Configuration Files**: Create configuration files like requirements.txt, Dockerfile, etc.
+7. **Generate Main Application**: Create the main FastAPI application file
+8. **Generate Documentation**: Create documentation for the API and workflow
+9. **Validate Output**: Review the project and regenerate components that need it
+
+Configuration files, the main application and documentation do not depend on LLM output and run in parallel with model and route generation.
 """)
         
-        state.generated_files.append({
-            "path": str(api_docs_path),
-            "type": "file",
-            "description": "API documentation"
-        })
-        
-        state.generated_files.append({
-            "path": str(workflow_docs_path),
-            "type": "file",
-            "description": "LangGraph workflow documentation"
-        })
-        
-        state.messages.append({
+        return {
+            "generated_files": [
+                {
+                    "path": str(api_docs_path),
+                    "type": "file",
+                    "description": "API documentation"
+                },
+                {
+                    "path": str(workflow_docs_path),
+                    "type": "file",
+                    "description": "LangGraph workflow documentation"
+                }
+            ],
+            "messages": [{
                 "role": "system",
                 "content": f"Generated documentation for the FastAPI application"
-            })
+            }]
+        }
     except Exception as e:
-        state.messages.append({
+        return {
+            "messages": [{
                 "role": "system",
                 "content": f"Error generating documentation: {str(e)}"
-            })
-    return state
+            }]
+        }
+
+
+def summarize_generated_files(state: GraphState) -> List[Dict[str, str]]:
+    """
+    Generated files as project-relative paths with their descriptions
+    """
+    project_dir = Path(state.project_path) if state.project_path else None
+    summary = []
+    for entry in state.generated_files:
+        path = Path(entry["path"])
+        if project_dir is not None and path.is_relative_to(project_dir):
+            path = path.relative_to(project_dir)
+        summary.append({"path": path.as_posix(), "description": entry.get("description", "")})
+    return summary
+
+
+def previous_issues(state: GraphState, directory: str) -> str:
+    """
+    Static check and smoke test issues found in the previous version of the
+    files under directory
+    """
+    files: Dict[str, List[Dict[str, Any]]] = {}
+    for check in ("static_checks", "smoke_test"):
+        for path, issues in (state.validation_results.get(check) or {}).get("files", {}).items():
+            files[path] = files.get(path, []) + issues
+    return "\n".join(format_issues(files, directory)) or "None"
+
+
+def find_broken_nodes(state: GraphState, files: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[str]]:
+    """
+    Generation nodes owning any of the files with issues, or that produced
+    no files although their inputs were extracted, with their issues
+
+    - Template files are written the same way every time, so no node is
+      blamed for them; see template_issues
+    """
+    project_dir = Path(state.project_path)
+    producers = {
+        artifact: node for node, artifacts in NODE_ARTIFACTS.items() for artifact in artifacts["produces"]
+    }
+    owners = {}
+    for entry in state.generated_files:
+        path = Path(entry["path"])
+        if entry.get("artifact") in producers and not entry.get("source") == "template" and path.is_relative_to(project_dir):
+            owners[path.relative_to(project_dir).as_posix()] = producers[entry["artifact"]]
+
+    broken: Dict[str, List[str]] = {}
+    for path, issues in files.items():
+        if path in owners:
+            broken.setdefault(owners[path], []).extend(format_issues({path: issues}))
+    for node, artifacts in NODE_ARTIFACTS.items():
+        inputs = [name for name in artifacts["consumes"] if name in GraphState.model_fields]
+        if artifacts["produces"][0] not in state.artifact_versions and all(getattr(state, name) for name in inputs):
+            broken.setdefault(node, []).append(f"{node} produced no files")
+    return broken
+
+
+def template_issues(state: GraphState, files: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    """
+    Issues found in template files, which regeneration cannot fix
+    """
+    project_dir = Path(state.project_path)
+    templates = {
+        Path(entry["path"]).relative_to(project_dir).as_posix() for entry in state.generated_files
+        if entry.get("source") == "template" and Path(entry["path"]).is_relative_to(project_dir)
+    }
+    return format_issues({path: issues for path, issues in files.items() if path in templates})
 
 
-def validate_output(state: GraphState) -> GraphState:
+def pick_regeneration_target(nodes: List[str]) -> str:
+    """
+    The broken node whose regeneration covers most of the others; the rest
+    are caught again by the next validation
+    """
+    nodes = [node for node in GENERATION_NODES if node in nodes]
+    return max(nodes, key=lambda node: len({name for level in get_regeneration_plan(node) for name in level}.intersection(nodes)))
+
+
+def validate_output(state: GraphState) -> Dict[str, Any]:
     """
     Validate the generated output and determine if regeneration is needed
+
+    - Static checks run first, then a sandboxed smoke test boots the project
+      and calls every route; broken files go straight to regeneration of the
+      node that wrote them, without asking the LLM
+    - Clean projects are only reviewed by the LLM when VALIDATION_MODE is "llm"
     """
     llm = get_llm(temperature=0.1)  # Lower temperature for more consistent validation
     
@@ -942,107 +1502,341 @@ def validate_output(state: GraphState) -> GraphState:
         - "recommendations": list of recommendations for improvement
         - "regeneration_needed": boolean indicating if regeneration is needed
         - "regeneration_target": string indicating which component needs regeneration (if applicable)
-          Valid regeneration targets are: "generate_database_models", "generate_api_routes", "generate_tests", 
+          Valid regeneration targets are: "generate_database_models", "generate_api_routes",
           "generate_config_files", "generate_main_application", "generate_documentation"
         """
     )
     
     try:
-        # Validate output
-        validation_chain = validation_prompt | llm | RunnableLambda(
-            lambda x: json.loads(re.search(r'```json\n(.*?)\n```', x.content, re.DOTALL).group(1))
-        )
-
-        validation_results = validation_chain.invoke({
-            "api_endpoints": json.dumps(state.api_endpoints, indent=2),
-            "database_schema": json.dumps(state.database_schema, indent=2),
-            "business_logic": json.dumps(state.business_logic, indent=2),
-            "auth_requirements": json.dumps(state.auth_requirements, indent=2),
-            "generated_files": json.dumps(state.generated_files, indent=2)
-        })
-        
-        state.validation_results = validation_results
+        static_checks = check_project(Path(state.project_path))
+        broken = find_broken_nodes(state, static_checks["files"])
+        templates = template_issues(state, static_checks["files"])
+        update = {
+            "regeneration_target": None,
+            "messages": [{
+                "role": "system",
+                "content": f"Static checks: {static_checks['issue_count']} issues in "
+                           f"{len(static_checks['files'])} of {static_checks['files_checked']} files"
+            }]
+        }
+        smoke_test = None
+        if not broken and SMOKE_TEST_ENABLED:
+            smoke_test = smoke_test_project(state.project_path)
+            broken = find_broken_nodes(state, smoke_test["files"])
+            templates += template_issues(state, smoke_test["files"])
+            update["messages"].append({"role": "system", "content": summarize_smoke_test(smoke_test)})
+
+        if broken:
+            validation_results = {
+                "valid": False,
+                "issues": [issue for issues in broken.values() for issue in issues] + templates,
+                "regeneration_needed": True,
+                "regeneration_target": pick_regeneration_target(list(broken)),
+            }
+        elif templates:
+            # A broken template is a bug in the pipeline, not in the generated code
+            validation_results = {"valid": False, "issues": templates, "regeneration_needed": False}
+            update["errors"] = [{"node": "validate_output", "error": f"Issues in template files: {'; '.join(templates)}"}]
+            update["messages"].append({
+                "role": "system",
+                "content": f"Template files have issues that regeneration cannot fix: {'; '.join(templates)}"
+            })
+        elif smoke_test is not None and smoke_test["status"] != "passed":
+            # Not traced back to a generated file, so there is nothing to regenerate
+            validation_results = {
+                "valid": False,
+                "issues": [f"{item['step']} failed: {item['error']}" for item in smoke_test["failures"]] + [
+                    f"{route['method']} {route['path']} returned {route['status']}"
+                    for route in smoke_test["routes"] if route["status"] >= 500
+                ],
+                "regeneration_needed": False,
+            }
+        elif VALIDATION_MODE == "static":
+            validation_results = {"valid": True, "issues": [], "regeneration_needed": False}
+        else:
+            inputs, usage = budget_prompt(validation_prompt, {
+                "generated_files": (summarize_generated_files(state), 4),
+                "api_endpoints": (state.api_endpoints, 3),
+                "database_schema": (state.database_schema, 3),
+                "auth_requirements": (state.auth_requirements, 2),
+                "business_logic": (state.business_logic, 1)
+            })
+            validation_results = invoke_structured(validation_prompt, llm, inputs, ValidationReport)
+            update["prompt_usage"] = {"validate_output": usage}
+        validation_results["static_checks"] = static_checks
+        validation_results["smoke_test"] = smoke_test
+        update["validation_results"] = validation_results
         
         if validation_results.get("regeneration_needed", False):
-            state.regeneration_count += 1
+            regeneration_count = state.regeneration_count + 1
+            update["regeneration_count"] = regeneration_count
             
             regeneration_target = validation_results.get("regeneration_target")
             
-            valid_targets = [
-                "generate_database_models", 
-                "generate_api_routes", 
-                "generate_tests", 
-                "generate_config_files", 
-                "generate_main_application", 
-                "generate_documentation"
-            ]
-            
-            if regeneration_target in valid_targets:
-                state.regeneration_target = regeneration_target
+            if regeneration_target in GENERATION_DEPENDENCIES:
+                update["regeneration_target"] = regeneration_target
             else:
-                state.regeneration_target = "generate_api_routes"
-                state.messages.append({
+                update["regeneration_target"] = "generate_api_routes"
+                update["messages"].append({
                 "role": "system",
                 "content": f"Invalid regeneration target '{regeneration_target}'. Defaulting to 'generate_api_routes'."
                 })
             
-            state.messages.append({
+            update["messages"].append({
                 "role": "system",
-                "content": f"Validation failed. Regenerating {state.regeneration_target}. Attempt {state.regeneration_count} of {state.max_regenerations}."
+                "content": f"Validation failed. Regenerating {update['regeneration_target']}. Attempt {regeneration_count} of {state.max_regenerations}."
                 })
             
-            if state.regeneration_count >= state.max_regenerations:
-                state.messages.append({
+            if regeneration_count >= state.max_regenerations:
+                update["messages"].append({
                 "role": "system",
                 "content": f"Maximum regeneration attempts reached. Proceeding with current output."
                 })
-                state.regeneration_target = None
+                update["regeneration_target"] = None
+        elif not validation_results.get("valid", False):
+            update["messages"].append({
+                "role": "system",
+                "content": f"Validation failed with nothing to regenerate. Proceeding with current output."
+                })
         else:
-            state.messages.append({
+            update["messages"].append({
                 "role": "system",
                 "content": f"Validation successful. Project generated successfully."
                 })
-
-            state.regeneration_target = None
+        
+        return update
         
     except Exception as e:
-        print(e)
-        state.messages.append({
+        return {
+            "regeneration_target": None,
+            "messages": [{
                 "role": "system",
                 "content": f"Error validating output: {str(e)}"
-                })
-        
-        state.regeneration_target = None
-    
-    return state
+                }]
+        }
+
+
+# Artifacts each generation node reads and writes. State fields filled in by
+# analyze_requirements are inputs only; file artifacts are produced by exactly one node.
+NODE_ARTIFACTS = {
+    "generate_database_models": {
+        "consumes": ["database_schema"],
+        "produces": ["model_files"],
+    },
+    "generate_api_routes": {
+        "consumes": ["api_endpoints", "database_schema", "business_logic", "auth_requirements", "model_files"],
+        "produces": ["route_files"],
+    },
+    "generate_config_files": {
+        "consumes": [],
+        "produces": ["config_files"],
+    },
+    "generate_main_application": {
+        "consumes": [],
+        "produces": ["main_application"],
+    },
+    "generate_documentation": {
+        "consumes": ["api_endpoints", "auth_requirements", "database_schema", "business_logic"],
+        "produces": ["documentation"],
+    },
+}
+
+# Generation nodes and the generation nodes whose output they build on.
+# Nodes without dependencies fan out in parallel after generate_project_structure.
+GENERATION_DEPENDENCIES = {
+    node: [
+        producer for producer, produced in NODE_ARTIFACTS.items()
+        if producer != node and set(produced["produces"]).intersection(artifacts["consumes"])
+    ]
+    for node, artifacts in NODE_ARTIFACTS.items()
+}
+
+GENERATION_NODES = {
+    "generate_database_models": generate_database_models,
+    "generate_api_routes": generate_api_routes,
+    "generate_config_files": generate_config_files,
+    "generate_main_application": generate_main_application,
+    "generate_documentation": generate_documentation,
+}
+
+
+def get_regeneration_plan(target: str) -> List[List[str]]:
+    """
+    Return the target and every generation node downstream of it, grouped
+    into levels that can run in parallel
+    """
+    selected = {target}
+    changed = True
+    while changed:
+        changed = False
+        for node, dependencies in GENERATION_DEPENDENCIES.items():
+            if node not in selected and selected.intersection(dependencies):
+                selected.add(node)
+                changed = True
+
+    levels = []
+    done = set()
+    while selected - done:
+        level = [
+            node for node in GENERATION_DEPENDENCIES
+            if node in selected and node not in done
+            and not (selected - done).intersection(GENERATION_DEPENDENCIES[node])
+        ]
+        levels.append(level)
+        done.update(level)
+    return levels
+
+
+def apply_update(state: GraphState, update: Dict[str, Any]) -> GraphState:
+    """
+    Apply a node update to a copy of the state using the GraphState reducers
+    """
+    values = {}
+    for key, value in update.items():
+        if key == "generated_files":
+            value = merge_generated_files(state.generated_files, value)
+        elif key in ("messages", "errors"):
+            value = list(getattr(state, key)) + list(value)
+        elif key in ("artifact_versions", "prompt_usage"):
+            value = {**getattr(state, key), **value}
+        values[key] = value
+    return state.model_copy(update=values)
+
+
+def fingerprint_files(paths: List[str]) -> str:
+    """
+    Hash the contents of the given files so unchanged regenerations can be detected
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.encode("utf-8"))
+        try:
+            digest.update(Path(path).read_bytes())
+        except OSError:
+            digest.update(b"\x00missing")
+    return digest.hexdigest()
+
+
+def remove_files(paths: List[str]) -> None:
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+async def run_generation_node(name: str, state: GraphState) -> Dict[str, Any]:
+    """
+    Run a generation node, tagging its files with the artifact they belong to
+    and recording a fingerprint of that artifact
+    - Files from an earlier run of the node that it no longer writes are
+      deleted, so checks and regeneration don't keep blaming it for them
+    """
+    node = GENERATION_NODES[name]
+    artifact = NODE_ARTIFACTS[name]["produces"][0]
+    previous = [
+        entry["path"] for entry in state.generated_files
+        if entry.get("artifact") == artifact and entry.get("type") == "file"
+    ]
+    if asyncio.iscoroutinefunction(node):
+        update = await node(state)
+    else:
+        update = await asyncio.to_thread(node, state)
+
+    files = [dict(entry, artifact=artifact) for entry in update.get("generated_files", [])]
+    if files:
+        paths = [entry["path"] for entry in files if entry.get("type") == "file"]
+        stale = [path for path in previous if path not in paths]
+        await asyncio.to_thread(remove_files, stale)
+        update["generated_files"] = files + [{"path": path, "removed": True} for path in stale]
+        update["artifact_versions"] = {artifact: await asyncio.to_thread(fingerprint_files, paths)}
+    return update
+
+
+def make_generation_node(name: str):
+    async def generation_node(state: GraphState) -> Dict[str, Any]:
+        return await run_generation_node(name, state)
+    generation_node.__name__ = name
+    return generation_node
+
+
+async def regenerate_components(state: GraphState) -> Dict[str, Any]:
+    """
+    Re-run the regeneration target, then only those downstream nodes whose
+    consumed artifacts actually changed
+    """
+    plan = get_regeneration_plan(state.regeneration_target)
+    REGENERATIONS.inc(target=state.regeneration_target)
+    combined = {"generated_files": [], "messages": [], "errors": [], "artifact_versions": {}, "prompt_usage": {}}
+    changed_artifacts = set()
+    executed = []
+    skipped = []
+    for level in plan:
+        runnable = [
+            name for name in level
+            if name == state.regeneration_target
+            or changed_artifacts.intersection(NODE_ARTIFACTS[name]["consumes"])
+        ]
+        skipped.extend(name for name in level if name not in runnable)
+        previous_versions = dict(state.artifact_versions)
+        updates = await asyncio.gather(*(run_generation_node(name, state) for name in runnable))
+        for name, update in zip(runnable, updates):
+            state = apply_update(state, update)
+            executed.append(name)
+            for artifact in NODE_ARTIFACTS[name]["produces"]:
+                if state.artifact_versions.get(artifact) != previous_versions.get(artifact):
+                    changed_artifacts.add(artifact)
+            for key, value in update.items():
+                if key in ("artifact_versions", "prompt_usage"):
+                    combined[key].update(value)
+                elif key in combined:
+                    combined[key] = combined[key] + list(value)
+                else:
+                    combined[key] = value
+
+    for name in executed:
+        REGENERATED_NODES.inc(node=name, outcome="executed")
+    for name in skipped:
+        REGENERATED_NODES.inc(node=name, outcome="skipped")
+    combined["messages"].append({
+        "role": "system",
+        "content": f"Regenerated {', '.join(executed)}"
+                   + (f"; skipped unaffected {', '.join(skipped)}" if skipped else "")
+    })
+    return combined
 
 
-def create_workflow() -> StateGraph:
+def create_workflow(checkpointer: Optional[BaseCheckpointSaver] = None) -> StateGraph:
 
     workflow = StateGraph(GraphState)
     
-    workflow.add_node("parse_srs_document", parse_srs_document)
-    workflow.add_node("analyze_requirements", analyze_requirements)
-    workflow.add_node("generate_project_structure", generate_project_structure)
-    workflow.add_node("generate_database_models", generate_database_models)
-    workflow.add_node("generate_api_routes", generate_api_routes)
-    workflow.add_node("generate_config_files", generate_config_files)
-    workflow.add_node("generate_main_application", generate_main_application)
-    workflow.add_node("generate_documentation", generate_documentation)
-    workflow.add_node("validate_output", validate_output)
+    nodes = {
+        "parse_srs_document": parse_srs_document,
+        "analyze_requirements": analyze_requirements,
+        "generate_project_structure": generate_project_structure,
+        **{name: make_generation_node(name) for name in GENERATION_NODES},
+        "validate_output": validate_output,
+        "regenerate_components": regenerate_components,
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, instrument_node(name, node))
 
     workflow.add_edge(START, "parse_srs_document")
     workflow.add_edge("parse_srs_document", "analyze_requirements")
     workflow.add_edge("analyze_requirements", "generate_project_structure")
-    workflow.add_edge("generate_project_structure", "generate_database_models")
-    workflow.add_edge("generate_database_models", "generate_api_routes")
-    workflow.add_edge("generate_api_routes", "generate_config_files")
-    workflow.add_edge("generate_config_files", "generate_main_application")
-    workflow.add_edge("generate_main_application", "generate_documentation")
-    workflow.add_edge("generate_documentation", "validate_output")
+
+    # Fan out independent generation branches and join them before validation
+    for node, dependencies in GENERATION_DEPENDENCIES.items():
+        if not dependencies:
+            workflow.add_edge("generate_project_structure", node)
+        for dependency in dependencies:
+            workflow.add_edge(dependency, node)
+    leaves = [
+        node for node in GENERATION_DEPENDENCIES
+        if not any(node in dependencies for dependencies in GENERATION_DEPENDENCIES.values())
+    ]
+    workflow.add_edge(leaves, "validate_output")
+    workflow.add_edge("regenerate_components", "validate_output")
     
     workflow.add_conditional_edges(
         "validate_output",
-        lambda state: END if state.regeneration_target is None else state.regeneration_target
+        lambda state: END if state.regeneration_target is None else "regenerate_components"
     )
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)